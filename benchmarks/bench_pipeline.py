@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+
+# Benchmark of every stage of the undulation analysis on synthetic loopy data
+# (see undulation/synthetic.py). Every stage is timed and its peak memory
+# (tracemalloc) recorded, the outputs are checked against the ground truth of
+# the synthetic data and the timings are compared to a stored baseline:
+#
+#   python benchmarks/bench_pipeline.py --wells 25 --frames 54000
+#   python benchmarks/bench_pipeline.py --save-baseline
+#
+# Exit status: 0 = all checks passed, 1 = wrong output or a stage got slower
+# than the baseline by more than the tolerance
+
+import os, sys, json, time, shutil, argparse, tempfile, platform, tracemalloc
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from undulation.synthetic import write_dataset, plate_wells, body_points
+from undulation.io import data_extraction, key_well
+from undulation.qc import check_track
+from undulation.detection import frequencies
+from undulation.gaps import fill_table
+from undulation.pipeline import stream_frequencies
+from undulation.store import build_store, store_frequencies
+from undulation.binning import binning, group_summary
+from undulation.scoring import read_scorings, scoring_rates
+from undulation.calibration import sweep
+from undulation.agreement import worm_agreement
+from undulation.plates import Common
+
+default_baseline = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# settings that have to match for timings to be compared with the baseline
+compared = ['wells', 'frames', 'points', 'freq_bin', 'bin_minutes', 'hours', 'dropout', 'workers', 'seed']
+
+# function to run one stage, returns its result and records the wall time (fastest of
+# repeat runs) in results. Peak memory is measured by tracemalloc in an additional run,
+# as tracing slows down the stage
+def measure(results, stage, func, *args, repeat = 1, memory = True, **kwargs):
+    best = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        out = func(*args, **kwargs)
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best:
+            best = seconds
+    results[stage] = {'seconds': round(best, 4), 'peak_mb': None}
+    if memory:
+        tracemalloc.start()
+        out = func(*args, **kwargs)
+        results[stage]['peak_mb'] = round(tracemalloc.get_traced_memory()[1]/2**20, 1)
+        tracemalloc.stop()
+    return out
+
+# function to interpolate all wells in place, as done by the analysis script
+def interpolate(data):
+    for c in data:
+        for e in data[c]:
+            data[c][e].interpolate(inplace = True)
+
+# function to fill the gaps of all wells in place with the numpy gap filling (see undulation/gaps.py)
+def fill_all(data):
+    for c in data:
+        for e in data[c]:
+            fill_table(data[c][e])
+
+# function to count the undulation-positive bin starts of the ground truth per time bin
+def expected_counts(starts, binm, bin_hour):
+    counts = [0]*bin_hour
+    for s in starts:
+        if s // (binm*900) < bin_hour:
+            counts[s // (binm*900)] += 1
+    return counts
+
+# function to compare the outputs of the stages with the ground truth, returns a list of errors
+def check_outputs(truth, outputs, args, bins):
+    errors = []
+    for stage in ('frequencies', 'stream_frequencies', 'store_frequencies'):
+        found = outputs[stage]['cond1']
+        wrong = [k for k in truth if sorted(found.get(k, [])) != truth[k]]
+        if wrong:
+            errors.append(stage + ': wrong undulation bins for ' + ', '.join(wrong))
+
+    means = outputs['binning']
+    mean_factor = 900/bins
+    bin_hour = int(60*args.hours/args.bin_minutes)
+    for k in truth:
+        rates = means[means.Well == key_well(k)].Undulation_Rate.to_numpy()
+        expected = np.array(expected_counts(truth[k], args.bin_minutes, bin_hour))/(mean_factor*args.bin_minutes)
+        if not np.allclose(rates, expected):
+            errors.append('binning: wrong undulation rates for ' + k)
+
+    plot_ready, areas = outputs['group_summary']
+    if len(areas) != len(truth) or (plot_ready.N != len(truth)).any():
+        errors.append('group_summary: not all worms summarised')
+
+    # the default detection setting of the sweep has to find the same bins as frequencies()
+    table = outputs['calibration_sweep']
+    default = table[(table.Low == 4) & (table.Up == 17) & (table.Min_Move == 0.5) & (table.Max_Move == 15)]
+    found = sum(len(starts) for starts in outputs['frequencies']['cond1'].values())
+    if len(default) != 1 or int(default.TP.iloc[0] + default.FP.iloc[0]) != found:
+        errors.append('calibration_sweep: default setting differs from frequencies')
+
+    worms, scored = outputs['agreement']
+    if len(worms) != len(truth) or (worms.FP + worms.FN > 0).any():
+        errors.append('agreement: tracker and scorings of the synthetic data disagree')
+
+    for w, rates in outputs['scoring'].items():
+        k = [k for k in truth if key_well(k) == w][0]
+        expected = np.zeros(len(rates))
+        expected[np.array(truth[k], dtype = int) // bins] = 1
+        if not np.allclose(rates.Undulation_Rate, expected):
+            errors.append('scoring: wrong rates for ' + w)
+    return errors
+
+# function to compare the timings with the baseline, returns a list of regressions
+def compare_baseline(results, baseline, tolerance):
+    slower = []
+    for stage in results:
+        if stage not in baseline:
+            continue
+        before = baseline[stage]['seconds']
+        now = results[stage]['seconds']
+        if now > before*(1 + tolerance) and now - before > 0.05:
+            slower.append(stage + ': ' + str(before) + 's -> ' + str(now) + 's')
+    return slower
+
+def run(args, folder):
+    wells = plate_wells()[:args.wells]
+    points = body_points[:args.points]
+    bins = int(args.freq_bin*15)
+    data_loc = os.path.join(folder, 'data')
+    score_loc = os.path.join(folder, 'scorings')
+
+    print('Writing synthetic data...')
+    truth = write_dataset(data_loc, wells, args.frames, points, bin_len = bins, dropout = args.dropout,
+                          score_loc = score_loc, seed = args.seed)
+    results = {}
+    cond_loc = {'cond1': data_loc}
+    det = (args.frames, bins, points[:2])
+
+    outputs = {}
+    measure(results, 'data_extraction', data_extraction, data_loc, args.workers, False, repeat = args.repeat,
+            memory = args.memory)
+    # the cache is written by the first call only
+    measure(results, 'data_extraction_cold_cache', data_extraction, data_loc, args.workers, True, memory = False)
+    data = {'cond1': measure(results, 'data_extraction_cached', data_extraction, data_loc, args.workers,
+                             True, repeat = args.repeat, memory = args.memory)}
+    measure(results, 'check_track', check_track, data, args.frames, repeat = args.repeat, memory = args.memory)
+    copies = {c: {e: data[c][e].copy() for e in data[c]} for c in data}
+    measure(results, 'fill_gaps', fill_all, copies, memory = args.memory)
+    measure(results, 'interpolate', interpolate, data, memory = args.memory)
+    outputs['frequencies'] = measure(results, 'frequencies', frequencies, data, *det,
+                                     workers = args.workers, repeat = args.repeat, memory = args.memory)
+    outputs['stream_frequencies'] = measure(results, 'stream_frequencies', stream_frequencies, cond_loc, *det,
+                                            workers = args.workers, repeat = args.repeat, memory = args.memory)
+    store = os.path.join(folder, 'store')
+    measure(results, 'build_store', build_store, store, cond_loc, workers = args.workers, memory = args.memory)
+    outputs['store_frequencies'] = measure(results, 'store_frequencies', store_frequencies, store, *det,
+                                           workers = args.workers, repeat = args.repeat, memory = args.memory)
+    outputs['binning'] = measure(results, 'binning', binning, outputs['frequencies'], args.bin_minutes,
+                                 args.hours, Common, 900/bins, repeat = args.repeat, memory = args.memory)
+    outputs['group_summary'] = measure(results, 'group_summary', group_summary, outputs['binning'],
+                                       {'cond1': 'Synthetic'}, repeat = args.repeat, memory = args.memory)
+    scoring = measure(results, 'read_scorings', read_scorings, score_loc, repeat = args.repeat, memory = args.memory)
+    outputs['scoring'] = measure(results, 'scoring_rates', scoring_rates, scoring, args.frames, bins,
+                                 repeat = args.repeat, memory = args.memory)
+    outputs['agreement'] = measure(results, 'agreement', worm_agreement, outputs['frequencies']['cond1'], scoring,
+                                   args.frames, bins, repeat = args.repeat, memory = args.memory)
+    grid = (range(2, 9), range(10, bins//2 + 2), [0.25, 0.5, 1, 2], [10, 15, 20, 30])
+    # the spectra are stored by the first call only
+    measure(results, 'calibration_sweep', sweep, data_loc, scoring, *det, *grid, workers = args.workers,
+            memory = args.memory)
+    outputs['calibration_sweep'] = measure(results, 'calibration_sweep_stored', sweep, data_loc, scoring, *det,
+                                           *grid, workers = args.workers, repeat = args.repeat,
+                                           memory = args.memory)
+    return results, check_outputs(truth, outputs, args, bins)
+
+def parse_args(argv = None):
+    parser = argparse.ArgumentParser(description = 'Benchmark the undulation analysis on synthetic data.')
+    parser.add_argument('--wells', type = int, default = 25, help = 'number of wells (at most 25)')
+    parser.add_argument('--frames', type = int, default = 54000, help = 'frames per well (15 per second)')
+    parser.add_argument('--points', type = int, default = 4, help = 'tracked body points per well (at most 4)')
+    parser.add_argument('--freq-bin', type = float, default = 3, help = 'seconds per frequency bin')
+    parser.add_argument('--bin-minutes', type = int, default = 3, help = 'minutes per time bin')
+    parser.add_argument('--hours', type = float, default = 1, help = 'hours tracked')
+    parser.add_argument('--dropout', type = float, default = 0.001, help = 'fraction of missing tracking rows')
+    parser.add_argument('--workers', type = int, default = 1, help = 'number of worker processes')
+    parser.add_argument('--repeat', type = int, default = 1, help = 'runs per stage, the fastest is reported')
+    parser.add_argument('--no-memory', dest = 'memory', action = 'store_false', help = 'do not measure peak memory')
+    parser.add_argument('--seed', type = int, default = 0, help = 'seed of the synthetic data')
+    parser.add_argument('--baseline', default = default_baseline, help = 'baseline timings (JSON)')
+    parser.add_argument('--save-baseline', action = 'store_true', help = 'store the timings as new baseline')
+    parser.add_argument('--tolerance', type = float, default = 0.25, help = 'allowed slowdown against the baseline')
+    parser.add_argument('--keep', help = 'folder to keep the synthetic data in (default: temporary)')
+    return parser.parse_args(argv)
+
+def main(argv = None):
+    args = parse_args(argv)
+    folder = args.keep or tempfile.mkdtemp(prefix = 'undulation_bench_')
+    try:
+        results, errors = run(args, folder)
+    finally:
+        if args.keep is None:
+            shutil.rmtree(folder, ignore_errors = True)
+
+    settings = {k: v for k, v in vars(args).items() if k in compared}
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        if stored['settings'] == settings:
+            baseline = stored['stages']
+        else:
+            print('The baseline was recorded with other settings and is not compared:', stored['settings'])
+
+    print('{:<28}{:>10}{:>10}{:>12}'.format('stage', 'seconds', 'peak MB', 'baseline'))
+    for stage in results:
+        before = baseline.get(stage, {}).get('seconds', '')
+        peak = results[stage]['peak_mb']
+        print('{:<28}{:>10}{:>10}{:>12}'.format(stage, results[stage]['seconds'],
+                                                '' if peak is None else peak, before))
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'settings': settings,
+                       'python': platform.python_version(), 'numpy': np.__version__,
+                       'stages': results}, f, indent = 1)
+        print('Baseline written to ' + args.baseline)
+
+    slower = compare_baseline(results, baseline, args.tolerance)
+    for line in errors + slower:
+        print(line, file = sys.stderr)
+    return 1 if errors or slower else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
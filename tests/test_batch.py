@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the settings of headless batch runs (undulation/batch.py) on small synthetic data
+
+import os, json
+import pandas as pd
+import pytest
+
+from undulation import batch
+from undulation.platedata import PlateData
+from undulation.synthetic import write_dataset
+
+# function to write a small synthetic dataset with dropouts, returns the run settings
+@pytest.fixture
+def config(tmp_path):
+    wells = ['A1', 'A2', 'D1', 'D2']
+    write_dataset(str(tmp_path / 'wt'), wells, frames = 1800, dropout = 0.3, seed = 1)
+    write_dataset(str(tmp_path / 'mut'), wells, frames = 1800, dropout = 0.3, seed = 2)
+    return {'conditions': {'WT': str(tmp_path / 'wt'), 'MUT': str(tmp_path / 'mut')},
+            'frames': 1800, 'freq_bin': 3, 'points': ['Body', 'Head'], 'bin_minutes': 1, 'hours': 0.5,
+            'workers': 1, 'report': {'write': False}, 'qc': {'check': False},
+            'output': {'dir': str(tmp_path / 'out'), 'plots': False}}
+
+# function to run the analysis with changed settings, returns the written tables {suffix: table}
+def run(config, **settings):
+    settings = dict(config, **settings)
+    settings['output'] = dict(config['output'], dir = config['output']['dir'] + '_' + str(len(os.listdir(
+        os.path.dirname(config['output']['dir'])))))
+    written = batch.run(batch.complete_config(settings))
+    return {os.path.basename(path).split('_', 1)[1]: pd.read_csv(path) for path in written}
+
+def test_plate_array_with_reuse_results(config, monkeypatch):
+    calls = []
+    from_folders = PlateData.from_folders.__func__
+    def record(cls, *args, **kwargs):
+        calls.append(args)
+        return from_folders(cls, *args, **kwargs)
+    monkeypatch.setattr(PlateData, 'from_folders', classmethod(record))
+    plate = run(config, plate_array = True)
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(plate['AUC_Data.csv'], run(config)['AUC_Data.csv'])
+
+def test_plate_array_with_streaming(config):
+    with pytest.raises(batch.RunFileError):
+        run(config, plate_array = True, streaming = True)
+
+@pytest.mark.parametrize('settings', [{}, {'reuse_results': False}, {'plate_array': True}, {'streaming': True},
+                                      {'store_dir': 'store'}])
+def test_filled_bins_on_all_paths(config, settings):
+    if 'store_dir' in settings:
+        settings = dict(settings, store_dir = os.path.join(os.path.dirname(config['output']['dir']), 'store'))
+    gaps = {'max_gap': 1, 'max_filled': 0.2, 'skip_filled': False}
+    listed = run(config, gaps = gaps, **settings)['Filled_Bins.csv']
+    expected = run(config, gaps = gaps, reuse_results = False)['Filled_Bins.csv']
+    assert len(expected) > 0
+    pd.testing.assert_frame_equal(listed, expected)
+
+@pytest.mark.parametrize('key, value', [('output', None), ('qc', [1, 2]), ('stats', {'resampling': 'yes'})])
+def test_invalid_sections(config, tmp_path, key, value):
+    path = tmp_path / 'run.json'
+    path.write_text(json.dumps(dict(config, **{key: value})))
+    assert batch.main([str(path)]) == batch.EXIT_CONFIG
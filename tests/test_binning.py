@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the binning and AUC (undulation/binning.py) against the original loops
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from undulation.binning import binning, group_summary, trapezoid_auc
+from undulation.plates import Common, PlateLayout
+
+# the counting loop of the original binning(), returns {condition: {key: [count per bin]}}
+def loop_counts(data, binm, hours):
+    counts = {}
+    bin_hour = int((60*hours)/binm)
+    for c in data:
+        counts[c] = {}
+        for e in data[c]:
+            b_start = 0
+            b_end = binm*900
+            counts[c][e] = []
+            for bini in range(1, bin_hour+1):
+                counts[c][e].append(len([s for s in data[c][e] if b_start <= s < b_end]))
+                b_start = b_end
+                b_end += binm*900
+    return counts
+
+# function to create random bin starts of some wells, also beyond the analysed hours
+def random_starts(seed = 0):
+    rng = np.random.default_rng(seed)
+    data = {}
+    for c in ('cond1', 'cond2'):
+        data[c] = {}
+        for w in ('A1', 'B2', 'D4'):
+            data[c]['000022_' + w] = sorted(rng.choice(np.arange(0, 70000, 45), 300, replace = False).tolist())
+    return data
+
+@pytest.mark.parametrize('binm, hours', [(3, 1), (5, 0.5), (1, 1)])
+def test_binning_equals_loop(binm, hours):
+    data = random_starts()
+    counts = loop_counts(data, binm, hours)
+    means = binning(data, binm, hours, Common, 20)
+    for c in data:
+        for e in data[c]:
+            rates = means[(means.Condition == c) & (means.Well == e[-2:])]
+            np.testing.assert_allclose(rates.Undulation_Rate, np.array(counts[c][e])/(20*binm))
+            np.testing.assert_array_equal(rates.Time, np.arange(1, len(counts[c][e]) + 1)*binm)
+            assert (rates.Worm == Common[e[-2:]]).all()
+
+def test_trapezoid_auc():
+    rng = np.random.default_rng(0)
+    x = np.cumsum(rng.uniform(0.5, 2, 30))
+    y = rng.random(30)
+    expected = sum((x[i+1] - x[i])*(y[i+1] + y[i])/2 for i in range(29))
+    assert trapezoid_auc(x, y) == pytest.approx(expected, rel = 1e-12)
+    metrics = pytest.importorskip('sklearn.metrics')
+    assert trapezoid_auc(x, y) == pytest.approx(metrics.auc(x, y), rel = 1e-12)
+
+def test_group_summary():
+    data = random_starts()
+    means = binning(data, 3, 1, Common, 20)
+    plot_ready, areas = group_summary(means, {'cond1': 'WT', 'cond2': 'MUT'})
+    assert len(areas) == 6 and (plot_ready.N == 3).all()
+    for row in areas.itertuples():
+        c = 'cond1' if row.Group == 'WT' else 'cond2'
+        worm = means[(means.Condition == c) & (means.Worm == row.Worm)]
+        assert row.AUC == pytest.approx(trapezoid_auc(worm.Time, worm.Undulation_Rate))
+
+def test_unmapped_wells_left_out(capsys):
+    data = {'cond1': {'000022_A1': [0, 900], '000022_A2': [0], '000022_A3': [45, 90]}}
+    means = binning(data, 1, 0.05, PlateLayout({'A1': 'WT01'}), 1)
+    assert 'A2, A3' in capsys.readouterr().out
+    assert means.Well.unique().tolist() == ['A1'] and (means.Worm == 'WT01').all()
+    plot_ready, areas = group_summary(means, {'cond1': 'WT'})
+    assert areas.Worm.tolist() == ['WT01'] and (plot_ready.N == 1).all()
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the vectorized detection (undulation/detection.py) against the original
+# per-bin loop of frequencies()
+
+import math
+import numpy as np
+import scipy.signal as sp
+import pytest
+
+from undulation.detection import frequencies
+from undulation.io import data_extraction
+from undulation.synthetic import write_dataset
+
+points = ['Body', 'Head']
+
+# the original frequencies() of Undulation_Analysis_V0.2.4.py, one periodogram per bin and body point
+def loop_frequencies(data, frames, bins, points, low = 4, up = 17):
+    freq_list = {}
+    for c in data:
+        freq_list[c] = {}
+        for e in data[c]:
+            l = []
+            for point in points:
+                x_cords = list(data[c][e].x[point])
+                y_cords = list(data[c][e].y[point])
+                for n in range(0, frames, bins):
+                    x_l = x_cords[n:n+bins]
+                    y_l = y_cords[n:n+bins]
+                    dis_moved = math.sqrt((max(x_l) - min(x_l))**2 + (max(y_l) - min(y_l))**2)
+                    if 0.5 < dis_moved < 15:
+                        f, s = sp.periodogram(x_l, fs = 15)
+                        if max(s[low:up]) > max(s[0:low]):
+                            l.append(n)
+                            continue
+                        f, s = sp.periodogram(y_l, fs = 15)
+                        if max(s[low:up]) > max(s[0:low]):
+                            l.append(n)
+            freq_list[c][e] = sorted(set(l))
+    return freq_list
+
+# the frames are no multiple of the bin size, so a trailing partial bin is evaluated as well
+@pytest.mark.parametrize('frames, bins, low, up', [(2000, 45, 4, 17), (2000, 60, 3, 20)])
+def test_vectorized_equals_loop(tmp_path, frames, bins, low, up):
+    write_dataset(str(tmp_path), ['A1', 'A2', 'B1'], frames = frames, bin_len = bins, dropout = 0.2, seed = 3)
+    data = {'cond1': data_extraction(str(tmp_path), cache = False)}
+    for e in data['cond1']:
+        data['cond1'][e].interpolate(inplace = True)
+    expected = loop_frequencies(data, frames, bins, points, low, up)
+    assert any(expected['cond1'].values())
+    assert frequencies(data, frames, bins, points, low, up) == expected
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the gap filling (undulation/gaps.py) against DataFrame.interpolate()
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from undulation.gaps import fill_gaps, fill_table, methods
+
+# function to create (rows x frames) coordinates with gaps of random length, also at the
+# start and the end of the rows
+def gappy(rows = 6, frames = 500, seed = 0):
+    rng = np.random.default_rng(seed)
+    cords = np.cumsum(rng.normal(0, 1, (rows, frames)), axis = 1)
+    for r in range(rows):
+        for start in rng.choice(frames, 15, replace = False):
+            cords[r, start:start + rng.integers(1, 40)] = np.nan
+    cords[0, :10] = np.nan
+    cords[1, -25:] = np.nan
+    return cords
+
+def test_linear_equals_interpolate():
+    cords = gappy()
+    filled, gap = fill_gaps(cords)
+    expected = pd.DataFrame(cords.T).interpolate().to_numpy().T
+    np.testing.assert_allclose(filled, expected, rtol = 0, atol = 1e-12)
+    np.testing.assert_array_equal(gap, np.isnan(cords) & ~np.isnan(expected))
+
+def test_fill_table_equals_interpolate():
+    cords = gappy(rows = 4)
+    columns = pd.MultiIndex.from_product([['x', 'y'], ['Body', 'Head']])
+    df = pd.DataFrame(cords.T, columns = columns)
+    expected = df.interpolate()
+    filled = fill_table(df)
+    pd.testing.assert_frame_equal(df, expected)
+    assert list(filled.columns) == ['Body', 'Head']
+
+@pytest.mark.parametrize('method', methods)
+def test_max_gap_leaves_long_gaps(method):
+    cords = np.sin(np.arange(200)/5)[np.newaxis].repeat(2, axis = 0)
+    cords[0, 20:23] = np.nan    # 3 frames, filled
+    cords[0, 50:60] = np.nan    # 10 frames, too long
+    cords[1, 100:104] = np.nan  # 4 frames, filled
+    cords[1, 150:155] = np.nan  # 5 frames, too long
+    filled, gap = fill_gaps(cords, max_gap = 4, method = method)
+    assert not np.isnan(filled[0, 20:23]).any() and not np.isnan(filled[1, 100:104]).any()
+    assert np.isnan(filled[0, 50:60]).all() and np.isnan(filled[1, 150:155]).all()
+    np.testing.assert_array_equal(gap, np.isnan(cords) & ~np.isnan(filled))
+    # tracked frames are never changed
+    tracked = ~np.isnan(cords)
+    np.testing.assert_array_equal(filled[tracked], cords[tracked])
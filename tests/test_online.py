@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the online detector (undulation/online.py) against the offline analysis
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from undulation import online
+from undulation.online import PlateMonitor, follow_folder, monitor
+from undulation.detection import undulation_bins
+from undulation.gaps import fill_gaps
+from undulation.synthetic import synthetic_well, random_states, write_dataset
+
+points = ['Body', 'Head']
+bins = 45
+
+# function to pivot the rows of a well into (points x frames) arrays of x and y
+def pivot(df, frames):
+    table = df.pivot(index = 'frame_number', columns = 'name', values = ['x', 'y']).reindex(range(frames))
+    return table.x[points].to_numpy().T, table.y[points].to_numpy().T
+
+# function to get the undulation-positive bin starts of a well as found offline
+def offline_bins(df, frames):
+    (x, y), filled = fill_gaps(np.stack(pivot(df, frames)))
+    return undulation_bins(x, y, frames, bins)
+
+# function to feed the rows of wells {well: rows} to a monitor, returns the decisions
+def feed(wells):
+    plate = PlateMonitor(points, bins)
+    decisions = []
+    for well, df in wells.items():
+        for row in df.itertuples(index = False):
+            decisions += plate.feed(well, row.frame_number, row.name, row.x, row.y)
+    return decisions + plate.flush()
+
+# function to get the bin starts of a well decided as undulating
+def positive(decisions, well):
+    return sorted(start for w, start, undulating in decisions if w == well and undulating)
+
+# the dropouts of synthetic wells keep the first and last frame of every bin, bins are
+# therefore decided on the same data as offline
+@pytest.mark.parametrize('dropout', [0.0, 0.1])
+def test_online_equals_offline(dropout):
+    frames = 40*bins
+    rng = np.random.default_rng(1)
+    wells = {}
+    for well in ['000022_A1', '000022_A2']:
+        wells[well] = synthetic_well(random_states(frames, bins, rng), frames, bins, points, dropout = dropout,
+                                     rng = rng)
+    decisions = feed(wells)
+    for well in wells:
+        expected = offline_bins(wells[well], frames)
+        assert expected and positive(decisions, well) == expected
+        assert len([d for d in decisions if d[0] == well]) == frames//bins
+
+# a dropout across the edge of two bins: the end of the first bin is held at its last
+# tracked position, the start of the second bin is interpolated from that position
+def test_dropout_across_bin_edge():
+    frames = 20*bins
+    states = np.tile([2, 0], 10)
+    df = synthetic_well(states, frames, bins, points, rng = 2)
+    edges = [4*bins, 10*bins, 15*bins]
+    gap = np.zeros(frames, dtype = bool)
+    for edge in edges:
+        gap[edge - 20:edge + 10] = True
+    df = df[~gap[df.frame_number.to_numpy()]]
+
+    x, y = pivot(df, frames)
+    cords = np.stack([x, y])
+    expected = []
+    for start in range(0, frames, bins):
+        block = pd.DataFrame(cords[:, :, start:start + bins].reshape(-1, bins).T)
+        if start > 0:
+            # last tracked position before the bin, placed in the frame before it
+            last = pd.DataFrame(cords[:, :, :start].reshape(-1, start).T).ffill().iloc[-1:]
+            block = pd.concat([last, block], ignore_index = True).interpolate().iloc[1:]
+        block = block.interpolate().to_numpy().T.reshape(2, len(points), -1)
+        if undulation_bins(block[0], block[1], bins, bins):
+            expected.append(start)
+
+    found = positive(feed({'000022_A1': df}), '000022_A1')
+    assert found == expected
+    # bins that don't touch an edge are decided as offline
+    offline = offline_bins(df, frames)
+    near = [s for edge in edges for s in (edge - bins, edge)]
+    assert [s for s in found if s not in near] == [s for s in offline if s not in near]
+
+def test_follow_folder_closes_complete_files(tmp_path, monkeypatch):
+    frames = 4*bins
+    write_dataset(str(tmp_path), ['A1', 'A2'], frames = frames, points = points, bin_len = bins)
+    opened = []
+    def record_open(*args, **kwargs):
+        opened.append(open(*args, **kwargs))
+        return opened[-1]
+    # state of the files whenever the folder is polled without new lines
+    polls = []
+    monkeypatch.setattr(online, 'open', record_open, raising = False)
+    monkeypatch.setattr(online.time, 'sleep', lambda seconds: polls.append([f.closed for f in opened]))
+    decisions = []
+    monitor(follow_folder(str(tmp_path), idle = 0.05, frames = frames), points, bins,
+            lambda *d: decisions.append(d), by_file = True)
+    assert len(decisions) == 2*4
+    assert len(opened) == 2 and polls and all(polls[0])
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the reorganisation of loopy output files (undulation/organize.py)
+
+import os, json, hashlib
+
+import pytest
+
+from undulation import organize
+from undulation.organize import PlanError, build_plan, execute_plan, read_manifest
+
+# function to write the loopy output files of the given videos, one per well of the plate
+# (Common, 25 wells) with consecutive numbers. Returns the folder
+def write_loopy(folder, videos = ('000022', '000046'), skip = ()):
+    os.makedirs(folder, exist_ok = True)
+    n = 1
+    for video in videos:
+        for i in range(25):
+            if n not in skip:
+                name = 'd' + 'a'*29 + '%05d' % n + '_vid_' + video + '_x.csv'
+                with open(os.path.join(folder, name), 'w') as f:
+                    f.write('frame_number,name,x,y\n0,Body,' + str(n) + ',1\n')
+            n += 1
+    return folder
+
+def test_build_plan(tmp_path):
+    folder = write_loopy(str(tmp_path / 'out'))
+    plan = build_plan(folder, '20200131', 'exp1')
+    assert len(plan) == 50
+    assert [(video, well) for source, target, video, well in plan[:2]] == [('000022', 'A1'), ('000022', 'A2')]
+    source, target, video, well = plan[0]
+    assert source.endswith('a'*29 + '00001_vid_000022_x.csv')
+    assert target == os.path.join('day', 'wt', '20200131_000022_A1_exp1.csv')
+    # wild-type wells A1-C2, mutant wells C3-E5
+    assert plan[11][1] == os.path.join('day', 'wt', '20200131_000022_C2_exp1.csv')
+    assert plan[12][1] == os.path.join('day', 'mut', '20200131_000022_C3_exp1.csv')
+    assert plan[49][1] == os.path.join('subday', 'mut', '20200131_000046_E5_exp1.csv')
+
+def test_build_plan_missing_file(tmp_path):
+    folder = write_loopy(str(tmp_path / 'out'), skip = [30])
+    with pytest.raises(PlanError, match = 'video 000046: 24 files instead of 25'):
+        build_plan(folder, '20200131', 'exp1')
+    assert not os.path.exists(tmp_path / 'out' / 'exp1')
+
+def test_rerun_after_interruption(tmp_path, monkeypatch):
+    plan = build_plan(write_loopy(str(tmp_path / 'out')), '20200131', 'exp1')
+    root = str(tmp_path / 'exp1')
+
+    # the run is interrupted before the manifest is written
+    def interrupt(root, files):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(organize, 'write_manifest', interrupt)
+    with pytest.raises(KeyboardInterrupt):
+        execute_plan(plan, root, 'copy', 4, None)
+    monkeypatch.undo()
+    assert not os.path.exists(os.path.join(root, organize.manifest_name))
+    assert len(read_manifest(root)) == 50
+
+    done = execute_plan(plan, root, 'copy', 4, None)
+    assert [action for target, action, error in done] == ['skipped']*50
+    assert not os.path.exists(os.path.join(root, organize.journal_name))
+    with open(os.path.join(root, organize.manifest_name)) as f:
+        files = json.load(f)['files']
+    source, target, video, well = plan[0]
+    with open(source, 'rb') as f:
+        assert files[target]['sha256'] == hashlib.sha256(f.read()).hexdigest()
+    with open(os.path.join(root, target)) as f:
+        assert f.read() == 'frame_number,name,x,y\n0,Body,1,1\n'
+
+@pytest.mark.parametrize('mode', ['hardlink', 'symlink'])
+def test_links_not_hashed(tmp_path, monkeypatch, mode):
+    plan = build_plan(write_loopy(str(tmp_path / 'out'), videos = ('000022',)), '20200131', 'exp1')
+    root = str(tmp_path / 'exp1')
+
+    def no_hash(path):
+        raise AssertionError('linked files must not be hashed')
+    monkeypatch.setattr(organize, 'file_hash', no_hash)
+    done = execute_plan(plan, root, mode, 4, None)
+    assert [action for target, action, error in done] == [mode]*25
+    files = read_manifest(root)
+    assert all(files[target]['sha256'] is None for source, target, video, well in plan)
+    source, target, video, well = plan[0]
+    assert os.path.samefile(source, os.path.join(root, target))
+    assert [action for target, action, error in execute_plan(plan, root, mode, 4, None)] == ['skipped']*25
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the plate-level array (undulation/platedata.py) against the dictionary path
+
+import numpy as np
+import pytest
+
+from undulation.io import data_extraction
+from undulation.gaps import fill_table
+from undulation.detection import frequencies
+from undulation.platedata import PlateData
+from undulation.synthetic import write_dataset
+
+points = ['Body', 'Head']
+
+@pytest.mark.parametrize('method', ['linear', 'spline'])
+def test_plate_equals_frequencies(tmp_path, method):
+    cond_loc = {}
+    for i, c in enumerate(('cond1', 'cond2')):
+        cond_loc[c] = str(tmp_path / c)
+        write_dataset(cond_loc[c], ['A1', 'B2', 'E5'], frames = 1800, videos = ('000022', '000046'),
+                      dropout = 0.3, seed = i)
+    data = {c: data_extraction(cond_loc[c], cache = False) for c in cond_loc}
+    filled = {c: {e: fill_table(data[c][e], 5, method) for e in data[c]} for c in data}
+    expected = frequencies(data, 1800, 45, points, filled = filled, max_filled = 0.1)
+    assert any(expected['cond1'].values())
+
+    plate = PlateData.from_folders(cond_loc, 1800, cache = False)
+    assert plate.coords.dtype == np.float64
+    plate.fill_gaps(5, method)
+    assert plate.frequencies(1800, 45, points, max_filled = 0.1) == expected
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the results database (undulation/results.py)
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from undulation.binning import binning, group_summary
+from undulation.plates import Common
+from undulation.results import append_run, query, result_tables, runs
+
+cond_names = {'cond1': 'WT', 'cond2': 'MUT'}
+
+# function to create the result tables of one run from random bin starts of some wells
+def run_tables(experiment, seed = 0):
+    rng = np.random.default_rng(seed)
+    freq_list = {}
+    for c in cond_names:
+        freq_list[c] = {}
+        for w in ('A1', 'B2', 'D4'):
+            freq_list[c]['000022_' + w] = sorted(rng.choice(np.arange(0, 54000, 45), 200, replace = False).tolist())
+    means = binning(freq_list, 3, 1, Common, 20)
+    plot_ready, areas = group_summary(means, cond_names)
+    qc = pd.DataFrame({'Condition': 'cond1', 'Video': '000022', 'Well': ['A1', 'A1', 'B2'],
+                       'Point': ['Body', 'Head', 'Body'], 'Frames': 54000, 'Tracked_Frames': [54000, 50000, 40000],
+                       'Coverage': [1.0, 50000/54000, 40000/54000], 'Gaps': [0, 3, 12],
+                       'Longest_Gap': [0, 900, 4000], 'Pass': [True, True, False]})
+    return result_tables(experiment, means, areas, freq_list, cond_names, qc)
+
+# function to sort a table by all of its columns, for comparisons independent of the row order
+def sorted_table(df):
+    return df.sort_values(list(df.columns)).reset_index(drop = True)
+
+def test_append_and_query(tmp_path):
+    db = str(tmp_path / 'results.sqlite')
+    first = run_tables('exp1', seed = 0)
+    second = run_tables('exp1', seed = 1)
+    other = run_tables('exp2', seed = 2)
+    assert append_run(db, 'exp1', {'freq_bin': 3}, first) == 1
+    assert append_run(db, 'exp1', {'freq_bin': 2}, second) == 2
+    assert append_run(db, 'exp2', {'freq_bin': 3}, other) == 3
+
+    table = runs(db)
+    assert table.Run.tolist() == [1, 2, 3] and table.Parameters[1] == {'freq_bin': 2}
+    assert runs(db, experiment = 'exp2').Run.tolist() == [3]
+
+    # stored values equal the tables of the run
+    for name in ('rates', 'auc', 'qc'):
+        stored = query(db, name, run = 1).drop(columns = 'Run')
+        expected = first[name]
+        if name == 'qc':
+            expected = expected.assign(Pass = expected.Pass.astype('boolean'))
+        pd.testing.assert_frame_equal(sorted_table(stored), sorted_table(expected), check_dtype = False)
+    assert query(db, 'qc', run = 1).Worm.tolist() == [Common['A1'], Common['A1'], Common['B2']]
+
+    # filters by value and by list of values
+    auc = query(db, 'auc', experiment = 'exp1', condition = 'WT', well = ['A1', 'D4'])
+    assert auc.Run.tolist() == [1, 1, 2, 2] and set(auc.Well) == {'A1', 'D4'}
+    mutants = query(db, 'rates', genotype = 'MUT')
+    assert (mutants.Genotype == 'MUT').all() and set(mutants.Well) == {'D4'}
+
+    # only the latest run of every experiment and condition
+    latest = query(db, 'auc', latest = True)
+    assert sorted(set(zip(latest.Experiment, latest.Run))) == [('exp1', 2), ('exp2', 3)]
+    np.testing.assert_allclose(sorted(latest[latest.Run == 2].AUC), sorted(second['auc'].AUC))
+
+def test_query_errors(tmp_path):
+    db = str(tmp_path / 'results.sqlite')
+    with pytest.raises(ValueError, match = 'Unknown result table'):
+        query(db, 'frames')
+    with pytest.raises(ValueError, match = 'Unknown filters'):
+        query(db, 'qc', genotype = 'WT')
+    with pytest.raises(ValueError, match = 'Unknown columns'):
+        query(db, 'auc', columns = ['AUC', 'Time'])
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the discovery of condition folders by the scheduler (undulation/scheduler.py)
+
+import os
+
+from undulation.scheduler import discover, pending_jobs
+from undulation.synthetic import write_dataset
+
+def test_discover_any_genotype(tmp_path):
+    for folder in ('exp1/day/wt', 'exp1/subday/unc-13', 'exp2/day/mut'):
+        write_dataset(str(tmp_path / folder), ['A1'], frames = 100)
+    os.makedirs(tmp_path / 'exp1' / 'day' / 'empty')
+    os.makedirs(tmp_path / 'exp1' / 'notes' / 'wt')
+    write_dataset(str(tmp_path / 'out' / 'exp1' / 'day' / 'wt'), ['A1'], frames = 100)
+
+    jobs = discover(str(tmp_path), skip = [str(tmp_path / 'out')])
+    assert [job['id'] for job in jobs] == ['exp1/day/wt', 'exp1/subday/unc-13', 'exp2/day/mut']
+    assert jobs[1]['genotype'] == 'unc-13' and jobs[1]['period'] == 'subday'
+
+    manifest = {'jobs': {'exp1/day/wt': {'status': 'done'}, 'exp2/day/mut': {'status': 'failed'}}}
+    assert [job['id'] for job in pending_jobs(jobs, manifest, retry_failed = False)] == ['exp1/subday/unc-13']
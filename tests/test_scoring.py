@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the rasterization of manual scorings (undulation/scoring.py) against the
+# original frame loop of PlotManualScorings.py
+
+import numpy as np
+import pandas as pd
+
+from undulation.scoring import interval_mask, scoring_rates, read_scorings
+
+# the original loop of PlotManualScorings.py, returns the per-frame mask and the binned rates
+def loop_rates(df, frames, bins, first_frame = 0):
+    start = list(df[df['Behaviour'] == 'Undulation'].Start_Frame)
+    stop = list(df[df['Behaviour'] == 'Undulation'].Stop_Frame)
+    undulation = {}
+    count = {}
+    for f in range(frames):
+        for i in range(len(start)):
+            if f >= start[i] and f <= stop[i]:
+                undulation[f] = True
+    for fr in range(first_frame, frames, bins):
+        x = (fr + bins)/900
+        count[x] = 0
+        for fra in range(fr, fr + bins):
+            if fra in undulation.keys():
+                count[x] += 1
+        count[x] /= bins
+    mask = np.array([f in undulation for f in range(frames)])
+    return mask, pd.DataFrame(dict(Time = list(count.keys()), Undulation_Rate = list(count.values())))
+
+# function to create a scoring table with overlapping, touching, fractional and out of range events
+def scoring_table(frames, seed = 0):
+    rng = np.random.default_rng(seed)
+    start = rng.uniform(-50, frames, 40)
+    stop = start + rng.uniform(-5, 200, 40)
+    start[:3] = [10, 20, 30.5]
+    stop[:3] = [20, 25, 30.2]
+    behaviour = np.where(rng.random(40) < 0.8, 'Undulation', 'Other')
+    return pd.DataFrame(dict(Behaviour = behaviour, Start_Frame = start, Stop_Frame = stop))
+
+def test_mask_and_rates_equal_loop():
+    frames = 3000
+    for seed in range(3):
+        df = scoring_table(frames, seed)
+        mask, rates = loop_rates(df, frames, 450, first_frame = 100)
+        events = df[df.Behaviour == 'Undulation']
+        np.testing.assert_array_equal(interval_mask(events.Start_Frame, events.Stop_Frame, frames), mask)
+        pd.testing.assert_frame_equal(scoring_rates({'A1': df}, frames, 450, 100)['A1'], rates)
+
+def test_read_scorings_wells(tmp_path):
+    df = scoring_table(100)
+    for name in ('exp_A1.csv', 'exp_H12.csv', 'notes.txt'):
+        df.to_csv(tmp_path / name, index = False)
+    assert sorted(read_scorings(str(tmp_path))) == ['A1', 'H12']
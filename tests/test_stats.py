@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the multiple-testing corrections and the resampling tests (undulation/stats.py)
+
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from undulation.stats import fdr_bh, holm, resampling_tests
+
+# the step-down Holm correction written out as a loop
+def loop_holm(p):
+    m = len(p)
+    out = [0.0]*m
+    running = 0.0
+    for rank, i in enumerate(sorted(range(m), key = lambda i: p[i])):
+        running = max(running, (m - rank)*p[i])
+        out[i] = min(running, 1.0)
+    return out
+
+# the step-up Benjamini-Hochberg correction written out as a loop
+def loop_fdr(p):
+    m = len(p)
+    out = [0.0]*m
+    running = 1.0
+    for rank, i in reversed(list(enumerate(sorted(range(m), key = lambda i: p[i])))):
+        running = min(running, p[i]*m/(rank + 1))
+        out[i] = running
+    return out
+
+# function to create an AUC table of some groups of worms (see group_summary)
+def auc_table(sizes = (8, 8, 6), shift = 1.0, seed = 0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for k, n in enumerate(sizes):
+        for i, auc in enumerate(rng.normal(k*shift, 1, n)):
+            rows.append({'Group': 'G' + str(k), 'Worm': 'W' + str(i).zfill(2), 'AUC': auc})
+    return pd.DataFrame(rows)
+
+@pytest.mark.parametrize('seed', range(5))
+def test_corrections(seed):
+    rng = np.random.default_rng(seed)
+    p = rng.random(12)**3
+    # ties and values close to 1
+    p[3] = p[7]
+    p[5] = 0.99
+    np.testing.assert_allclose(holm(p), loop_holm(p), rtol = 1e-12)
+    np.testing.assert_allclose(fdr_bh(p), loop_fdr(p), rtol = 1e-12)
+    stats = pytest.importorskip('scipy.stats')
+    if hasattr(stats, 'false_discovery_control'):
+        np.testing.assert_allclose(fdr_bh(p), stats.false_discovery_control(p), rtol = 1e-12)
+
+def test_resampling_independent_of_workers():
+    table = auc_table()
+    one = resampling_tests(table, n_boot = 3000, n_perm = 3000, seed = 7, workers = 1, chunk = 500)
+    two = resampling_tests(table, n_boot = 3000, n_perm = 3000, seed = 7, workers = 2, chunk = 500)
+    pd.testing.assert_frame_equal(one, two)
+    other = resampling_tests(table, n_boot = 3000, n_perm = 3000, seed = 8, workers = 1, chunk = 500)
+    assert not np.array_equal(one.CI_Low, other.CI_Low)
+
+    assert [(r.Group1, r.Group2) for r in one.itertuples()] == [('G0', 'G1'), ('G0', 'G2'), ('G1', 'G2')]
+    assert ((one.CI_Low < one.Difference) & (one.Difference < one.CI_High)).all()
+    np.testing.assert_allclose(one.p_Holm, holm(one.p))
+    assert (one.Significant == (one.p_Holm < 0.05)).all()
+
+def test_permutation_p_value():
+    table = auc_table(sizes = (4, 4), shift = 1.5, seed = 3)
+    values = [table.AUC[table.Group == g].to_numpy() for g in ('G0', 'G1')]
+    pooled = np.concatenate(values)
+    observed = abs(values[0].mean() - values[1].mean())
+    # all 70 splits of the 8 worms into two groups of 4
+    splits = list(itertools.combinations(range(8), 4))
+    exact = np.mean([abs(pooled[list(s)].mean() - np.delete(pooled, s).mean()) >= observed - 1e-12
+                     for s in splits])
+    result = resampling_tests(table, n_boot = 100, n_perm = 20000, seed = 1)
+    assert result.p[0] == pytest.approx(exact, abs = 0.01)
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+# Checks of the memory-mapped coordinate store (undulation/store.py) against the analysis
+# of the extracted data
+
+import pandas as pd
+import pytest
+
+from undulation.io import data_extraction
+from undulation.gaps import fill_table
+from undulation.detection import frequencies
+from undulation.movement import movement, stored_movement
+from undulation.store import build_store, store_frequencies
+from undulation.synthetic import write_dataset
+
+points = ['Body', 'Head']
+
+# function to write a small synthetic dataset with dropouts and its store, returns the
+# locations of the dataset and the store
+@pytest.fixture
+def store(tmp_path):
+    data = str(tmp_path / 'data')
+    write_dataset(data, ['A1', 'A2', 'B1'], frames = 1800, dropout = 0.3, seed = 4)
+    build_store(str(tmp_path / 'store'), {'cond1': data}, cache = False)
+    return data, str(tmp_path / 'store')
+
+@pytest.mark.parametrize('method', ['linear', 'kalman'])
+def test_store_equals_frequencies(store, method):
+    data, root = store
+    extracted = {'cond1': data_extraction(data, cache = False)}
+    filled = {'cond1': {e: fill_table(df, 3, method) for e, df in extracted['cond1'].items()}}
+    expected = frequencies(extracted, 1800, 45, points, filled = filled, max_filled = 0.2)
+    assert any(expected['cond1'].values())
+    assert store_frequencies(root, 1800, 45, points, max_gap = 3, method = method, max_filled = 0.2) == expected
+
+def test_stored_movement(store):
+    data, root = store
+    extracted = data_extraction(data, cache = False)
+    for key in extracted:
+        pd.testing.assert_frame_equal(stored_movement(root, 'cond1', [key], 900, points),
+                                      movement([extracted[key]], 900, points))
@@ -0,0 +1,10 @@
+# -*- coding: utf-8 -*-
+
+# undulation - importable building blocks for the undulation analysis of
+# tracking files created by the deep learning software "loopy" by LoopBio GmbH.
+# The scripts in the repository root use these modules for the heavy lifting.
+#
+# Importing the package or its compute modules (io, qc, detection, binning, stats, ...)
+# does not load the plotting stack or scipy.stats, these are imported by the functions
+# that need them. Command line tools: python -m undulation {batch,schedule,organize,
+# calibrate,online} (see undulation/__main__.py).
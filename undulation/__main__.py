@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+# Command line entry point of the package, the command selects the module whose main()
+# is run with the remaining arguments. Modules are only imported when their command is
+# used, so e.g. a batch run does not load the plotting stack unless plots are written:
+#
+#   python -m undulation batch run.json --workers 8
+#   python -m undulation organize D:/loopy/out --date 20200131 --experiment exp1
+#   python -m undulation calibrate D:/exp1/day/wt D:/exp1/scorings
+
+import sys, importlib
+
+# command: module with a main(argv) function
+commands = {'batch': 'undulation.batch',
+            'schedule': 'undulation.scheduler',
+            'organize': 'undulation.organize',
+            'calibrate': 'undulation.calibration',
+            'online': 'undulation.online'}
+
+def main(argv = None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in commands:
+        print('usage: python -m undulation {' + ','.join(commands) + '} [arguments]', file = sys.stderr)
+        return 0 if argv and argv[0] in ('-h', '--help') else 2
+    return importlib.import_module(commands[argv[0]]).main(argv[1:])
+
+if __name__ == '__main__':
+    sys.exit(main())
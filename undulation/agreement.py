@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+# Agreement of the tracker with manual scorings. The undulation-positive bins of
+# all scored worms (from frequencies(), {key: bin starts}) and their scorings
+# (Start_Frame/Stop_Frame events, see undulation/scoring.py) are rasterised into
+# one (worms x frames) mask each with difference arrays, all worms at once. A
+# positive bin marks its frames, with overlapping bins (hop) every window marks
+# the hop frames around its centre (see frame_mask in undulation/detection.py).
+#
+# At frame resolution every frame is compared, at bin resolution the masks are
+# reduced to consecutive bins of 'bins' frames first (a bin is marked if at least
+# half of its frames are). Per worm and per genotype the confusion matrix (TP, FP,
+# FN, TN), Cohen's kappa, precision, recall and F1 are reported. Episodes are runs
+# of marked frames, the rows of the masks are separated by an unmarked frame, so
+# the episodes of all worms are found and matched in one pass: a scored episode
+# is detected if a machine episode overlaps it, latencies (in seconds) are the
+# differences of onset and offset of the first overlapping machine episode
+# (positive = the machine is late).
+
+import numpy as np
+import pandas as pd
+
+from undulation.io import split_key
+from undulation.plates import Common, as_layout
+from undulation.scoring import read_scorings
+
+# columns of the agreement tables
+count_columns = ['TP', 'FP', 'FN', 'TN']
+
+# function to calculate agreement measures from counts of true/false positives/negatives
+# (arrays of the same shape), returns a dictionary of arrays
+def agreement_metrics(tp, fp, fn, tn):
+    tp, fp, fn, tn = (np.asarray(a, dtype = float) for a in (tp, fp, fn, tn))
+    n = tp + fp + fn + tn
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        precision = tp/(tp + fp)
+        recall = tp/(tp + fn)
+        observed = (tp + tn)/n
+        # agreement expected by chance from the marginal rates of machine and human
+        expected = ((tp + fp)*(tp + fn) + (fn + tn)*(fp + tn))/n**2
+        return {'Accuracy': observed, 'Precision': precision, 'Recall': recall,
+                'F1': 2*tp/(2*tp + fp + fn), 'Kappa': (observed - expected)/(1 - expected)}
+
+# function to create a (rows x frames) mask from intervals [start, stop) given with the
+# row they belong to, all rows at once by a flat difference array
+def interval_rows(rows, start, stop, n_rows, frames):
+    start = np.clip(np.asarray(start, dtype = np.int64), 0, frames)
+    stop = np.clip(np.asarray(stop, dtype = np.int64), 0, frames)
+    keep = start < stop
+    rows = np.asarray(rows, dtype = np.int64)[keep]
+    diff = np.zeros((n_rows, frames + 1), dtype = np.int64)
+    np.add.at(diff, (rows, start[keep]), 1)
+    np.add.at(diff, (rows, stop[keep]), -1)
+    return np.cumsum(diff[:, :frames], axis = 1) > 0
+
+# function to create the machine masks (worms x frames) from the bin starts of every worm,
+# bins of 'bins' frames or, with hop, the hop frames around the centre of every window
+def machine_masks(starts, frames, bins, hop = None):
+    rows = np.repeat(np.arange(len(starts)), [len(s) for s in starts])
+    first = np.concatenate([np.asarray(s, dtype = np.int64) for s in starts] + [np.zeros(0, dtype = np.int64)])
+    length = bins
+    if hop is not None and hop != bins:
+        first = first + (bins - hop)//2
+        length = hop
+    return interval_rows(rows, first, first + length, len(starts), frames)
+
+# function to create the manual masks (worms x frames) from the scoring tables of every
+# worm, a frame f is marked if start <= f <= stop for any event (see interval_mask)
+def manual_masks(scorings, frames, behaviour = 'Undulation'):
+    events = [df[df['Behaviour'] == behaviour] for df in scorings]
+    rows = np.repeat(np.arange(len(events)), [len(e) for e in events])
+    start = np.concatenate([np.ceil(e.Start_Frame.to_numpy(dtype = float)) for e in events] + [np.zeros(0)])
+    stop = np.concatenate([np.floor(e.Stop_Frame.to_numpy(dtype = float)) + 1 for e in events] + [np.zeros(0)])
+    return interval_rows(rows, start, stop, len(events), frames)
+
+# function to reduce (worms x frames) masks to consecutive bins of 'bins' frames, a bin is
+# marked if at least 'threshold' of its frames are (a trailing partial bin by its own frames)
+def bin_masks(masks, bins, threshold = 0.5):
+    n_bins = -(-masks.shape[1] // bins)
+    padded = np.zeros((masks.shape[0], n_bins*bins), dtype = bool)
+    padded[:, :masks.shape[1]] = masks
+    sizes = np.minimum(bins, masks.shape[1] - np.arange(n_bins)*bins)
+    return padded.reshape(masks.shape[0], n_bins, bins).sum(axis = 2) >= threshold*sizes
+
+# function to get the episodes (runs of marked frames) of all rows of masks, returns the
+# row, onset and offset (last marked frame) of every episode in row and time order
+def episodes(masks):
+    width = masks.shape[1] + 1
+    # an unmarked frame after every row keeps episodes of different rows apart
+    flat = np.zeros((masks.shape[0], width), dtype = np.int8)
+    flat[:, :-1] = masks
+    edges = np.diff(np.r_[0, flat.ravel(), 0])
+    onset = np.flatnonzero(edges == 1)
+    offset = np.flatnonzero(edges == -1) - 1
+    return onset // width, onset % width, offset % width
+
+# function to match the scored episodes with the machine episodes of all worms, returns the
+# row, onset and offset of every scored episode, whether it was detected and the onset and
+# offset latency in frames (0 if not detected)
+def match_episodes(manual, machine):
+    width = manual.shape[1] + 1
+    rows, on, off = episodes(manual)
+    m_rows, m_on, m_off = episodes(machine)
+    if len(m_on) == 0:
+        zeros = np.zeros(len(on), dtype = np.int64)
+        return rows, on, off, zeros.astype(bool), zeros, zeros
+    # first machine episode ending at or after the onset of the scored episode, positions
+    # are global frames (row*width + frame), episodes of different rows can't overlap
+    first = np.searchsorted(m_rows*width + m_off, rows*width + on)
+    valid = first < len(m_on)
+    first = np.minimum(first, len(m_on) - 1)
+    detected = valid & (m_rows[first]*width + m_on[first] <= rows*width + off)
+    onset = np.where(detected, m_on[first] - on, 0)
+    offset = np.where(detected, m_off[first] - off, 0)
+    return rows, on, off, detected, onset, offset
+
+# function to get the worms of a condition that have a scoring, as list of (key, well). The
+# scorings belong to one video, by default the first one of the condition
+def scored_keys(freq_list, scoring, video = None):
+    keys = [(key,) + split_key(key) for key in freq_list]
+    if video is None and keys:
+        video = keys[0][1]
+    return [(key, well) for key, v, well in keys if v == video and well in scoring]
+
+# function to add the agreement measures (see agreement_metrics) to a table with counts
+def add_metrics(table):
+    for name, values in agreement_metrics(*(table[c] for c in count_columns)).items():
+        table[name] = values
+    return table
+
+# function to compare the tracker with the manual scorings of all scored worms of one condition.
+# freq_list holds the bin starts {key: [starts]} (see frequencies()), scoring the scoring tables
+# {well: table}, bins and hop are given in frames. Returns a table with one row per worm and
+# a table with one row per scored episode
+def worm_agreement(freq_list, scoring, frames, bins, hop = None, layout = Common, resolution = 'bin',
+                   video = None, behaviour = 'Undulation'):
+    if resolution not in ('frame', 'bin'):
+        raise ValueError('Unknown resolution "' + str(resolution) + '", use frame or bin')
+    layout = as_layout(layout)
+    keys = scored_keys(freq_list, scoring, video)
+    machine = machine_masks([freq_list[key] for key, well in keys], frames, bins, hop)
+    manual = manual_masks([scoring[well] for key, well in keys], frames, behaviour)
+
+    compared_machine, compared_manual = machine, manual
+    if resolution == 'bin':
+        compared_machine, compared_manual = bin_masks(machine, bins), bin_masks(manual, bins)
+    table = pd.DataFrame({'Key': [key for key, well in keys], 'Well': [well for key, well in keys]})
+    layout.assign(table)
+    table['TP'] = (compared_machine & compared_manual).sum(axis = 1)
+    table['FP'] = (compared_machine & ~compared_manual).sum(axis = 1)
+    table['FN'] = (~compared_machine & compared_manual).sum(axis = 1)
+    table['TN'] = (~compared_machine & ~compared_manual).sum(axis = 1)
+    add_metrics(table)
+    table['Machine_Ratio'] = machine.mean(axis = 1)
+    table['Manual_Ratio'] = manual.mean(axis = 1)
+
+    # scored episodes, median latencies per worm (seconds, 15 frames per second)
+    rows, on, off, detected, onset, offset = match_episodes(manual, machine)
+    scored = pd.DataFrame({'Key': table.Key.to_numpy()[rows], 'Well': table.Well.to_numpy()[rows],
+                           'Worm': table.Worm.to_numpy()[rows], 'Genotype': table.Genotype.to_numpy()[rows],
+                           'Start_Frame': on, 'Stop_Frame': off, 'Detected': detected,
+                           'Onset_Latency': np.where(detected, onset/15, np.nan),
+                           'Offset_Latency': np.where(detected, offset/15, np.nan)})
+    table['Episodes'] = np.bincount(rows, minlength = len(keys))
+    table['Detected'] = np.bincount(rows, weights = detected, minlength = len(keys)).astype(np.int64)
+    latency = scored.groupby(rows)[['Onset_Latency', 'Offset_Latency']].median().reindex(range(len(keys)))
+    table['Onset_Latency'] = latency.Onset_Latency.to_numpy()
+    table['Offset_Latency'] = latency.Offset_Latency.to_numpy()
+    return table, scored
+
+# function to summarise the agreement of all worms per genotype, counts are summed and the
+# measures calculated from the sums, latencies are the medians of all detected episodes
+def genotype_agreement(worms, scored):
+    groups = worms.groupby('Genotype', sort = False)
+    table = groups[count_columns + ['Episodes', 'Detected']].sum()
+    table.insert(0, 'Worms', groups.size())
+    add_metrics(table)
+    latency = scored.groupby('Genotype', sort = False)[['Onset_Latency', 'Offset_Latency']].median()
+    table['Onset_Latency'] = latency.Onset_Latency.reindex(table.index)
+    table['Offset_Latency'] = latency.Offset_Latency.reindex(table.index)
+    return table.reset_index()
+
+# function to get the confusion matrix (manual x machine) of one row of an agreement table
+def confusion_matrix(row):
+    labels = ['Undulation', 'No undulation']
+    return pd.DataFrame([[row['TP'], row['FN']], [row['FP'], row['TN']]],
+                        index = pd.Index(labels, name = 'Manual'), columns = pd.Index(labels, name = 'Machine'))
+
+# function to compare the tracker with the scorings in a folder (see read_scorings), returns
+# the tables per worm, per genotype and per scored episode
+def agreement(freq_list, score_loc, frames, bins, hop = None, layout = Common, resolution = 'bin', video = None):
+    worms, scored = worm_agreement(freq_list, read_scorings(score_loc), frames, bins, hop, layout, resolution,
+                                   video)
+    return worms, genotype_agreement(worms, scored), scored
@@ -0,0 +1,490 @@
+# -*- coding: utf-8 -*-
+
+# Headless batch run of the undulation analysis. All questions of the interactive
+# script (Undulation_Analysis_V0.2.4.py) are answered by a run file in JSON, TOML
+# or YAML format, single settings can be overwritten by command line flags:
+#
+#   python -m undulation.batch run.json --workers 8 --output results
+#
+# The run covers extraction -> coverage check -> frequency extraction -> binning
+# -> AUC -> statistics -> CSV/PNG export. The time and memory used by every stage
+# is written to a run report (date_Run_Report.json/.csv, see undulation/instrument.py).
+# Exit status:
+#   0 = success, 1 = analysis failed, 2 = invalid run file or arguments,
+#   3 = no tracking data found
+#
+# Example run file (JSON):
+#   {"conditions": {"WT": "D:/exp1/day/wt", "MUT": "D:/exp1/day/mut"},
+#    "frames": 54000, "freq_bin": 3, "points": ["Body", "Head"],
+#    "bin_minutes": 3, "hours": 1, "layout": "common",
+#    "qc": {"check": true, "exclude_suggested": true, "include": [], "exclude": [],
+#           "min_coverage": 0.9, "max_gap": 60, "window": 5, "min_window_coverage": 0.5},
+#    "gaps": {"max_gap": 2, "method": "linear", "max_filled": 0.2, "skip_filled": true},
+#    "stats": {"pairs": [["WT", "MUT"]], "independent": true,
+#              "resampling": {"run": true, "n_boot": 10000, "n_perm": 10000, "correction": "holm"}},
+#    "agreement": {"scorings": "D:/exp1/scorings", "condition": "WT", "resolution": "bin"},
+#    "results": {"db": "D:/results.sqlite", "experiment": "exp1"},
+#    "output": {"dir": "D:/exp1/results", "title": "Undulation ZT8"}}
+
+import os, sys, json, argparse, traceback
+import datetime as dt
+
+# settings used if not given in the run file
+# (hop: seconds between overlapping frequency bins, None = bins do not overlap)
+defaults = {'interpolate': True, 'layout': 'common', 'low': 4, 'up': 17, 'hop': None,
+            'workers': None, 'streaming': False, 'store_dir': None, 'cache': True,
+            # plate_array overrides reuse_results (see extract_frequencies)
+            'reuse_results': True, 'plate_array': False,
+            'report': {'write': True, 'format': 'json', 'progress': False},
+            # max_gap in seconds, window in minutes (None = not checked)
+            'qc': {'check': True, 'exclude_suggested': True, 'include': [], 'exclude': [],
+                   'min_coverage': 0.9, 'max_gap': None, 'window': None, 'min_window_coverage': None,
+                   'export': True},
+            # gap filling (see undulation/gaps.py): max_gap in seconds (None = all gaps are filled),
+            # method 'linear', 'spline' or 'kalman'. Bins of a body point with more than max_filled
+            # (fraction) filled frames are skipped, or with skip_filled = False only listed
+            'gaps': {'max_gap': None, 'method': 'linear', 'max_filled': None, 'skip_filled': True},
+            # resampling: bootstrap CIs and permutation tests of all pairs of conditions (or the
+            # given pairs), see resampling_tests in undulation/stats.py
+            'stats': {'pairs': [], 'independent': True,
+                      'resampling': {'run': False, 'n_boot': 10000, 'n_perm': 10000, 'confidence': 0.95,
+                                     'correction': 'holm', 'alpha': 0.05, 'seed': 0, 'chunk': 1000}},
+            # comparison with manual scorings (see undulation/agreement.py): folder of the scoring
+            # files, the condition and video they belong to (None = first one) and 'bin' or 'frame'
+            'agreement': {'scorings': None, 'condition': None, 'video': None, 'resolution': 'bin'},
+            # results database the run is appended to (see undulation/results.py), the
+            # experiment defaults to the name of the output folder
+            'results': {'db': None, 'experiment': None},
+            'output': {'dir': '.', 'plots': True, 'auc': True, 'title': 'Undulation',
+                       'x_label': 'Time [min]', 'start_x': 0}}
+
+required = ['conditions', 'frames', 'freq_bin', 'points', 'bin_minutes', 'hours']
+
+# exit status of a run
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_CONFIG = 2
+EXIT_NO_DATA = 3
+
+# raised for run files that can't be read or miss required settings
+class RunFileError(ValueError):
+    pass
+
+# raised if a condition does not contain any tracking files
+class NoDataError(RuntimeError):
+    pass
+
+# function to read a run file, the format is chosen by the file extension
+def read_run_file(path):
+    ext = os.path.splitext(path)[1].lower()
+    try:
+        with open(path, 'rb') as f:
+            if ext == '.json':
+                return json.load(f)
+            if ext == '.toml':
+                try:
+                    import tomllib
+                except ImportError:
+                    import tomli as tomllib
+                return tomllib.load(f)
+            if ext in ('.yaml', '.yml'):
+                try:
+                    import yaml
+                except ImportError:
+                    raise RunFileError('Reading YAML run files requires PyYAML.')
+                return yaml.safe_load(f)
+    except (OSError, ValueError) as err:
+        if isinstance(err, RunFileError):
+            raise
+        raise RunFileError('Could not read run file ' + path + ': ' + str(err))
+    raise RunFileError('Unknown run file format "' + ext + '" (use .json, .toml or .yaml)')
+
+# function to get a section of settings (a table) of the run file, empty if not given
+def section(config, key, name):
+    value = config.get(key, {})
+    if not isinstance(value, dict):
+        raise RunFileError('"' + name + '" must be a table of settings (found: ' + str(value) + ').')
+    return value
+
+# function to combine the settings of a run file with the defaults and check them for completeness
+def complete_config(config):
+    if not isinstance(config, dict):
+        raise RunFileError('The run file must contain a table of settings.')
+
+    missing = [key for key in required if key not in config]
+    if missing:
+        raise RunFileError('The run file misses the settings: ' + ', '.join(missing))
+    if not isinstance(config['conditions'], dict) or len(config['conditions']) == 0:
+        raise RunFileError('"conditions" must map condition names to data folders.')
+
+    for key in defaults:
+        if isinstance(defaults[key], dict):
+            config[key] = dict(defaults[key], **section(config, key, key))
+            for sub in defaults[key]:
+                if isinstance(defaults[key][sub], dict):
+                    config[key][sub] = dict(defaults[key][sub], **section(config[key], sub, key + '.' + sub))
+        else:
+            config.setdefault(key, defaults[key])
+    return config
+
+# function to read a run file and complete it with the defaults
+def load_config(path):
+    return complete_config(read_run_file(path))
+
+# function to apply command line flags to the configuration
+def apply_flags(config, args):
+    if args.workers is not None:
+        config['workers'] = None if args.workers == 0 else args.workers
+    if args.output is not None:
+        config['output']['dir'] = args.output
+    if args.streaming:
+        config['streaming'] = True
+    if args.store_dir is not None:
+        config['store_dir'] = args.store_dir
+    if args.no_cache:
+        config['cache'] = False
+    if args.recompute:
+        config['reuse_results'] = False
+    if args.no_plots:
+        config['output']['plots'] = False
+    if args.progress:
+        config['report']['progress'] = True
+    return config
+
+# function to get the wells that are excluded from the analysis, based on the wells
+# suggested by the coverage check and the wells given in the run file
+def excluded_wells(suggested, qc):
+    excluded = []
+    if qc['exclude_suggested']:
+        excluded = [w for w in suggested if w not in qc['include']]
+    for w in qc['exclude']:
+        if w not in excluded:
+            excluded.append(w)
+    return excluded
+
+# function to get the number of frames between the starts of two frequency bins
+def hop_frames(config):
+    if config['hop'] is None:
+        return int(config['freq_bin']*15)
+    return int(config['hop']*15)
+
+# function to extract undulation-positive bins for all conditions {'cond1': path, ...}
+# following the settings of the run, returns the freq_list dictionary, the excluded wells,
+# the QC tables (per body point and per window, see undulation/qc.py; None if not checked)
+# and the table of bins with too many filled frames (None if max_filled is not set)
+def extract_frequencies(config, cond_loc):
+    from undulation.io import data_extraction
+    from undulation.qc import remove_data, data_tracked, plate_qc, qc_exclusions
+    from undulation.detection import frequencies, filled_fraction
+    from undulation.gaps import fill_table, filled_table
+    from undulation.pipeline import qc_files, stream_frequencies
+    from undulation.store import build_store, qc_store, store_frequencies
+    from undulation.instrument import stage
+    from undulation.platedata import PlateData
+    from undulation.plates import get_layout
+
+    frames = config['frames']
+    freq_bin = int(config['freq_bin']*15) #15 frames per second
+    workers = config['workers']
+    store_dir = config['store_dir']
+    reuse = config['reuse_results']
+
+    # with reuse_results, tracking files are analysed one at a time (as in streaming mode),
+    # so that files with cached results are not read at all. plate_array takes precedence
+    # over reuse_results: all data is then held in memory and cached results are not used
+    per_file = not config['plate_array'] and (config['streaming'] or reuse)
+
+    # with plate_array, the data of all conditions is held in one array (see undulation/platedata.py)
+    plate = None
+    extr_data = {}
+    if store_dir is not None:
+        print('Writing coordinate store...')
+        build_store(store_dir, cond_loc, config['cache'], workers = workers)
+    elif config['plate_array']:
+        print('Extracting data...')
+        plate = PlateData.from_folders(cond_loc, frames, layout = get_layout(config['layout']),
+                                       cache = config['cache'], workers = workers)
+    elif per_file:
+        pass
+    else:
+        print('Extracting data...')
+        for c in cond_loc:
+            extr_data[c] = data_extraction(cond_loc[c], workers, config['cache'])
+
+    suggested = []
+    tables = (None, None)
+    qc = config['qc']
+    if qc['check']:
+        print('Checking for complete tracking...')
+        window = int(qc['window']*900) if qc['window'] else None
+        if store_dir is not None:
+            tables = qc_store(store_dir, frames, window)
+        elif per_file:
+            tables = qc_files(cond_loc, frames, window, config['cache'], workers, reuse)
+        elif plate is not None:
+            tables = plate_qc(*plate.tracked(frames), window)
+        else:
+            tables = plate_qc(*data_tracked(extr_data, frames), window)
+        max_gap = int(qc['max_gap']*15) if qc['max_gap'] is not None else None
+        suggested = qc_exclusions(*tables, qc['min_coverage'], max_gap, qc['min_window_coverage'])
+    excluded = excluded_wells(suggested, config['qc'])
+    remove_data(extr_data, excluded)
+    if plate is not None:
+        plate.remove(excluded)
+
+    hop = hop_frames(config)
+    gaps = config['gaps']
+    max_gap = int(gaps['max_gap']*15) if gaps['max_gap'] is not None else None
+    max_filled = gaps['max_filled'] if gaps['skip_filled'] else None
+    fill = dict(max_gap = max_gap, method = gaps['method'], max_filled = max_filled)
+    flagged = None
+    # the fractions of filled frames are only needed to list the bins above max_filled
+    fractions = config['interpolate'] and gaps['max_filled'] is not None
+    print('Extracting dominant frequency indices... (' + str(freq_bin/15) + 's every ' + str(hop/15) + 's)')
+    args = (frames, freq_bin, config['points'], config['low'], config['up'])
+    if store_dir is not None or per_file:
+        if store_dir is not None:
+            freq_list = store_frequencies(store_dir, *args, interpolate = config['interpolate'],
+                                          exclude = excluded, workers = workers, hop = hop,
+                                          fractions = fractions, **fill)
+        else:
+            freq_list = stream_frequencies(cond_loc, *args, interpolate = config['interpolate'],
+                                           exclude = excluded, cache = config['cache'], workers = workers,
+                                           reuse = reuse, hop = hop, fractions = fractions, **fill)
+        if fractions:
+            freq_list, filled = freq_list
+            labels = [(c, e) for c in filled for e in filled[c]]
+            flagged = filled_table(labels, config['points'], [filled[c][e] for c, e in labels], hop,
+                                   gaps['max_filled'])
+    elif plate is not None:
+        if config['interpolate']:
+            plate.fill_gaps(max_gap, gaps['method'])
+            if gaps['max_filled'] is not None:
+                flagged = plate.filled_bins(frames, freq_bin, config['points'], gaps['max_filled'], hop)
+        freq_list = plate.frequencies(*args, workers = workers, hop = hop, max_filled = max_filled)
+    else:
+        filled = None
+        if config['interpolate']:
+            filled = {}
+            with stage('interpolation', sum(len(extr_data[c]) for c in extr_data)) as progress:
+                for c in extr_data:
+                    filled[c] = {}
+                    for e in extr_data[c]:
+                        filled[c][e] = fill_table(extr_data[c][e], max_gap, gaps['method'])
+                        progress.add()
+            if gaps['max_filled'] is not None:
+                labels = [(c, e) for c in filled for e in filled[c]]
+                fractions = [filled_fraction(filled[c][e][config['points']].to_numpy().T, frames, freq_bin, hop)
+                             for c, e in labels]
+                flagged = filled_table(labels, config['points'], fractions, hop, gaps['max_filled'])
+        freq_list = frequencies(extr_data, *args, workers = workers, hop = hop, filled = filled,
+                                max_filled = max_filled)
+    return freq_list, excluded, tables, flagged
+
+# function to compare all requested pairs of conditions, returns a table of results
+def run_stats(areas, stats):
+    import pandas as pd
+    from undulation.stats import check_normal, compare
+
+    normality = check_normal(areas)
+    ind = 'y' if stats['independent'] else 'n'
+    rows = []
+    for c1, c2 in stats['pairs']:
+        test, s, p = compare(areas, c1, c2, normality, ind)
+        rows.append({'Group1': c1, 'Group2': c2, 'Test': test, 'Statistic': s, 'p': p,
+                     'Significant': p < 0.05})
+        print(c1 + ' vs ' + c2 + ': ' + test + ', p-value = ' + str(p))
+    return pd.DataFrame(rows, columns = ['Group1', 'Group2', 'Test', 'Statistic', 'p', 'Significant'])
+
+# function to compare the requested pairs of conditions (all pairs if none are given) by
+# bootstrap and permutation, returns a table of results
+def run_resampling(areas, stats, workers = None):
+    from undulation.stats import resampling_tests
+
+    res = stats['resampling']
+    pairs = [tuple(pair) for pair in stats['pairs']] or None
+    results = resampling_tests(areas, pairs, res['n_boot'], res['n_perm'], res['confidence'], res['correction'],
+                               res['alpha'], res['seed'], workers, res['chunk'])
+    for row in results.itertuples():
+        print(row.Group1 + ' vs ' + row.Group2 + ': difference = ' + str(row.Difference) + ' ('
+              + str(row.CI_Low) + ' to ' + str(row.CI_High) + '), p-value (' + res['correction'] + ') = '
+              + str(row.p_Holm if res['correction'] == 'holm' else row.p_FDR))
+    return results
+
+# function to compare the tracker with the manual scorings of one condition, returns the
+# agreement tables per worm, per genotype and per scored episode
+def run_agreement(freq_list, config, cond_names, layout):
+    from undulation.agreement import agreement
+
+    agree = config['agreement']
+    name = agree['condition'] or list(config['conditions'])[0]
+    c = [c for c in cond_names if cond_names[c] == name][0]
+    hop = hop_frames(config) if config['hop'] is not None else None
+    worms, genotypes, scored = agreement(freq_list[c], agree['scorings'], config['frames'],
+                                         int(config['freq_bin']*15), hop, layout, agree['resolution'],
+                                         agree['video'])
+    for row in genotypes.itertuples():
+        print('Agreement with manual scorings, ' + row.Genotype + ': kappa = ' + str(round(row.Kappa, 3))
+              + ', precision = ' + str(round(row.Precision, 3)) + ', recall = ' + str(round(row.Recall, 3)))
+    return worms, genotypes, scored
+
+# function to append the results of the run to the results database, returns the run number
+def store_results(config, means, areas, freq_list, cond_names, qc, layout):
+    from undulation.results import result_tables, append_run
+
+    experiment = config['results']['experiment'] or os.path.basename(os.path.abspath(config['output']['dir']))
+    tables = result_tables(experiment, means, areas, freq_list, cond_names, qc, layout)
+    return append_run(config['results']['db'], experiment, config, tables)
+
+# function to run the complete analysis of a run file, returns the list of written files
+def run(config):
+    from undulation.io import tracking_files
+    from undulation.binning import binning, group_summary
+    from undulation.plates import get_layout
+    from undulation.instrument import RunReport, stage
+    from undulation.gaps import methods
+    from undulation.stats import corrections
+
+    # conditions are numbered in the order of the run file, as in the interactive script
+    cond_loc = {}
+    cond_names = {}
+    for i, name in enumerate(config['conditions']):
+        cond_loc['cond' + str(i+1)] = config['conditions'][name]
+        cond_names['cond' + str(i+1)] = name
+    for c in cond_loc:
+        if not os.path.isdir(cond_loc[c]) or len(tracking_files(cond_loc[c])) == 0:
+            raise NoDataError('No tracking files found for condition "' + cond_names[c]
+                              + '" in ' + str(cond_loc[c]))
+    for pair in config['stats']['pairs']:
+        if len(pair) != 2 or any(name not in config['conditions'] for name in pair):
+            raise RunFileError('Statistics pairs must name two conditions of the run file: ' + str(pair))
+    try:
+        layout = get_layout(config['layout'])
+    except (ValueError, OSError) as err:
+        raise RunFileError(str(err))
+    if config['stats']['resampling']['correction'] not in corrections:
+        raise RunFileError('Unknown correction "' + str(config['stats']['resampling']['correction'])
+                           + '" (use ' + ', '.join(corrections) + ')')
+    agree = config['agreement']
+    if agree['scorings'] is not None:
+        if not os.path.isdir(agree['scorings']):
+            raise RunFileError('Scoring folder not found: ' + str(agree['scorings']))
+        if agree['condition'] is not None and agree['condition'] not in config['conditions']:
+            raise RunFileError('The scorings must belong to a condition of the run file: ' + str(agree['condition']))
+        if agree['resolution'] not in ('bin', 'frame'):
+            raise RunFileError('Unknown agreement resolution "' + str(agree['resolution']) + '" (use bin or frame)')
+    if config['plate_array'] and (config['streaming'] or config['store_dir'] is not None):
+        raise RunFileError('plate_array can not be combined with streaming or store_dir.')
+    if config['gaps']['method'] not in methods:
+        raise RunFileError('Unknown gap filling method "' + str(config['gaps']['method'])
+                           + '" (use ' + ', '.join(methods) + ')')
+
+    report = RunReport(config['report']['progress']).start()
+    try:
+        freq_list, excluded, qc_tables, flagged = extract_frequencies(config, cond_loc)
+        if excluded:
+            print('Excluded wells: ' + ', '.join(excluded))
+
+        binm = config['bin_minutes']
+        # number of (possibly overlapping) frequency bins per minute
+        mean_factor = 900/hop_frames(config)
+        print('Frequency data will be binned in ' + str(binm) + '-minute bins.')
+        means = binning(freq_list, binm, config['hours'], layout, mean_factor)
+        plottable, areas = group_summary(means, cond_names)
+
+        out = config['output']
+        os.makedirs(out['dir'], exist_ok = True)
+        date = dt.datetime.now().strftime('%Y%m%d')
+        written = [os.path.join(out['dir'], date + '_Undulation_Ratios.csv'),
+                   os.path.join(out['dir'], date + '_AUC_Data.csv')]
+        with stage('export'):
+            plottable.to_csv(written[0])
+            areas.to_csv(written[1])
+            if config['qc']['export']:
+                for table, name in zip(qc_tables, ['_QC.csv', '_QC_Windows.csv']):
+                    if table is not None:
+                        table['Condition'] = table['Condition'].map(cond_names)
+                        written.append(os.path.join(out['dir'], date + name))
+                        table.to_csv(written[-1], index = False)
+            if flagged is not None:
+                flagged['Condition'] = flagged['Condition'].map(cond_names)
+                written.append(os.path.join(out['dir'], date + '_Filled_Bins.csv'))
+                flagged.to_csv(written[-1], index = False)
+
+        if config['stats']['pairs']:
+            with stage('statistics'):
+                results = run_stats(areas, config['stats'])
+            written.append(os.path.join(out['dir'], date + '_Statistics.csv'))
+            results.to_csv(written[-1], index = False)
+        if config['stats']['resampling']['run']:
+            with stage('resampling'):
+                results = run_resampling(areas, config['stats'], config['workers'])
+            written.append(os.path.join(out['dir'], date + '_Resampling_Statistics.csv'))
+            results.to_csv(written[-1], index = False)
+
+        if agree['scorings'] is not None:
+            with stage('agreement'):
+                tables = run_agreement(freq_list, config, cond_names, layout)
+            for table, name in zip(tables, ['_Agreement.csv', '_Agreement_Genotypes.csv', '_Agreement_Episodes.csv']):
+                written.append(os.path.join(out['dir'], date + name))
+                table.to_csv(written[-1], index = False)
+
+        if config['results']['db'] is not None:
+            with stage('results database'):
+                run_id = store_results(config, means, areas, freq_list, cond_names, qc_tables[0], layout)
+            print('Results stored as run ' + str(run_id) + ' in ' + config['results']['db'])
+
+        if out['plots']:
+            # no display is needed on compute nodes
+            import matplotlib
+            matplotlib.use('Agg')
+            from undulation.plotting import plot_undulation, save_plots
+            plot, plot2 = plot_undulation(plottable, areas, out['x_label'], out['start_x'],
+                                          out['title'], out['auc'])
+            written += save_plots(plot, plot2, out['dir'], out['title'])
+    finally:
+        report.stop()
+
+    if config['report']['progress']:
+        print(report.summary())
+    if config['report']['write']:
+        report.info['wells'] = sum(len(freq_list[c]) for c in freq_list)
+        report.info['workers'] = config['workers']
+        written.append(report.write(os.path.join(out['dir'], date + '_Run_Report.' + config['report']['format'])))
+    return written
+
+# function to parse the command line
+def parse_args(argv = None):
+    parser = argparse.ArgumentParser(prog = 'python -m undulation.batch',
+                                     description = 'Run the undulation analysis without user input.')
+    parser.add_argument('run_file', help = 'run file (.json, .toml or .yaml)')
+    parser.add_argument('--workers', type = int, help = 'number of worker processes (0 = all cores)')
+    parser.add_argument('--output', help = 'folder for the results (overwrites output.dir)')
+    parser.add_argument('--streaming', action = 'store_true', help = 'read one tracking file at a time')
+    parser.add_argument('--store-dir', help = 'folder for a memory-mapped coordinate store')
+    parser.add_argument('--no-cache', action = 'store_true', help = 'do not use the tracking file cache')
+    parser.add_argument('--recompute', action = 'store_true', help = 'do not reuse cached results')
+    parser.add_argument('--no-plots', action = 'store_true', help = 'only write CSV files')
+    parser.add_argument('--progress', action = 'store_true', help = 'show the progress and timing of every stage')
+    return parser.parse_args(argv)
+
+def main(argv = None):
+    args = parse_args(argv)
+    try:
+        config = apply_flags(load_config(args.run_file), args)
+        written = run(config)
+    except RunFileError as err:
+        print('Error: ' + str(err), file = sys.stderr)
+        return EXIT_CONFIG
+    except NoDataError as err:
+        print('Error: ' + str(err), file = sys.stderr)
+        return EXIT_NO_DATA
+    except Exception:
+        traceback.print_exc()
+        return EXIT_FAILED
+
+    print('Results written to:', *written, sep = '\n')
+    return EXIT_OK
+
+if __name__ == '__main__':
+    sys.exit(main())
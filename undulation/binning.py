@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+# Binning of undulation-positive frames into time bins. The sorted lists of
+# undulation-positive bin starts of all wells are concatenated and assigned to
+# their time bin with numpy.searchsorted, the events per well and time bin are
+# then counted with a single numpy.bincount.
+
+import numpy as np
+import pandas as pd
+
+from undulation.instrument import timed, data_wells
+from undulation.io import key_well
+from undulation.plates import as_layout
+
+# function to count the undulation-positive bin starts of all wells {condition: {key: starts}}
+# within bin_hour time bins of binm minutes (900 frames per minute). Returns the list of
+# (condition, key) and a (wells x bin_hour) array of counts in the same order
+def bin_counts(data, binm, bin_hour):
+    keys = [(c, e) for c in data for e in data[c]]
+    if len(keys) == 0:
+        return keys, np.zeros((0, bin_hour), dtype = np.int64)
+    
+    starts = np.concatenate([np.asarray(data[c][e], dtype = np.int64) for c, e in keys])
+    well = np.repeat(np.arange(len(keys)), [len(data[c][e]) for c, e in keys])
+    
+    # a start belongs to bin b if edges[b] <= start < edges[b+1]
+    edges = np.arange(bin_hour + 1)*binm*900
+    b = np.searchsorted(edges, starts, side = 'right') - 1
+    valid = (b >= 0) & (b < bin_hour)
+    
+    counts = np.bincount(well[valid]*bin_hour + b[valid], minlength = len(keys)*bin_hour)
+    return keys, counts.reshape(len(keys), bin_hour)
+
+# function to calculate the area under a curve by the trapezoidal rule, x has to be increasing
+# (same as sklearn.metrics.auc, without importing sklearn)
+def trapezoid_auc(x, y):
+    x = np.asarray(x, dtype = float)
+    y = np.asarray(y, dtype = float)
+    return (np.diff(x)*(y[1:] + y[:-1])/2.0).sum()
+
+# function for binning data according to specified binsize, calculates mean for every bin.
+# Returns one table for all conditions and worms with the columns 'Condition', 'Well', 'Worm',
+# 'Time', 'Undulation_Rate' and 'Genotype', worm names and genotypes are taken from the plate
+# set-up (see undulation/plates.py). If a condition contains several videos of the same well,
+# the last one is used for the worm. Wells without a worm in the plate set-up are left out
+@timed('binning', data_wells)
+def binning (data, binm, hours, worms, mean_factor):
+    layout = as_layout(worms)
+    bin_hour = int((60*hours)/binm)
+    keys, counts = bin_counts(data, binm, bin_hour)
+    
+    last = {}
+    unmapped = []
+    for i, (c, e) in enumerate(keys):
+        if key_well(e) in layout:
+            last[(c, key_well(e))] = i
+        elif key_well(e) not in unmapped:
+            unmapped.append(key_well(e))
+    if unmapped:
+        print('The following wells are not part of the plate set-up and are left out of the analysis: '
+              + ', '.join(unmapped))
+    rows = list(last.values())
+    wells = [w for c, w in last]
+    
+    means = pd.DataFrame({
+        'Condition': np.repeat([c for c, w in last], bin_hour),
+        'Well': np.repeat(wells, bin_hour),
+        'Time': np.tile(np.arange(1, bin_hour+1)*binm, len(rows)),
+        'Undulation_Rate': (counts[rows]/(mean_factor*binm)).ravel()})
+    layout.assign(means)
+    return means[['Condition', 'Well', 'Worm', 'Time', 'Undulation_Rate', 'Genotype']]
+
+# function to prepare data for plotting, takes data for all conditions and the names of the
+# conditions to use {'cond1': name, ...}, creates dataframe which contains the average time
+# spent undulating for all time-bins ('Mean'), the standard error of the mean ('SEM'),
+# the number of worms within the group ('N'), as well as the specified name for the group ('Group').
+# Additionally, the area under the curve (AUC)for every worm is calculated and stored in a separate dataframe.           
+@timed('summary', lambda result, *args, **kwargs: len(result[1]))
+def group_summary(mean_data, cond_names):
+    # data for undulation ratios plot
+    data_prepped = mean_data[mean_data['Condition'].isin(list(cond_names))].copy()
+    data_prepped['Group'] = data_prepped['Condition'].map(cond_names)
+    
+    # data for area under the curve
+    areas = []
+    for (c, w), worm_data in data_prepped.groupby(['Condition', 'Worm'], sort = False):
+        row = {}
+        row['Group'] = cond_names[c]
+        row['Worm'] = w
+        row['AUC'] = trapezoid_auc(worm_data['Time'], worm_data['Undulation_Rate'])
+        areas.append(row)
+        
+    plot_ready = data_prepped.groupby(['Group', 'Time']).agg(
+        Mean = pd.NamedAgg(column = 'Undulation_Rate', aggfunc = 'mean'),
+        SEM = pd.NamedAgg(column = 'Undulation_Rate', aggfunc = 'sem'),
+        N = pd.NamedAgg(column = 'Undulation_Rate', aggfunc = 'count')).reset_index(level =[0,1])
+    
+    areas = pd.DataFrame(areas, columns = ['Group', 'Worm', 'AUC']).sort_values(by = ['Group','Worm'])
+    
+    return plot_ready, areas
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+# Content-addressed cache for intermediate results of single tracking files
+# (e.g. the undulation-positive bin starts of a well). The key of a result is
+# the hash of the tracking file's content combined with the name of the stage
+# and the exact parameters it was computed with, thus only new or changed
+# files, or files analysed with different parameters, have to be recomputed.
+# Results are stored as small JSON files in <dataset>/.undulation_cache/results.
+
+import os, json, hashlib, functools
+
+from undulation.io import cache_dir
+
+results_dir = 'results'
+
+# function to hash the content of a file, the hash is kept for the lifetime of the
+# process as long as size and modification time of the file don't change
+@functools.lru_cache(maxsize = None)
+def content_hash(path, size, mtime):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+def file_hash(path):
+    stat = os.stat(path)
+    return content_hash(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+# function to create the key of a result from the file content, stage and parameters
+def result_key(path, stage, params):
+    h = hashlib.sha256()
+    h.update(file_hash(path).encode())
+    h.update(stage.encode())
+    h.update(json.dumps(params, sort_keys = True).encode())
+    return h.hexdigest()
+
+# function to get the location of a result, next to the tracking file
+def result_path(path, key):
+    return os.path.join(os.path.dirname(path), cache_dir, results_dir, key + '.json')
+
+# function to load a result, returns None if it was not computed before
+def load_result(path, key):
+    try:
+        with open(result_path(path, key)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+# function to save a result, if the cache can't be written the result is just not cached
+def save_result(path, key, value):
+    cached = result_path(path, key)
+    try:
+        os.makedirs(os.path.dirname(cached), exist_ok = True)
+        with open(cached + '.tmp', 'w') as f:
+            json.dump(value, f)
+        os.replace(cached + '.tmp', cached)
+    except OSError:
+        pass
+
+# function to get the result of a stage for a tracking file, compute is only called
+# (without arguments) if there is no result for the same file content and parameters
+def cached_result(path, stage, params, compute):
+    key = result_key(path, stage, params)
+    value = load_result(path, key)
+    if value is None:
+        value = compute()
+        save_result(path, key, value)
+    return value
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+
+# Calibration of the detection criterion (see undulation/detection.py) against
+# manual scorings. The spectrum and the range moved of every bin, body point and
+# axis of a scored well are computed once and stored as .npz file next to the
+# dataset (<dataset>/.undulation_cache/spectra, keyed like the result cache by the
+# file content and parameters). A grid of band edges (low, up: indices of the
+# spectrum as in frequencies()) and movement thresholds (min_move, max_move) is
+# then evaluated on the stored features: the maximum power below every low and
+# the running maximum from every low upwards give the criterion of all band edges
+# at once, so a setting costs array comparisons instead of a run of the pipeline.
+# Wells are evaluated in parallel by the given number of worker processes.
+#
+# A bin counts as scored if at least half of its frames are scored as undulation.
+# Agreement is reported per setting, summed over all scored wells:
+#
+#   python -m undulation.calibration D:/exp1/day/wt D:/exp1/scorings --frames 54000 --freq-bin 3
+#           --points Body Head --low 2:9 --up 10:24 --min-move 0.25,0.5,1 --max-move 10,15,20
+
+import os, sys, argparse, itertools
+import numpy as np
+import pandas as pd
+
+from undulation.io import tracking_files, split_key, cache_dir
+from undulation.cache import result_key
+from undulation.detection import bin_block, window_block, span, filled_fraction, periodogram
+from undulation.gaps import fill_gaps
+from undulation.parallel import iter_jobs
+from undulation.pipeline import load_tracking
+from undulation.scoring import read_scorings, scoring_mask
+from undulation.instrument import stage
+from undulation.agreement import agreement_metrics
+
+spectra_dir = 'spectra'
+
+# columns of the results of a sweep
+sweep_columns = ['Low', 'Up', 'Low_Hz', 'Up_Hz', 'Min_Move', 'Max_Move', 'Wells', 'Bins', 'TP', 'FP', 'FN', 'TN',
+                 'Accuracy', 'Precision', 'Recall', 'F1', 'Kappa', 'Rate_Error']
+
+# function to compute the features of all bins (or overlapping windows with hop) of one
+# well from (points x frames) coordinate arrays. Returns the range moved (points x bins)
+# and the spectra of x and y (2 x points x bins x frequencies), the spectrum of a trailing
+# partial bin is shorter and padded with -inf
+def bin_features(x, y, frames, bins, fs = 15, hop = None):
+    if hop is not None and hop != bins:
+        blocks = [(window_block(x, frames, bins, hop), window_block(y, frames, bins, hop))]
+    else:
+        x_full, x_part = bin_block(x, frames, bins)
+        y_full, y_part = bin_block(y, frames, bins)
+        blocks = [(x_full, y_full)] + ([(x_part, y_part)] if x_part is not None else [])
+
+    n_freq = bins//2 + 1
+    moved = []
+    spectra = []
+    for x_block, y_block in blocks:
+        moved.append(np.sqrt(span(x_block)**2 + span(y_block)**2))
+        s = np.full((2,) + x_block.shape[:2] + (n_freq,), -np.inf)
+        if x_block.shape[1] > 0 and x_block.shape[2] > 0:
+            p = periodogram(np.stack([x_block, y_block]), fs)
+            s[..., :p.shape[-1]] = p
+        spectra.append(s)
+    return np.concatenate(moved, axis = 1), np.concatenate(spectra, axis = 2)
+
+# function to get the location of the stored features of a tracking file
+def features_path(path, key):
+    return os.path.join(os.path.dirname(path), cache_dir, spectra_dir, key + '.npz')
+
+# function to get the features of one tracking file (see bin_features) and the fraction of
+# filled frames of every bin, they are only computed if not stored before (store = True)
+def well_features(path, frames, bins, points, interpolate = True, cache = True, hop = None, max_gap = None,
+                  method = 'linear', store = True):
+    params = {'frames': frames, 'bins': bins, 'points': list(points), 'interpolate': interpolate, 'fs': 15,
+              'hop': hop, 'max_gap': max_gap, 'method': method}
+    stored = features_path(path, result_key(path, 'spectra', params)) if store else None
+    if stored is not None and os.path.exists(stored):
+        try:
+            with np.load(stored) as arrays:
+                return arrays['moved'], arrays['spectra'], arrays['filled']
+        except (OSError, ValueError, KeyError):
+            pass
+
+    df = load_tracking(path, cache)
+    x = df.x[points].to_numpy(dtype = float).T
+    y = df.y[points].to_numpy(dtype = float).T
+    filled = np.zeros(x.shape, dtype = bool)
+    if interpolate:
+        (x, y), filled = fill_gaps(np.stack([x, y]), max_gap, method)
+        filled = filled[0]
+    moved, spectra = bin_features(x, y, frames, bins, hop = hop)
+    fraction = filled_fraction(filled, frames, bins, hop)
+
+    if stored is not None:
+        try:
+            os.makedirs(os.path.dirname(stored), exist_ok = True)
+            with open(stored + '.tmp', 'wb') as f:
+                np.savez(f, moved = moved, spectra = spectra, filled = fraction)
+            os.replace(stored + '.tmp', stored)
+        except OSError:
+            pass
+    return moved, spectra, fraction
+
+# function to get all settings of a grid, pairs of band edges with low < up <= number of
+# frequencies and pairs of movement thresholds with min_move < max_move. Returns a list of
+# (low, up, min_move, max_move)
+def sweep_grid(lows, ups, min_moves, max_moves, n_freq):
+    bands = [(int(l), int(u)) for l in lows for u in ups if 0 < l < u <= n_freq]
+    moves = [(float(a), float(b)) for a in min_moves for b in max_moves if a < b]
+    return [band + move for band, move in itertools.product(bands, moves)]
+
+# function to evaluate all settings on the features of one well, returns a boolean
+# (settings x bins) array of undulation-positive bins, settings as given by sweep_grid
+def sweep_mask(moved, spectra, settings, filled = None, max_filled = None):
+    bands = list(dict.fromkeys((low, up) for low, up, a, b in settings))
+    moves = list(dict.fromkeys((a, b) for low, up, a, b in settings))
+
+    # spectral criterion of every band (bands x points x bins), for either x or y
+    spectral = np.zeros((len(bands),) + moved.shape, dtype = bool)
+    with np.errstate(invalid = 'ignore'):
+        for low in sorted({low for low, up in bands}):
+            below = spectra[..., :low].max(axis = -1)
+            running = np.maximum.accumulate(spectra[..., low:], axis = -1)
+            for i, (l, up) in enumerate(bands):
+                if l == low:
+                    spectral[i] = (running[..., up - low - 1] > below).any(axis = 0)
+
+        # movement gate of every pair of thresholds (moves x points x bins)
+        lower = np.array([a for a, b in moves])[:, np.newaxis, np.newaxis]
+        upper = np.array([b for a, b in moves])[:, np.newaxis, np.newaxis]
+        gate = (lower < moved) & (moved < upper)
+    if filled is not None and max_filled is not None:
+        gate &= filled <= max_filled
+
+    band_index = {band: i for i, band in enumerate(bands)}
+    move_index = {move: i for i, move in enumerate(moves)}
+    rows = np.array([band_index[(low, up)] for low, up, a, b in settings], dtype = np.int64)
+    cols = np.array([move_index[(a, b)] for low, up, a, b in settings], dtype = np.int64)
+    # a bin is positive if any body point passes gate and spectral criterion
+    positive = np.zeros((len(settings), moved.shape[1]), dtype = bool)
+    for p in range(moved.shape[0]):
+        positive |= spectral[rows, p] & gate[cols, p]
+    return positive
+
+# function to get the scored bins of a well from its per-frame scoring mask (see
+# undulation/scoring.py), a bin is scored if at least 'threshold' of its frames are scored
+def scored_bins(mask, frames, bins, hop = None, threshold = 0.5):
+    return filled_fraction(mask[np.newaxis], frames, bins, hop)[0] >= threshold
+
+# function to compare all settings with the scorings of one well, returns the counts of
+# (TP, FP, FN, TN) per setting (settings x 4), the undulation ratio per setting (fraction of
+# positive bins) and the scored ratio (fraction of scored frames)
+def well_agreement(path, scoring, settings, frames, bins, points, interpolate = True, cache = True, hop = None,
+                   max_gap = None, method = 'linear', max_filled = None, store = True):
+    moved, spectra, filled = well_features(path, frames, bins, points, interpolate, cache, hop, max_gap,
+                                           method, store)
+    positive = sweep_mask(moved, spectra, settings, filled, max_filled)
+    mask = scoring_mask(scoring, frames)
+    scored = scored_bins(mask, frames, bins, hop)
+    n = min(positive.shape[1], len(scored))
+    positive = positive[:, :n]
+    scored = scored[:n]
+
+    counts = np.stack([(positive & scored).sum(axis = 1), (positive & ~scored).sum(axis = 1),
+                       (~positive & scored).sum(axis = 1), (~positive & ~scored).sum(axis = 1)], axis = 1)
+    return counts, positive.mean(axis = 1), mask.mean()
+
+# function to get the tracking files of a dataset with a scoring {well: scoring table}, as
+# list of (key, path, well). Scorings belong to one video, by default the first of the dataset
+def scored_files(dataset, scoring, video = None):
+    files = [(key, path) + split_key(key) for key, path in tracking_files(dataset)]
+    if video is None and files:
+        video = files[0][2]
+    return [(key, path, well) for key, path, v, well in files if v == video and well in scoring]
+
+# function to sweep a grid of settings (see sweep_grid) over all scored wells of a dataset,
+# bins (and hop) in frames, max_gap in frames. Returns a table with one row per setting
+def sweep(dataset, scoring, frames, bins, points, lows, ups, min_moves, max_moves, interpolate = True,
+          cache = True, workers = 1, hop = None, max_gap = None, method = 'linear', max_filled = None,
+          video = None, store = True):
+    settings = sweep_grid(lows, ups, min_moves, max_moves, bins//2 + 1)
+    if not settings:
+        raise ValueError('The grid does not contain any setting with low < up and min_move < max_move.')
+    files = scored_files(dataset, scoring, video)
+    if not files:
+        raise ValueError('No tracking files with a scoring found in ' + str(dataset))
+
+    jobs = [(path, scoring[well], settings, frames, bins, points, interpolate, cache, hop, max_gap, method,
+             max_filled, store) for key, path, well in files]
+    counts = np.zeros((len(settings), 4), dtype = np.int64)
+    error = np.zeros(len(settings))
+    with stage('calibration', len(files), 'files') as progress:
+        for well_counts, ratio, scored in iter_jobs(well_agreement, jobs, workers):
+            counts += well_counts
+            error += np.abs(ratio - scored)
+            progress.add()
+
+    table = pd.DataFrame(settings, columns = ['Low', 'Up', 'Min_Move', 'Max_Move'])
+    # frequency of the spectrum index (fs = 15)
+    table['Low_Hz'] = table.Low*15/bins
+    table['Up_Hz'] = table.Up*15/bins
+    table['Wells'] = len(files)
+    table['Bins'] = counts.sum(axis = 1)
+    table['TP'], table['FP'], table['FN'], table['TN'] = counts.T
+    for name, values in agreement_metrics(*counts.T).items():
+        table[name] = values
+    table['Rate_Error'] = error/len(files)
+    return table[sweep_columns]
+
+# function to get the best settings of a sweep by one measure (e.g. 'F1', 'Kappa', or
+# 'Rate_Error' which is minimised)
+def best_settings(table, metric = 'F1', n = 10):
+    return table.sort_values(metric, ascending = metric == 'Rate_Error', kind = 'stable').head(n)
+
+# function to read a grid argument, either a comma separated list or start:stop[:step]
+# (stop excluded, as range)
+def grid_values(text, kind = float):
+    if ':' in text:
+        values = np.arange(*[float(v) for v in text.split(':')])
+        return [kind(v) for v in values]
+    return [kind(v) for v in text.split(',') if v != '']
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog = 'python -m undulation.calibration',
+                                     description = 'Sweep the detection thresholds against manual scorings.')
+    parser.add_argument('dataset', help = 'folder with the tracking files')
+    parser.add_argument('scorings', help = 'folder with the scoring files')
+    parser.add_argument('--frames', type = int, default = 54000, help = 'number of frames of the videos')
+    parser.add_argument('--freq-bin', type = float, default = 3, help = 'bin size in seconds')
+    parser.add_argument('--hop', type = float, help = 'seconds between overlapping bins')
+    parser.add_argument('--points', nargs = '+', default = ['Body'], help = 'body points to evaluate')
+    parser.add_argument('--low', default = '2:9', help = 'lower band edges (spectrum index)')
+    parser.add_argument('--up', default = '10:24', help = 'upper band edges (spectrum index, excluded)')
+    parser.add_argument('--min-move', default = '0.25,0.5,1,2', help = 'minimal ranges moved')
+    parser.add_argument('--max-move', default = '10,15,20,30', help = 'maximal ranges moved')
+    parser.add_argument('--max-gap', type = float, help = 'longest gap filled in seconds')
+    parser.add_argument('--gap-method', default = 'linear', help = 'gap filling method')
+    parser.add_argument('--max-filled', type = float, help = 'maximal fraction of filled frames of a bin')
+    parser.add_argument('--no-interpolation', action = 'store_true', help = 'do not fill gaps')
+    parser.add_argument('--video', help = 'video the scorings belong to (default: first video)')
+    parser.add_argument('--workers', type = int, default = 1, help = 'number of worker processes (0 = all cores)')
+    parser.add_argument('--metric', default = 'F1', help = 'measure to rank the settings by')
+    parser.add_argument('--output', help = 'CSV file for the results of all settings')
+    args = parser.parse_args(argv)
+
+    try:
+        scoring = read_scorings(args.scorings)
+        table = sweep(args.dataset, scoring, args.frames, int(args.freq_bin*15), args.points,
+                      grid_values(args.low, int), grid_values(args.up, int), grid_values(args.min_move),
+                      grid_values(args.max_move), not args.no_interpolation,
+                      workers = None if args.workers == 0 else args.workers,
+                      hop = int(args.hop*15) if args.hop is not None else None,
+                      max_gap = int(args.max_gap*15) if args.max_gap is not None else None,
+                      method = args.gap_method, max_filled = args.max_filled, video = args.video)
+    except (ValueError, OSError) as err:
+        print('Error: ' + str(err), file = sys.stderr)
+        return 2
+    if args.metric not in table.columns:
+        print('Error: unknown measure "' + args.metric + '"', file = sys.stderr)
+        return 2
+
+    if args.output:
+        table.to_csv(args.output, index = False)
+    print(str(len(table)) + ' settings evaluated on ' + str(table.Wells.iloc[0]) + ' wells, best by '
+          + args.metric + ':')
+    print(best_settings(table, args.metric).to_string(index = False))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
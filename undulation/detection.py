@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+
+# Batched detection of undulation-positive bins. Instead of calling
+# scipy.signal.periodogram once per bin, body point and axis, the coordinates
+# of a well are reshaped into a (points x bins x bin_len) block and all spectra
+# are computed in a single call. The spectra are the periodogram of
+# scipy.signal (constant detrend, boxcar window, one-sided power spectral
+# density) computed by scipy.fft directly, which keeps scipy.signal and the
+# modules it pulls in (scipy.stats, scipy.interpolate) out of the start-up of
+# every worker process.
+#
+# With a hop smaller than the bin size, overlapping windows of bin_len frames are
+# evaluated every hop frames instead (a short-time Fourier transform with a boxcar
+# window, same criterion as for the bins). The windows are strided views of the
+# coordinates, so only windows passing the movement gate are copied for the
+# spectra. The time resolution is then one hop instead of one bin.
+#
+# Bins of a body point in which more than max_filled (fraction) of the frames were
+# filled by gap filling (see undulation/gaps.py) are skipped.
+
+import numpy as np
+import pandas as pd
+from scipy import fft
+
+from undulation.parallel import run_nested
+from undulation.instrument import stage, timed
+
+# function to split a (points x frames) coordinate array into blocks of bins,
+# bins start at every multiple of 'bins' below 'frames' (same as range(0, frames, bins)).
+# Returns the block of complete bins and, if the data ends within a bin, the
+# trailing partial bin as a separate (points x 1 x rest) block (or None)
+def bin_block(cords, frames, bins):
+    length = cords.shape[1]
+    n_starts = len(range(0, frames, bins))
+    n_full = min(n_starts, length // bins)
+    full = cords[:, :n_full*bins].reshape(cords.shape[0], n_full, bins)
+    
+    partial = None
+    if n_full < n_starts and n_full*bins < length:
+        partial = cords[:, n_full*bins:(n_full+1)*bins][:, np.newaxis, :]
+    return full, partial
+
+# function to split a (points x frames) coordinate array into overlapping windows of
+# 'window' frames starting every 'hop' frames below 'frames', windows reaching beyond
+# the data are left out. Returns a (points x windows x window) strided view
+def window_block(cords, frames, window, hop):
+    cords = cords[:, :frames]
+    if cords.shape[1] < window:
+        return np.empty((cords.shape[0], 0, window))
+    return np.lib.stride_tricks.sliding_window_view(cords, window, axis = -1)[:, ::hop]
+
+# function to get the fraction of filled frames of every bin (or overlapping window with
+# hop) from a (points x frames) mask of filled frames, bins are those evaluated by
+# undulation_bins. Returns a (points x bins) array
+def filled_fraction(filled, frames, bins, hop = None):
+    filled = np.asarray(filled, dtype = float)
+    if hop is not None and hop != bins:
+        return window_block(filled, frames, bins, hop).mean(axis = -1)
+    full, partial = bin_block(filled, frames, bins)
+    fraction = full.mean(axis = -1)
+    if partial is not None:
+        fraction = np.append(fraction, partial.mean(axis = -1), axis = 1)
+    return fraction
+
+# function to compute the periodogram along the last axis, same values as
+# scipy.signal.periodogram(block, fs = fs, axis = -1)[1]
+def periodogram(block, fs = 15):
+    n = block.shape[-1]
+    r = fft.rfft(block - block.mean(axis = -1, keepdims = True), axis = -1)
+    power = np.conjugate(r)*r
+    power *= 1.0/(fs*float(n))
+    # one-sided spectrum: all but the zero and the Nyquist frequency are doubled
+    if n % 2:
+        power[..., 1:] *= 2
+    else:
+        power[..., 1:-1] *= 2
+    return power.real
+
+# function to get the range (max - min) of every bin, NaN-values are skipped unless the
+# bin starts with one, which is how the built-in max() and min() treat them
+def span(block):
+    rng = np.fmax.reduce(block, axis = -1) - np.fmin.reduce(block, axis = -1)
+    if block.shape[-1] > 0:
+        rng[np.isnan(block[..., 0])] = np.nan
+    return rng
+
+# function to find undulation-positive bins within a block, a bin is positive if the
+# range moved by the point lies within (min_move, max_move) and the maximum power in the
+# undulation band [low:up] exceeds the maximum power below it, for either x or y.
+# Returns a boolean (points x bins) array
+def undulation_mask(x_block, y_block, low = 4, up = 17, fs = 15, min_move = 0.5, max_move = 15):
+    dx = span(x_block)
+    dy = span(y_block)
+    dis_moved = np.sqrt(dx**2 + dy**2)
+    
+    # only bins within undulation range are passed on to the spectral analysis
+    gate = (min_move < dis_moved) & (dis_moved < max_move)
+    mask = np.zeros(gate.shape, dtype = bool)
+    if not gate.any():
+        return mask
+    
+    s = periodogram(np.stack([x_block[gate], y_block[gate]]), fs)
+    positive = (s[..., low:up].max(axis = -1) > s[..., 0:low].max(axis = -1)).any(axis = 0)
+    mask[gate] = positive
+    return mask
+
+# function to extract the starting frames of all undulation-positive bins of one well,
+# x and y are (points x frames) arrays of the body points that shall be evaluated.
+# With hop (in frames) the starting frames of undulation-positive overlapping windows
+# of 'bins' frames are returned instead (see window_block). With a (points x frames) mask
+# of filled frames, bins of a point with more than max_filled filled frames are skipped
+@timed('spectral analysis')
+def undulation_bins(x, y, frames, bins, low = 4, up = 17, fs = 15, min_move = 0.5, max_move = 15, hop = None,
+                    filled = None, max_filled = None):
+    x = np.asarray(x, dtype = float)
+    y = np.asarray(y, dtype = float)
+    if hop is not None and hop != bins:
+        step = hop
+        positive = undulation_mask(window_block(x, frames, bins, hop), window_block(y, frames, bins, hop),
+                                   low, up, fs, min_move, max_move)
+    else:
+        step = bins
+        x_full, x_part = bin_block(x, frames, bins)
+        y_full, y_part = bin_block(y, frames, bins)
+        
+        positive = undulation_mask(x_full, y_full, low, up, fs, min_move, max_move)
+        if x_part is not None:
+            positive = np.append(positive, undulation_mask(x_part, y_part, low, up, fs,
+                                                           min_move, max_move), axis = 1)
+    if filled is not None and max_filled is not None:
+        positive &= filled_fraction(filled, frames, bins, hop) <= max_filled
+    return (np.flatnonzero(positive.any(axis = 0))*step).tolist()
+
+# function to convert the starting frames of undulation-positive windows into a per-frame
+# mask, every window decides for the hop frames around its centre
+def frame_mask(starts, frames, window, hop):
+    mask = np.zeros(frames, dtype = bool)
+    first = np.asarray(starts, dtype = np.int64) + (window - hop)//2
+    frame = (first[:, np.newaxis] + np.arange(hop)).ravel()
+    mask[frame[frame < frames]] = True
+    return mask
+
+# function to get the onset and offset frames of all undulation episodes of a per-frame mask,
+# returns a table with the columns of manual scorings ('Behaviour', 'Start_Frame', 'Stop_Frame')
+def mask_events(mask, behaviour = 'Undulation'):
+    edges = np.diff(np.r_[0, np.asarray(mask, dtype = np.int8), 0])
+    start = np.flatnonzero(edges == 1)
+    stop = np.flatnonzero(edges == -1) - 1
+    return pd.DataFrame(dict(Behaviour = behaviour, Start_Frame = start, Stop_Frame = stop))
+
+# function to extract the undulation-positive bin starts directly from the pivoted
+# tracking data of one well (as created by undulation.io.read_tracking), filled is the
+# table of filled frames of the well (see fill_table in undulation/gaps.py)
+def well_undulation_bins(df, frames, bins, points, low = 4, up = 17, hop = None, filled = None, max_filled = None):
+    if filled is not None:
+        filled = filled[points].to_numpy().T
+    return undulation_bins(df.x[points].to_numpy().T, df.y[points].to_numpy().T,
+                           frames, bins, low, up, hop = hop, filled = filled, max_filled = max_filled)
+
+# function to extract indices of dominant undulation frequencies (depending on binsize) 
+# for user-defined list of bodypoints, the spectra of all bins and points of a well
+# are computed at once (see undulation_bins), wells are analysed in parallel
+# by the given number of worker processes. With hop, overlapping bins starting every
+# hop frames are evaluated. filled holds the tables of filled frames of all wells
+# {condition: {key: table}}, bins with more than max_filled filled frames are skipped
+def frequencies(data, frames, bins, points, low = 4, up = 17, workers = 1, hop = None, filled = None,
+                max_filled = None):
+    jobs = {}
+    for c in data:
+        jobs[c] = {}
+        for e in data[c]:
+            mask = filled[c][e] if filled is not None else None
+            jobs[c][e] = (data[c][e], frames, bins, points, low, up, hop, mask, max_filled)
+    
+    # a list is created for every well containing starting frame of a undulation-positive bin
+    with stage('frequencies', sum(len(jobs[c]) for c in jobs)) as progress:
+        freq_list = run_nested(well_undulation_bins, jobs, workers, progress = progress)
+    return freq_list
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+# Gap-aware filling of untracked frames. All rows of a (... x frames) coordinate
+# array (e.g. all wells of a video of the plate array, see undulation/platedata.py)
+# are filled at once: for every untracked frame the last and the next tracked frame
+# are found by a binary search among the tracked frames, which also gives the
+# length of the gap the frame lies in. Gaps longer than max_gap frames stay NaN, so
+# long dropouts are not turned into smooth fake movement (bins containing NaN are
+# never undulation-positive). Frames before the first tracked frame stay NaN, gaps
+# at the end of a recording take the last tracked position. Without max_gap and with
+# method 'linear' the result equals DataFrame.interpolate().
+#
+# Methods:  'linear'  straight line between the tracked frames around a gap
+#           'spline'  cubic spline through all tracked frames of a row
+#           'kalman'  constant-velocity Kalman filter with Rauch-Tung-Striebel
+#                     smoother over every gap and 'context' tracked frames around it
+#
+# Tracked frames are never changed. Besides the coordinates a boolean mask of the
+# filled frames is returned, bins with too many filled frames can be skipped by the
+# spectral analysis (see max_filled of undulation_bins in undulation/detection.py).
+
+import numpy as np
+import pandas as pd
+
+from undulation.io import split_key
+
+methods = ['linear', 'spline', 'kalman']
+
+# function to find for every untracked frame of a (... x frames) mask of tracked frames
+# the last tracked frame before it (-1 if none) and the next tracked frame after it
+# (frames if none). The tracked frames are searched in the flattened mask, so that only
+# the untracked frames are visited. Returns the flat indices of the untracked frames
+# and both frame numbers
+def neighbours(valid):
+    frames = valid.shape[-1]
+    flat = valid.reshape(-1)
+    tracked = np.flatnonzero(flat)
+    missing = np.flatnonzero(~flat)
+    if tracked.size == 0:
+        return missing, np.full(missing.size, -1), np.full(missing.size, frames)
+    pos = np.searchsorted(tracked, missing)
+    row = missing - missing % frames
+    # neighbours found in the row before or after belong to another row
+    last = tracked[np.maximum(pos - 1, 0)] - row
+    last = np.where((pos > 0) & (last >= 0), last, -1)
+    following = tracked[np.minimum(pos, tracked.size - 1)] - row
+    following = np.where((pos < tracked.size) & (following < frames), following, frames)
+    return missing, last, following
+
+# function to find the frames that are filled: untracked frames after the first tracked
+# frame and before the end of the recording ('lengths' frames, broadcast against the rows,
+# default all frames) that lie in a gap of at most max_gap frames (None = any). Returns
+# the mask of these frames, their flat indices and the tracked frames around them (the
+# next tracked frame is frames if there is none before the end)
+def fillable(valid, max_gap = None, lengths = None):
+    frames = valid.shape[-1]
+    flat, last, following = neighbours(valid)
+    if lengths is None:
+        end = frames
+    else:
+        end = np.broadcast_to(np.asarray(lengths)[..., np.newaxis], valid.shape).reshape(-1)[flat]
+    following = np.where(following < end, following, frames)
+    keep = (last >= 0) & (flat % frames < end)
+    if max_gap is not None:
+        keep &= np.minimum(following, end) - last - 1 <= max_gap
+    flat, last, following = flat[keep], last[keep], following[keep]
+    gap = np.zeros(valid.shape, dtype = bool)
+    gap.reshape(-1)[flat] = True
+    return gap, flat, last, following
+
+# function to fill the gaps linearly, returns the values of the frames given by their flat
+# indices (computed as numpy.interp does)
+def linear(cords, flat, last, following):
+    frames = cords.shape[-1]
+    values = cords.reshape(-1)
+    frame = flat % frames
+    row = flat - frame
+    before = values[row + last].astype(float)
+    after = values[row + np.minimum(following, frames - 1)].astype(float)
+    trailing = following == frames
+    after[trailing] = before[trailing]
+    slope = (after - before)/np.where(trailing, 1, following - last)
+    return slope*(frame - last) + before
+
+# function to fill the gaps within rows by a cubic spline through all tracked frames
+# of the row, gaps at the end keep their linear values
+def spline(cords, filled, inner):
+    from scipy.interpolate import CubicSpline
+
+    frames = cords.shape[-1]
+    rows = cords.reshape(-1, frames)
+    out = filled.reshape(-1, frames)
+    gaps = inner.reshape(-1, frames)
+    for r in np.flatnonzero(gaps.any(axis = 1)):
+        tracked = np.flatnonzero(~np.isnan(rows[r]))
+        out[r, gaps[r]] = CubicSpline(tracked, rows[r, tracked].astype(float))(np.flatnonzero(gaps[r]))
+
+# function to smooth (gaps x frames) segments with a constant-velocity Kalman filter and
+# Rauch-Tung-Striebel smoother, NaN-values are missing measurements. All segments are
+# processed at once, returns the smoothed positions
+def kalman_smooth(z, q = 0.05, r = 1.0):
+    n, length = z.shape
+    F = np.array([[1., 1.], [0., 1.]])
+    Q = q*np.array([[1/3, 1/2], [1/2, 1.]])
+    x = np.zeros((n, 2))
+    P = np.tile(np.eye(2)*1e6, (n, 1, 1))
+    predicted = np.empty((length, n, 2))
+    predicted_cov = np.empty((length, n, 2, 2))
+    estimate = np.empty((length, n, 2))
+    estimate_cov = np.empty((length, n, 2, 2))
+    for t in range(length):
+        if t > 0:
+            x = x @ F.T
+            P = F @ P @ F.T + Q
+        predicted[t] = x
+        predicted_cov[t] = P
+        m = ~np.isnan(z[:, t])
+        if m.any():
+            gain = P[m, :, 0]/(P[m, 0, 0] + r)[:, np.newaxis]
+            x[m] = x[m] + gain*(z[m, t] - x[m, 0])[:, np.newaxis]
+            P[m] = P[m] - gain[:, :, np.newaxis]*P[m, 0][:, np.newaxis, :]
+        estimate[t] = x
+        estimate_cov[t] = P
+
+    smoothed = np.empty((n, length))
+    x = estimate[-1]
+    smoothed[:, -1] = x[:, 0]
+    for t in range(length - 2, -1, -1):
+        C = estimate_cov[t] @ F.T @ np.linalg.inv(predicted_cov[t + 1])
+        x = estimate[t] + (C @ (x - predicted[t + 1])[..., np.newaxis])[..., 0]
+        smoothed[:, t] = x[:, 0]
+    return smoothed
+
+# function to fill the gaps within rows (frames given by their flat indices and the tracked
+# frames around them) by Kalman smoothing of every gap together with 'context' frames
+# before and after it. Gaps are grouped by length (powers of 2), so
+# that short gaps are not padded to the length of the longest one
+def kalman(cords, filled, flat, last, following, context = 15):
+    frames = cords.shape[-1]
+    rows = cords.reshape(-1, frames)
+    out = filled.reshape(-1, frames)
+    # every gap once, by its first frame
+    first = flat % frames == last + 1
+    row = flat[first] // frames
+    start = last[first]
+    stop = following[first]
+    begin = np.maximum(start - context + 1, 0)
+    end = np.minimum(stop + context, frames)
+    size = np.ceil(np.log2(end - begin)).astype(int)
+    for s in np.unique(size):
+        g = np.flatnonzero(size == s)
+        length = int((end[g] - begin[g]).max())
+        number = begin[g][:, np.newaxis] + np.arange(length)
+        inside = number < end[g][:, np.newaxis]
+        z = np.where(inside, rows[row[g][:, np.newaxis], np.minimum(number, frames - 1)], np.nan)
+        smoothed = kalman_smooth(z.astype(float))
+        target = (number > start[g][:, np.newaxis]) & (number < stop[g][:, np.newaxis])
+        out[np.broadcast_to(row[g][:, np.newaxis], number.shape)[target], number[target]] = smoothed[target]
+
+# function to fill the gaps of a (... x frames) coordinate array along the frames, gaps
+# longer than max_gap frames stay NaN. Rows may end before the last frame ('lengths',
+# broadcast against the rows), frames after the end stay NaN. Returns the filled
+# coordinates (new array of the same dtype) and the mask of filled frames
+def fill_gaps(cords, max_gap = None, method = 'linear', lengths = None):
+    if method not in methods:
+        raise ValueError('Unknown gap filling method "' + str(method) + '", use one of: ' + ', '.join(methods))
+    cords = np.asarray(cords)
+    if not np.issubdtype(cords.dtype, np.floating):
+        cords = cords.astype(float)
+    gap, flat, last, following = fillable(~np.isnan(cords), max_gap, lengths)
+    filled = cords.copy()
+    if flat.size == 0:
+        return filled, gap
+
+    filled.reshape(-1)[flat] = linear(cords, flat, last, following)
+    if method != 'linear':
+        inner = following < cords.shape[-1]
+        if method == 'spline':
+            mask = np.zeros(gap.shape, dtype = bool)
+            mask.reshape(-1)[flat[inner]] = True
+            spline(cords, filled, mask)
+        else:
+            kalman(cords, filled, flat[inner], last[inner], following[inner])
+    return filled, gap
+
+# function to fill the gaps of pivoted tracking data (see undulation.io.read_tracking) in
+# place, as DataFrame.interpolate(inplace = True) does. Returns the mask of filled frames
+# as table with one column per body point
+def fill_table(df, max_gap = None, method = 'linear'):
+    filled, gap = fill_gaps(df.to_numpy(dtype = float).T, max_gap, method)
+    df[:] = filled.T
+    # x and y of a body point are tracked together, the x columns come first
+    points = df.shape[1]//2
+    return pd.DataFrame(gap[:points].T, index = df.index, columns = df.columns.get_level_values(-1)[:points])
+
+# function to create a table of the bins with more than max_filled filled frames, with one
+# row per condition, video, well, body point and bin. fractions are (points x bins) arrays
+# of filled frames per bin (see filled_fraction in undulation/detection.py) of the wells
+# given by labels [(condition, video+well key)], bins start every 'step' frames
+def filled_table(labels, points, fractions, step, max_filled):
+    columns = ['Condition', 'Video', 'Well', 'Point', 'Start_Frame', 'Filled']
+    tables = []
+    for (c, e), fraction in zip(labels, fractions):
+        p, b = np.nonzero(np.asarray(fraction) > max_filled)
+        video, well = split_key(e)
+        tables.append(pd.DataFrame({'Condition': c, 'Video': video, 'Well': well,
+                                    'Point': np.asarray(points, dtype = object)[p], 'Start_Frame': b*step,
+                                    'Filled': np.asarray(fraction)[p, b]}, columns = columns))
+    if not tables:
+        return pd.DataFrame(columns = columns)
+    return pd.concat(tables, ignore_index = True)
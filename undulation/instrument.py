@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+# Instrumentation of the analysis stages. While a RunReport is active, every
+# stage wrapped in stage() (or decorated with timed()) records its wall time,
+# CPU time (including finished worker processes), the number of processed items
+# (wells/files) and the memory used. The peak resident memory can only be read for
+# the whole process, thus every stage records by how much it raised that peak
+# (peak_growth_mb, the largest growth of any call) and the peak of the process at
+# the end of its last call (process_peak_rss_mb). Stages with the same name are
+# summed up. Without an active report the stages cost nothing:
+#
+#   with RunReport(progress = True) as report:
+#       freq_list = frequencies(...)
+#   report.write('run_report.json')     # or .csv
+#
+# (or report = RunReport().start() ... report.stop() where a with-block does not fit)
+#
+# Stages can be nested (e.g. "parse" and "pivot" run within "extraction"), thus
+# the times of all stages don't add up to the run time. Stages running within
+# worker processes are not recorded, only the stage that started the workers.
+
+import os, sys, csv, json, time, functools
+import datetime as dt
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+# report that stages are currently recorded in (None = no recording)
+active = None
+
+# columns of the report, in the order written to CSV files
+columns = ['stage', 'calls', 'items', 'wall_s', 'cpu_s', 'peak_growth_mb', 'process_peak_rss_mb']
+
+# function to get the CPU time used by this process and its finished child processes
+def cpu_time():
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+# function to get the peak resident memory in MB of this process or, if larger, of any of
+# its finished child processes (None if the platform does not report it)
+def peak_rss_mb():
+    if resource is not None:
+        peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                   resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+        # bytes on macOS, kilobytes elsewhere
+        return round(peak/2**20 if sys.platform == 'darwin' else peak/2**10, 1)
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return round(getattr(info, 'peak_wset', info.rss)/2**20, 1)
+
+# counter of the items processed within a stage, shows the progress if the report does
+class Progress:
+    def __init__(self, report, name, total = None, unit = 'wells'):
+        self.report = report
+        self.name = name
+        self.total = total
+        self.unit = unit
+        self.count = 0
+        self.shown = False
+
+    def add(self, n = 1):
+        self.count += n
+        if self.report is not None and self.report.progress:
+            self.report.show(self.name, self.count, self.total, self.unit)
+            self.shown = True
+
+# collection of the stage records of one run
+class RunReport:
+    def __init__(self, progress = False, stream = None):
+        self.progress = progress
+        self.stream = stream or sys.stderr
+        self.stages = {}
+        self.info = {'started': dt.datetime.now().isoformat(timespec = 'seconds')}
+        self.previous = None
+
+    # function to start recording the stages in this report, returns the report
+    def start(self):
+        global active
+        self.previous = active
+        self.started = time.perf_counter()
+        active = self
+        return self
+
+    # function to stop recording, the previously active report is restored
+    def stop(self):
+        global active
+        active = self.previous
+        self.info['wall_s'] = round(time.perf_counter() - self.started, 3)
+        self.info['peak_rss_mb'] = peak_rss_mb()
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    # function to add the measurements of one call of a stage, peak is the peak resident
+    # memory of the process before the call (None if not reported by the platform)
+    def record(self, name, wall, cpu, items, peak = None):
+        entry = self.stages.setdefault(name, dict.fromkeys(columns, 0))
+        entry['stage'] = name
+        entry['calls'] += 1
+        entry['items'] += items
+        entry['wall_s'] = round(entry['wall_s'] + wall, 3)
+        entry['cpu_s'] = round(entry['cpu_s'] + cpu, 3)
+        entry['process_peak_rss_mb'] = peak_rss_mb()
+        if peak is None or entry['process_peak_rss_mb'] is None:
+            entry['peak_growth_mb'] = None
+        else:
+            entry['peak_growth_mb'] = round(max(entry['peak_growth_mb'] or 0,
+                                                entry['process_peak_rss_mb'] - peak), 1)
+
+    # function to print the progress of a stage on a single line
+    def show(self, name, count, total, unit, end = ''):
+        of = '' if total is None else '/' + str(total)
+        print('\r' + name + ': ' + str(count) + of + ' ' + unit + end, end = '', file = self.stream, flush = True)
+
+    # function to get the records as a list of rows, ordered by the first call of every stage
+    def rows(self):
+        return list(self.stages.values())
+
+    # function to write the report as JSON (run information and stages) or CSV (stages only),
+    # depending on the file extension
+    def write(self, path):
+        if os.path.splitext(path)[1].lower() == '.csv':
+            with open(path, 'w', newline = '') as f:
+                writer = csv.DictWriter(f, fieldnames = columns)
+                writer.writeheader()
+                writer.writerows(self.rows())
+        else:
+            with open(path, 'w') as f:
+                json.dump(dict(self.info, stages = self.rows()), f, indent = 1)
+        return path
+
+    # function to get the report as a printable table
+    def summary(self):
+        lines = ['{:<20}{:>7}{:>8}{:>10}{:>10}{:>16}{:>21}'.format(*columns)]
+        for row in self.rows():
+            lines.append('{:<20}{:>7}{:>8}{:>10}{:>10}{:>16}{:>21}'.format(
+                *('' if row[c] is None else row[c] for c in columns)))
+        return '\n'.join(lines)
+
+# context manager measuring one stage in the active report, yields a Progress object to
+# count the processed items (total and unit are used for the progress display). Items
+# counted with progress.add() are shown live, progress.count can be raised silently
+@contextmanager
+def stage(name, total = None, unit = 'wells'):
+    report = active
+    progress = Progress(report, name, total, unit)
+    if report is None:
+        yield progress
+        return
+
+    peak = peak_rss_mb()
+    wall = time.perf_counter()
+    cpu = cpu_time()
+    try:
+        yield progress
+    finally:
+        wall = time.perf_counter() - wall
+        report.record(name, wall, cpu_time() - cpu, progress.count, peak)
+        if progress.shown:
+            report.show(name, progress.count, total, unit, end = ' (' + str(round(wall, 1)) + 's)\n')
+
+# decorator measuring every call of a function as the given stage. Every call counts as one
+# item unless items is given, a function called with the result and the arguments of the
+# call that returns the number of processed items (e.g. the wells of a data dictionary)
+def timed(name, items = None):
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(name) as progress:
+                result = func(*args, **kwargs)
+                progress.count += 1 if items is None else items(result, *args, **kwargs)
+                return result
+        return wrapper
+    return decorate
+
+# function to count the wells of the data dictionary {condition: {key: data}} given as first
+# argument of a call, for use with timed()
+def data_wells(result, data, *args, **kwargs):
+    return sum(len(data[c]) for c in data)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+# Reading of loopy tracking files. Pivoted tracking data is cached as .npz
+# files (binary .npy arrays) in a hidden folder next to the dataset, so that
+# later runs on the same directory skip parsing and pivoting the CSV files.
+
+import os, re, glob, hashlib, natsort
+import numpy as np
+import pandas as pd
+
+from undulation.parallel import iter_jobs
+from undulation.instrument import stage
+
+# regular expression to fit tracking file
+track_file = re.compile(r""" ^(\w+)         #date
+                                (\d{6})     #video number
+                                (\w[A-Za-z]{1,2}\d{1,2}(?!\d))  #well number (e.g. _A1, _H12)
+                                (\w+)       #everything after
+                                """,re.VERBOSE)
+
+# name of the cache folder created within the dataset directory
+cache_dir = '.undulation_cache'
+
+# function to list all tracking files within a dataset, returns a list of
+# (video number + well number, file path) in natural sort order
+def tracking_files(dataset):
+    files = []
+    for datasheet in natsort.natsorted(os.listdir(dataset)):
+        # get video number and well number from file name
+        mo = track_file.search(datasheet)
+        if mo == None:
+            continue
+        files.append((mo.group(2) + mo.group(3), os.path.join(dataset, datasheet)))
+    return files
+
+# regular expression to split a key of the extracted data into video number and well number
+data_key = re.compile(r'^(.*?)_?([A-Za-z]{1,2}\d{1,2})$')
+
+# function to split a key of the extracted data (video number + '_' + well number, see
+# tracking_files) into video number and well number
+def split_key(key):
+    mo = data_key.match(key)
+    if mo is None:
+        return key[:-2].rstrip('_'), key[-2:]
+    return mo.group(1), mo.group(2)
+
+# function to get the well number of a key of the extracted data
+def key_well(key):
+    return split_key(key)[1]
+
+# function to read a single tracking file and reformat it to make it more readable,
+# unnecessary information will be removed, all coordinates will be shown as
+# columns for every frame
+def read_tracking(path):
+    with stage('parse', unit = 'files') as progress:
+        df = pd.read_csv(path)
+        progress.count += 1
+    with stage('pivot', unit = 'files') as progress:
+        progress.count += 1
+        return df.pivot(index = 'frame_number', columns = 'name', values = ['x', 'y'])
+
+# function to create the cache key of a tracking file from its path, size and
+# modification time, any change of the file results in a new key
+def cache_key(path):
+    stat = os.stat(path)
+    key = '%s|%d|%d' % (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+# function to get the location of the cached arrays of a tracking file
+def cache_path(path):
+    folder, name = os.path.split(path)
+    return os.path.join(folder, cache_dir, name + '.' + cache_key(path) + '.npz')
+
+# function to store pivoted tracking data as arrays, older cache files of the same
+# tracking file are removed. If the cache can't be written the data is just not cached
+def write_cache(df, cached):
+    name = os.path.basename(cached).rsplit('.', 2)[0]
+    try:
+        os.makedirs(os.path.dirname(cached), exist_ok = True)
+        for old in glob.glob(os.path.join(glob.escape(os.path.dirname(cached)), glob.escape(name) + '.*.npz')):
+            os.remove(old)
+        
+        # write to a temporary file first, so that an interrupted run leaves no broken cache
+        temp = cached + '.tmp'
+        with open(temp, 'wb') as f:
+            np.savez(f, values = df.to_numpy(), frames = df.index.to_numpy(),
+                     coords = df.columns.get_level_values(0).to_numpy(dtype = str),
+                     names = df.columns.get_level_values(1).to_numpy(dtype = str))
+        os.replace(temp, cached)
+    except OSError:
+        pass
+
+# function to load pivoted tracking data from the cache
+def read_cache(cached):
+    with np.load(cached) as arrays:
+        columns = pd.MultiIndex.from_arrays([arrays['coords'], arrays['names']], names = [None, 'name'])
+        index = pd.Index(arrays['frames'], name = 'frame_number')
+        return pd.DataFrame(arrays['values'], index = index, columns = columns)
+
+# function to read a tracking file using the cache, the file is only parsed if it
+# was not cached before or has changed since
+def read_tracking_cached(path):
+    cached = cache_path(path)
+    if os.path.exists(cached):
+        try:
+            return read_cache(cached)
+        except (OSError, ValueError, KeyError):
+            pass
+    df = read_tracking(path)
+    write_cache(df, cached)
+    return df
+
+# Extract data from a given location, creating a dictionary that contains a
+# dataframe with all needed datapoints for every well in every video.
+# Files are read in parallel by the given number of worker processes, with cache = True
+# the reformatted data is loaded from/saved to a cache next to the dataset
+def data_extraction(dataset, workers = 1, cache = True):
+    files = tracking_files(dataset)
+    reader = read_tracking_cached if cache else read_tracking
+    
+    # put all data into one dictionary using hour and well as index
+    all_data = {}
+    with stage('extraction', len(files), 'files') as progress:
+        tables = iter_jobs(reader, [(path,) for key, path in files], workers)
+        for (key, path), df in zip(files, tables):
+            all_data[key] = df
+            progress.add()
+    
+    return all_data
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+
+# Movement metrics of tracked body points. Displacements between consecutive
+# frames are computed with numpy.diff/numpy.hypot on (points x frames) arrays,
+# binned distances with numpy.add.reduceat, for any set of body points.
+# Displacement of frame f is the distance moved from frame f to frame f+1, the
+# last frame of a recording has none (NaN). Worms can be read from pivoted tracking
+# tables or from the memory-mapped coordinate store (see undulation/store.py), where
+# only the rows of the requested body points are read.
+
+import numpy as np
+import pandas as pd
+
+from undulation.store import read_index, well_coords
+
+# function to get the x and y coordinates of the given body points (all if None) from
+# pivoted tracking data (see undulation.io.read_tracking) as (points x frames) arrays
+def point_coords(df, points = None):
+    if points is None:
+        points = df.x.columns.to_list()
+    return df.x[points].to_numpy(dtype = float).T, df.y[points].to_numpy(dtype = float).T
+
+# function to calculate the per-frame displacement [px] of (points x frames) coordinates
+def displacement(x, y):
+    d = np.full(np.shape(x), np.nan)
+    d[:, :-1] = np.hypot(np.diff(x, axis = 1), np.diff(y, axis = 1))
+    return d
+
+# function to convert displacements [px/frame] into speed [px/s]
+def speed(d, fs = 15):
+    return d*fs
+
+# function to average the displacements of bins of 'bins' frames, frames without
+# displacement (untracked or the last frame) are left out. Returns the distance moved
+# in px/min (900 frames per minute) as (points x bins) array and the first frame of every bin
+def binned_distance(d, bins):
+    starts = np.arange(0, d.shape[1], bins)
+    valid = ~np.isnan(d)
+    sums = np.add.reduceat(np.where(valid, d, 0), starts, axis = 1)
+    counts = np.add.reduceat(valid, starts, axis = 1)
+    with np.errstate(invalid = 'ignore', divide = 'ignore'):
+        return sums/counts*900, starts
+
+# function to calculate the binned distance moved of one worm recorded in several videos
+# (a list of pivoted tracking tables in recording order). Videos are joined in the given
+# order, the step from the last frame of a video to the first frame of the next one is not
+# counted unless join_videos is True. Returns a table with the column 'Time' (start of the
+# bin in minutes) and one column per body point
+def movement(tables, bins, points = None, join_videos = False):
+    if points is None:
+        points = tables[0].x.columns.to_list()
+    return coords_movement([point_coords(df, points) for df in tables], bins, points, join_videos)
+
+# function to calculate the binned distance moved of one worm stored in the coordinate store
+# under the given keys (video number + well number) of condition c, in recording order (see
+# movement above)
+def stored_movement(root, c, keys, bins, points = None, join_videos = False):
+    index = read_index(root)
+    if points is None:
+        points = index[c][keys[0]]['points']
+    return coords_movement([well_coords(root, c, key, points, index) for key in keys], bins, points, join_videos)
+
+# function to calculate the binned distance moved from the (x, y) coordinates (points x frames
+# arrays of the given body points) of every video of a worm (see movement above)
+def coords_movement(coords, bins, points, join_videos = False):
+    x = np.concatenate([c[0] for c in coords], axis = 1)
+    y = np.concatenate([c[1] for c in coords], axis = 1)
+    d = displacement(x, y)
+    if not join_videos:
+        ends = np.cumsum([c[0].shape[1] for c in coords])[:-1]
+        d[:, ends - 1] = np.nan
+
+    distance, starts = binned_distance(d, bins)
+    table = pd.DataFrame(distance.T, columns = points)
+    table.insert(0, 'Time', starts/900)
+    return table
@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+
+# Online undulation detection while a plate is still being recorded. Tracking
+# rows (frame_number, name, x, y) are fed one at a time, every well keeps a
+# ring buffer of one bin per body point and is evaluated with the same spectral
+# criterion as frequencies() as soon as the first frame of the next bin arrives.
+# Memory per well is therefore constant and a decision is made at most one bin
+# after its first frame. Rows can come from tracking files that are still being
+# written, from a pipe or from a local socket:
+#
+#   python -m undulation.online D:/exp1/live --points Body Head --freq-bin 3 --frames 54000
+#   loopy_export | python -m undulation.online - --points Body Head
+#   python -m undulation.online --port 5005 --points Body Head
+#
+# Rows on a pipe or socket need an additional column "well" (e.g. 000022_A1),
+# the first line is the header. Differences to the offline analysis: bins are
+# placed by frame_number (not by row position) and frames missing at the end
+# of a bin are filled with the last tracked position, as the next bin is not
+# known yet when the decision is made. Frames missing at the start of a bin are
+# interpolated from that position as if it was tracked in the frame before the
+# bin. With --frames, the files of a folder are closed once they are complete.
+
+import os, sys, csv, time, socket, argparse
+
+import numpy as np
+
+from undulation.io import track_file
+from undulation.detection import undulation_bins
+from undulation.store import interpolate_cords
+
+# detector of a single well, holding the coordinates of the current bin
+class WellDetector:
+    def __init__(self, points, bins, low = 4, up = 17, interpolate = True):
+        self.points = {p: i for i, p in enumerate(points)}
+        self.bins = bins
+        self.low = low
+        self.up = up
+        self.interpolate = interpolate
+        self.buffer = np.full((2, len(points), bins), np.nan)
+        # last tracked position before the current bin, used to interpolate its first frames
+        self.last = np.full((2, len(points), 1), np.nan)
+        self.start = 0
+        self.length = 0
+
+    # function to add one row, returns the decisions [(bin start, undulating)] of all
+    # bins closed by it. Rows of closed bins and of other body points are ignored
+    def add(self, frame, name, x, y):
+        i = self.points.get(name)
+        if i is None or frame < self.start:
+            return []
+        decisions = []
+        while frame >= self.start + self.bins:
+            decisions.append(self.close())
+        offset = frame - self.start
+        self.buffer[0, i, offset] = x
+        self.buffer[1, i, offset] = y
+        self.length = max(self.length, offset + 1)
+        return decisions
+
+    # function to evaluate the current bin (also if it is not complete yet) and start the next one
+    def close(self):
+        start = self.start
+        positive = False
+        if self.length > 0:
+            cords = self.buffer[:, :, :self.length]
+            if self.interpolate:
+                cords = np.stack([interpolate_cords(np.concatenate([self.last[a], cords[a]], axis = 1))[:, 1:]
+                                  for a in range(2)])
+                tracked = ~np.isnan(cords[:, :, -1:])
+                self.last[tracked] = cords[:, :, -1:][tracked]
+            positive = len(undulation_bins(cords[0], cords[1], self.length, self.bins,
+                                           self.low, self.up)) > 0
+        self.buffer[:] = np.nan
+        self.start += self.bins
+        self.length = 0
+        return start, positive
+
+# detectors of all wells of a plate, created when the first row of a well arrives
+class PlateMonitor:
+    def __init__(self, points, bins, low = 4, up = 17, interpolate = True):
+        self.args = (list(points), bins, low, up, interpolate)
+        self.wells = {}
+
+    # function to add one row of a well, returns the decisions [(well, bin start, undulating)]
+    def feed(self, well, frame, name, x, y):
+        if well not in self.wells:
+            self.wells[well] = WellDetector(*self.args)
+        return [(well, start, positive) for start, positive in self.wells[well].add(frame, name, x, y)]
+
+    # function to evaluate the open bins of all wells, e.g. at the end of the recording
+    def flush(self):
+        return [(well, *self.wells[well].close()) for well in self.wells if self.wells[well].length > 0]
+
+# parser of the lines of a CSV stream, the first line is the header
+class RowParser:
+    def __init__(self, needed = ('frame_number', 'name', 'x', 'y')):
+        self.needed = needed
+        self.columns = None
+
+    # function to parse one line, returns the needed values or None for the header and
+    # rows that can't be read (e.g. untracked body points without coordinates)
+    def parse(self, line):
+        fields = next(csv.reader([line]))
+        if self.columns is None:
+            missing = [c for c in self.needed if c not in fields]
+            if missing:
+                raise ValueError('The header misses the columns: ' + ', '.join(missing))
+            self.columns = [fields.index(c) for c in self.needed]
+            return None
+        try:
+            values = [fields[i] for i in self.columns]
+            values[self.needed.index('frame_number')] = int(float(values[self.needed.index('frame_number')]))
+            values[self.needed.index('x')] = float(values[self.needed.index('x')])
+            values[self.needed.index('y')] = float(values[self.needed.index('y')])
+        except (IndexError, ValueError):
+            return None
+        return values
+
+# function to get the frame number of a line of a tracking file, column is the position of
+# frame_number in the header (None if the line has no frame number)
+def line_frame(line, column):
+    try:
+        return int(float(next(csv.reader([line]))[column]))
+    except (IndexError, ValueError):
+        return None
+
+# generator yielding (well, line) for all tracking files within a folder, including files
+# that are still being written or appear later. Stops after 'idle' seconds without new
+# lines (None = never). With frames (number of frames of a recording), a file is closed
+# once it reached its last frame and no further lines followed, and is not read again
+def follow_folder(folder, poll = 0.5, idle = None, frames = None):
+    handles = {}
+    partial = {}
+    # position of frame_number, first frame and whether the last frame was reached, per file
+    column = {}
+    first = {}
+    complete = set()
+    finished = set()
+    quiet = time.monotonic()
+    try:
+        while True:
+            for datasheet in os.listdir(folder):
+                mo = track_file.search(datasheet)
+                if mo is not None and datasheet not in handles and datasheet not in finished:
+                    handles[datasheet] = (mo.group(2) + mo.group(3), open(os.path.join(folder, datasheet)))
+                    partial[datasheet] = ''
+            new = False
+            for datasheet, (well, f) in list(handles.items()):
+                received = False
+                for line in f:
+                    line = partial[datasheet] + line
+                    # the writer may not have finished the line yet
+                    if not line.endswith('\n'):
+                        partial[datasheet] = line
+                        break
+                    partial[datasheet] = ''
+                    new = received = True
+                    if frames is not None:
+                        if datasheet not in column:
+                            header = next(csv.reader([line]))
+                            column[datasheet] = header.index('frame_number') if 'frame_number' in header else None
+                        elif column[datasheet] is not None:
+                            frame = line_frame(line, column[datasheet])
+                            if frame is not None:
+                                first.setdefault(datasheet, frame)
+                                if frame - first[datasheet] + 1 >= frames:
+                                    complete.add(datasheet)
+                    yield well, line
+                else:
+                    # end of the file reached again after its last frame: all rows were received
+                    if datasheet in complete and not received and partial[datasheet] == '':
+                        f.close()
+                        del handles[datasheet]
+                        finished.add(datasheet)
+            if new:
+                quiet = time.monotonic()
+            elif idle is not None and time.monotonic() - quiet > idle:
+                return
+            else:
+                time.sleep(poll)
+    finally:
+        for well, f in handles.values():
+            f.close()
+
+# generator yielding the lines received on a local socket, connections are accepted one
+# after another
+def socket_lines(port, host = '127.0.0.1'):
+    with socket.create_server((host, port)) as server:
+        while True:
+            conn, address = server.accept()
+            with conn, conn.makefile('r') as f:
+                for line in f:
+                    yield line
+
+# function to run the monitor on a source of lines, on_decision is called for every
+# decision (well, bin start, undulating). Lines of a folder carry their well, lines of
+# a stream have a "well" column
+def monitor(lines, points, bins, on_decision, low = 4, up = 17, interpolate = True, by_file = False):
+    plate = PlateMonitor(points, bins, low, up, interpolate)
+    parsers = {}
+    try:
+        if by_file:
+            for well, line in lines:
+                if well not in parsers:
+                    parsers[well] = RowParser()
+                row = parsers[well].parse(line)
+                if row is not None:
+                    for decision in plate.feed(well, *row):
+                        on_decision(*decision)
+        else:
+            parser = RowParser(('well', 'frame_number', 'name', 'x', 'y'))
+            for line in lines:
+                row = parser.parse(line)
+                if row is not None:
+                    for decision in plate.feed(*row):
+                        on_decision(*decision)
+    except KeyboardInterrupt:
+        pass
+    for decision in plate.flush():
+        on_decision(*decision)
+    return plate
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog = 'python -m undulation.online',
+                                     description = 'Detect undulation while tracking data is recorded.')
+    parser.add_argument('source', nargs = '?', help = 'folder with growing tracking files or - for stdin')
+    parser.add_argument('--port', type = int, help = 'read rows from a local socket instead')
+    parser.add_argument('--points', nargs = '+', required = True, help = 'body points to evaluate')
+    parser.add_argument('--freq-bin', type = float, default = 3, help = 'binsize in seconds')
+    parser.add_argument('--low', type = int, default = 4)
+    parser.add_argument('--up', type = int, default = 17)
+    parser.add_argument('--poll', type = float, default = 0.5, help = 'seconds between checks of the folder')
+    parser.add_argument('--idle', type = float, help = 'stop after this many seconds without new rows')
+    parser.add_argument('--frames', type = int, help = 'frames per recording, complete files are closed')
+    parser.add_argument('--output', help = 'CSV file the decisions of all bins are appended to')
+    parser.add_argument('--all', action = 'store_true', help = 'also print bins without undulation')
+    args = parser.parse_args(argv)
+    if (args.source is None) == (args.port is None):
+        parser.error('give either a source or --port')
+
+    bins = int(args.freq_bin*15) #15 frames per second
+    out = None
+    if args.output is not None:
+        new = not os.path.exists(args.output)
+        out = open(args.output, 'a', newline = '')
+        writer = csv.writer(out)
+        if new:
+            writer.writerow(['Well', 'Start_Frame', 'Undulation'])
+
+    def on_decision(well, start, positive):
+        if positive or args.all:
+            print(well + ' ' + str(start) + ' (' + str(round(start/900, 2)) + ' min): '
+                  + ('undulation' if positive else '-'), flush = True)
+        if out is not None:
+            writer.writerow([well, start, int(positive)])
+            out.flush()
+
+    if args.port is not None:
+        lines, by_file = socket_lines(args.port), False
+    elif args.source == '-':
+        lines, by_file = sys.stdin, False
+    else:
+        lines, by_file = follow_folder(args.source, args.poll, args.idle, args.frames), True
+    try:
+        monitor(lines, args.points, bins, on_decision, args.low, args.up, by_file = by_file)
+    finally:
+        if out is not None:
+            out.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,241 @@
+# -*- coding: utf-8 -*-
+
+# Reorganisation of loopy output files into the folders used by the analysis:
+#
+#   <dest>/<experiment>/<day|subday>/<wt|mut>/<date>_<video>_<well>_<experiment>.csv
+#
+# Videos 22-29 are day, higher video numbers subday recordings. Files are sorted
+# by the genotype of their well following the plate set-up (see undulation/plates.py,
+# Common: wild-type "wt" in wells A1-C2, mutant "mut" in wells C3-E5). A plan is
+# built from the file names first: the files of every video are ordered by their
+# continuous number and have to be consecutive files, one per well of the plate
+# in plate order (25 for Common, A1 to E5), otherwise no file is touched. The plan
+# is then executed by a thread pool, files are copied, hard-linked or symlinked
+# (links only within the same filesystem, files on another filesystem are copied).
+# Copies are verified by their SHA-256 checksum, links by pointing to the source.
+# A manifest of all files in place (with the checksum of every copy) is kept in
+# the experiment folder. Every placed file is appended to a journal right away and
+# the journal is merged into the manifest at the end, so files that are already in
+# place are skipped on reruns, also after an interrupted run:
+#
+#   python -m undulation.organize D:/loopy/out --date 20200131 --experiment exp1
+#   python -m undulation.organize D:/loopy/out --date 20200131 --experiment exp1 --mode hardlink
+#   python -m undulation.organize D:/loopy/out --date 20200131 --experiment exp1 --layout plate96.csv
+
+import os, re, sys, json, shutil, argparse, natsort
+
+from undulation.cache import file_hash
+from undulation.parallel import iter_jobs
+from undulation.plates import Common, get_layout
+
+# regular expression to match the loopy output files
+loopy_file = re.compile(r""" ^(d\w{29})  #all text before continous number
+                           (\d{5})          #continous number
+                           (\w+\D)          #text before video number
+                           (0\d{5})          #video number
+                           (\w+)            #everything after video number
+                           """,re.VERBOSE)
+
+# ways to put a file in place
+modes = ['copy', 'hardlink', 'symlink']
+
+manifest_name = 'manifest.json'
+journal_name = 'manifest.jsonl'
+
+# raised if the files found don't allow a safe well assignment
+class PlanError(ValueError):
+    pass
+
+# function to get the folder of a well within the experiment folder (day: video numbers
+# below 30, the genotype of the well in lower case)
+def well_folder(video, well, layout = Common):
+    period = 'day' if int(video) < 30 else 'subday'
+    return os.path.join(period, layout.genotype(well).lower())
+
+# function to build the plan of the reorganisation, returns a list of (source, target,
+# video number, well) in video and well order. Targets are relative to the experiment
+# folder. Raises a PlanError if a video does not consist of one file per well of the plate
+# with consecutive numbers (loopy analyses the wells in plate order)
+def build_plan(folder, date, experiment, layout = Common):
+    wells = layout.wells
+    videos = {}
+    for name in natsort.natsorted(os.listdir(folder)):
+        mo = loopy_file.search(name)
+        if mo is None:
+            continue
+        videos.setdefault(mo.group(4), []).append((int(mo.group(2)), name))
+    if not videos:
+        raise PlanError('No loopy output files found in ' + folder)
+
+    problems = []
+    plan = []
+    for video in natsort.natsorted(videos):
+        files = sorted(videos[video])
+        numbers = [n for n, name in files]
+        if len(files) != len(wells):
+            problems.append('video ' + video + ': ' + str(len(files)) + ' files instead of ' + str(len(wells)))
+            continue
+        if numbers != list(range(numbers[0], numbers[0] + len(wells))):
+            missing = sorted(set(range(numbers[0], numbers[-1] + 1)) - set(numbers))
+            problems.append('video ' + video + ': continuous numbers are not consecutive (missing '
+                            + ', '.join(str(n) for n in missing) + ')')
+            continue
+        for well, (n, name) in zip(wells, files):
+            renamed = date + '_' + video + '_' + well + '_' + experiment + '.csv'
+            target = os.path.join(well_folder(video, well, layout), renamed)
+            plan.append((os.path.join(folder, name), target, video, well))
+    if problems:
+        raise PlanError('No files were organised, wells could not be assigned safely:\n' + '\n'.join(problems))
+    return plan
+
+# function to read the manifest of an experiment folder {target: entry}, entries of the
+# journal of an interrupted run are applied on top (an entry of None removes the target)
+def read_manifest(root):
+    try:
+        with open(os.path.join(root, manifest_name)) as f:
+            files = json.load(f)['files']
+    except (OSError, ValueError, KeyError):
+        files = {}
+    try:
+        with open(os.path.join(root, journal_name)) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # last line of an interrupted write
+                    continue
+                if record['entry'] is None:
+                    files.pop(record['target'], None)
+                else:
+                    files[record['target']] = record['entry']
+    except OSError:
+        pass
+    return files
+
+# function to write the manifest of an experiment folder, the journal is merged with it
+def write_manifest(root, files):
+    path = os.path.join(root, manifest_name)
+    with open(path + '.tmp', 'w') as f:
+        json.dump({'files': files}, f, indent = 1, sort_keys = True)
+    os.replace(path + '.tmp', path)
+    if os.path.exists(os.path.join(root, journal_name)):
+        os.remove(os.path.join(root, journal_name))
+
+# function to append the manifest entry of one file to the journal (open file)
+def append_journal(journal, target, entry):
+    journal.write(json.dumps({'target': target, 'entry': entry}, sort_keys = True) + '\n')
+    journal.flush()
+
+# function to check if a target is in place as recorded in the manifest (entry) with the
+# same mode, the source must not have changed since (same size and modification time)
+def in_place(source, path, entry, mode):
+    if entry is None or entry['mode'] != mode or entry['source'] != os.path.abspath(source):
+        return False
+    stat = os.stat(source)
+    if entry['size'] != stat.st_size or entry['mtime_ns'] != stat.st_mtime_ns:
+        return False
+    if entry['action'] == 'symlink':
+        return os.path.islink(path) and os.readlink(path) == os.path.abspath(source)
+    return os.path.isfile(path) and not os.path.islink(path) and os.path.getsize(path) == stat.st_size
+
+# function to put one file in place, returns (target, manifest entry, action, error).
+# Links fall back to a copy if source and target are on different filesystems, only
+# copies are hashed (sha256 is None for links)
+def place_file(source, target, root, mode = 'copy', entry = None):
+    path = os.path.join(root, target)
+    try:
+        if in_place(source, path, entry, mode):
+            return target, entry, 'skipped', None
+
+        os.makedirs(os.path.dirname(path), exist_ok = True)
+        if os.path.lexists(path):
+            os.remove(path)
+        stat = os.stat(source)
+        checksum = None
+        action = mode
+        if mode != 'copy' and os.stat(os.path.dirname(path)).st_dev != stat.st_dev:
+            action = 'copy'
+
+        if action == 'hardlink':
+            os.link(source, path)
+            verified = os.path.samefile(source, path)
+        elif action == 'symlink':
+            os.symlink(os.path.abspath(source), path)
+            verified = os.path.samefile(source, path)
+        else:
+            checksum = file_hash(source)
+            shutil.copyfile(source, path)
+            verified = file_hash(path) == checksum
+        if not verified:
+            os.remove(path)
+            return target, None, 'failed', 'verification failed'
+
+        return target, {'source': os.path.abspath(source), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                        'sha256': checksum, 'mode': mode, 'action': action}, action, None
+    except OSError as err:
+        return target, None, 'failed', str(err)
+
+# function to execute a plan (see build_plan) within the experiment folder 'root' by
+# the given number of threads. Every placed or failed file is recorded in the journal as
+# soon as it is done, the manifest is updated with all files in place at the end, also if
+# single files failed. Returns the list of (target, action, error)
+def execute_plan(plan, root, mode = 'copy', workers = 8, show = print):
+    if mode not in modes:
+        raise ValueError('Unknown mode "' + str(mode) + '", use one of: ' + ', '.join(modes))
+    os.makedirs(root, exist_ok = True)
+    manifest = read_manifest(root)
+    jobs = [(source, target, root, mode, manifest.get(target)) for source, target, video, well in plan]
+
+    done = []
+    with open(os.path.join(root, journal_name), 'a') as journal:
+        for (source, target, video, well), (target, entry, action, error) in zip(
+                plan, iter_jobs(place_file, jobs, workers, threads = True)):
+            if entry is not None:
+                manifest[target] = entry
+            else:
+                manifest.pop(target, None)
+            if action != 'skipped':
+                append_journal(journal, target, entry)
+            if show is not None and action != 'skipped':
+                show('%s "%s" to "%s"' % (action if error is None else 'FAILED (' + error + ')', source, target))
+            done.append((target, action, error))
+    write_manifest(root, manifest)
+    return done
+
+# function to summarise the executed plan, e.g. '25 files: 20 copy, 5 skipped'
+def summary(done):
+    actions = {}
+    for target, action, error in done:
+        actions[action] = actions.get(action, 0) + 1
+    return str(len(done)) + ' files: ' + ', '.join(str(n) + ' ' + a for a, n in actions.items())
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog = 'python -m undulation.organize',
+                                     description = 'Rename and sort loopy output files by video and well.')
+    parser.add_argument('folder', help = 'folder with the loopy output files')
+    parser.add_argument('--date', required = True, help = 'date of the videos (YYYYMMDD)')
+    parser.add_argument('--experiment', required = True, help = 'name of the experiment')
+    parser.add_argument('--dest', help = 'folder the experiment folder is created in (default: folder)')
+    parser.add_argument('--mode', choices = modes, default = 'copy')
+    parser.add_argument('--layout', default = 'common', help = 'plate set-up name or plate map (.csv/.json)')
+    parser.add_argument('--workers', type = int, default = 8, help = 'number of threads')
+    parser.add_argument('--dry-run', action = 'store_true', help = 'only show the plan')
+    args = parser.parse_args(argv)
+
+    try:
+        plan = build_plan(args.folder, args.date, args.experiment, get_layout(args.layout))
+    except (ValueError, OSError) as err:
+        print('Error: ' + str(err), file = sys.stderr)
+        return 2
+    root = os.path.join(args.dest or args.folder, args.experiment)
+    if args.dry_run:
+        for source, target, video, well in plan:
+            print('"%s" -> "%s"' % (source, os.path.join(root, target)))
+        return 0
+
+    done = execute_plan(plan, root, args.mode, args.workers)
+    print(summary(done))
+    return 1 if any(error is not None for target, action, error in done) else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+# Execution layer to fan out independent per-well/per-video jobs across a
+# process pool. Results are always returned in the order the jobs were given,
+# independent of which process finishes first. Jobs that mostly wait for the
+# disk or network (e.g. copying files) can be run by a thread pool instead.
+
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# function to resolve the number of worker processes, None uses all CPU cores
+def worker_count(workers, jobs):
+    if workers is None:
+        workers = os.cpu_count() or 1
+    return max(1, min(workers, jobs))
+
+# generator yielding func(*job) for every job (a tuple of arguments) in job order.
+# With workers = 1 everything is run serially within this process, so only one
+# job is processed at a time. With threads = True a thread pool is used
+def iter_jobs(func, jobs, workers = 1, chunksize = 1, threads = False):
+    jobs = list(jobs)
+    workers = worker_count(workers, len(jobs))
+    if workers == 1:
+        for job in jobs:
+            yield func(*job)
+        return
+    
+    executor = ThreadPoolExecutor if threads else ProcessPoolExecutor
+    with executor(max_workers = workers) as pool:
+        for result in pool.map(func, *zip(*jobs), chunksize = chunksize):
+            yield result
+
+# function to run func(*job) for every job and return the results in job order
+def run_jobs(func, jobs, workers = 1, chunksize = 1):
+    return list(iter_jobs(func, jobs, workers, chunksize))
+
+# function to run func for every entry of a nested dictionary {condition: {key: job}},
+# returns a nested dictionary of results with the same keys and ordering. All jobs of
+# all conditions share one pool. Finished jobs are counted by progress (see
+# undulation/instrument.py) if given
+def run_nested(func, jobs, workers = 1, chunksize = 1, progress = None):
+    flat = [(c, e) for c in jobs for e in jobs[c]]
+    results = iter_jobs(func, [jobs[c][e] for c, e in flat], workers, chunksize)
+    
+    nested = {c: {} for c in jobs}
+    for (c, e), result in zip(flat, results):
+        nested[c][e] = result
+        if progress is not None:
+            progress.add()
+    return nested
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+# Streaming mode of the analysis. Instead of extracting the data of all
+# conditions first, every tracking file is read, interpolated and analysed on
+# its own and only the resulting list of undulation-positive bin starts is
+# kept. Peak memory is thereby bounded by the data of a single well (per
+# worker process). With reuse = True, results are taken from the result cache
+# (see undulation/cache.py) if the tracking file was already analysed with the
+# same parameters, the file is then not read at all.
+
+import numpy as np
+
+from undulation.io import tracking_files, read_tracking, read_tracking_cached, key_well
+from undulation.detection import undulation_bins, filled_fraction
+from undulation.parallel import iter_jobs
+from undulation.cache import cached_result
+from undulation.instrument import stage
+from undulation.qc import tracked_mask, gap_stats, window_coverage, stats_tables
+from undulation.gaps import fill_gaps
+
+# function to read a tracking file, optionally using the cache
+def load_tracking(path, cache = True):
+    if cache:
+        return read_tracking_cached(path)
+    return read_tracking(path)
+
+# function to list the tracking files of all conditions given as {condition: dataset},
+# returns a list of (condition, video number + well number, path), wells in exclude are skipped
+def condition_files(cond_loc, exclude = ()):
+    files = []
+    for c in cond_loc:
+        for key, path in tracking_files(cond_loc[c]):
+            if key_well(key) in exclude:
+                continue
+            files.append((c, key, path))
+    return files
+
+# function to count the tracked frames for every body point of a single tracking file
+def file_coverage(path, cache = True):
+    return load_tracking(path, cache).x.count()
+
+# function to read, interpolate and analyse a single tracking file, only the list of
+# undulation-positive bin starts is returned, the coordinates are released afterwards.
+# Gaps are filled as set by max_gap and method (see undulation/gaps.py)
+def file_undulation_bins(path, frames, bins, points, low = 4, up = 17, interpolate = True, cache = True,
+                         hop = None, max_gap = None, method = 'linear', max_filled = None, fractions = False):
+    df = load_tracking(path, cache)
+    x = df.x[points].to_numpy(dtype = float).T
+    y = df.y[points].to_numpy(dtype = float).T
+    filled = None
+    if interpolate:
+        with stage('interpolation') as progress:
+            (x, y), filled = fill_gaps(np.stack([x, y]), max_gap, method)
+            filled = filled[0]
+            progress.count += 1
+    starts = undulation_bins(x, y, frames, bins, low, up, hop = hop, filled = filled, max_filled = max_filled)
+    if fractions:
+        return with_fractions(starts, filled, frames, bins, hop)
+    return starts
+
+# function to combine the bin starts of a well with the fraction of filled frames of every
+# body point and bin (see filled_fraction in undulation/detection.py; None if the gaps were
+# not filled), returned by the functions above with fractions = True
+def with_fractions(starts, filled, frames, bins, hop = None):
+    fraction = filled_fraction(filled, frames, bins, hop).tolist() if filled is not None else None
+    return {'starts': starts, 'filled': fraction}
+
+# function to split the results of wells analysed with fractions = True into the dictionary
+# of bin starts and the fractions of filled frames {condition: {key: (points x bins)}}
+def split_fractions(results):
+    freq_list = {c: {e: results[c][e]['starts'] for e in results[c]} for c in results}
+    fractions = {c: {e: results[c][e]['filled'] for e in results[c] if results[c][e]['filled'] is not None}
+                 for c in results}
+    return freq_list, fractions
+
+# functions to get the results above from the result cache, the parameters of the
+# spectral criterion are part of the key, so that changes of the detector are noticed
+def cached_file_coverage(path, cache = True):
+    return cached_result(path, 'coverage', {},
+                         lambda: {p: int(n) for p, n in file_coverage(path, cache).items()})
+
+def cached_file_undulation_bins(path, frames, bins, points, low = 4, up = 17, interpolate = True, cache = True,
+                                hop = None, max_gap = None, method = 'linear', max_filled = None, fractions = False):
+    params = {'frames': frames, 'bins': bins, 'points': list(points), 'low': low, 'up': up,
+              'interpolate': interpolate, 'method': 'periodogram', 'fs': 15,
+              'min_move': 0.5, 'max_move': 15}
+    if hop is not None and hop != bins:
+        params['hop'] = hop
+    # gap settings are only part of the key if they differ from plain interpolation
+    if interpolate and (max_gap is not None or method != 'linear'):
+        params['gaps'] = {'max_gap': max_gap, 'method': method}
+    if max_filled is not None:
+        params['max_filled'] = max_filled
+    if fractions:
+        params['fractions'] = True
+    return cached_result(path, 'undulation_bins', params,
+                         lambda: file_undulation_bins(path, frames, bins, points, low, up, interpolate, cache, hop,
+                                                      max_gap, method, max_filled, fractions))
+
+# function to check if coverage is >90% (see check_track in undulation/qc.py) while
+# reading only one tracking file at a time, returns the list of wells suggested for exclusion
+def check_track_files(cond_loc, frames, cache = True, workers = 1, reuse = False):
+    files = condition_files(cond_loc)
+    job = cached_file_coverage if reuse else file_coverage
+    counts = iter_jobs(job, [(path, cache) for c, key, path in files], workers)
+    
+    ex_well = []
+    with stage('coverage check', len(files), 'files') as progress:
+        for (c, key, path), count in zip(files, counts):
+            if key_well(key) not in ex_well and any(n < frames*0.9 for n in dict(count).values()):
+                ex_well.append(key_well(key))
+            progress.add()
+    
+    print('The following wells do not show complete tracking, thus are suggested to be excluded from analysis'
+          , ex_well, sep = '\n')
+    return ex_well
+
+# function to get the gap statistics of every body point of a single tracking file (see
+# undulation/qc.py), with window (in frames) also the coverage of every time window
+def file_qc(path, frames, window = None, cache = True):
+    df = load_tracking(path, cache)
+    tracked = tracked_mask(df.x.to_numpy(dtype = float).T, frames)
+    count, gaps, longest = gap_stats(tracked)
+    stats = {'points': df.x.columns.to_list(), 'tracked': count.tolist(), 'gaps': gaps.tolist(),
+             'longest_gap': longest.tolist()}
+    if window:
+        stats['windows'] = window_coverage(tracked, window).tolist()
+    return stats
+
+def cached_file_qc(path, frames, window = None, cache = True):
+    return cached_result(path, 'qc', {'frames': frames, 'window': window},
+                         lambda: file_qc(path, frames, window, cache))
+
+# function to create the QC tables of all tracking files (see plate_qc in undulation/qc.py)
+# while reading only one tracking file at a time
+def qc_files(cond_loc, frames, window = None, cache = True, workers = 1, reuse = False):
+    files = condition_files(cond_loc)
+    job = cached_file_qc if reuse else file_qc
+    stats = iter_jobs(job, [(path, frames, window, cache) for c, key, path in files], workers)
+    
+    labels = []
+    collected = []
+    with stage('coverage check', len(files), 'files') as progress:
+        for (c, key, path), s in zip(files, stats):
+            labels.append((c, key))
+            collected.append(s)
+            progress.add()
+    return stats_tables(labels, collected, frames, window)
+
+# generator yielding (condition, key, undulation-positive bin starts) one tracking file at a time,
+# with fractions = True the bin starts are given together with the fractions of filled frames
+def iter_frequencies(cond_loc, frames, bins, points, low = 4, up = 17, interpolate = True,
+                     exclude = (), cache = True, workers = 1, reuse = False, hop = None,
+                     max_gap = None, method = 'linear', max_filled = None, fractions = False):
+    files = condition_files(cond_loc, exclude)
+    job = cached_file_undulation_bins if reuse else file_undulation_bins
+    jobs = [(path, frames, bins, points, low, up, interpolate, cache, hop, max_gap, method, max_filled, fractions)
+            for c, key, path in files]
+    for (c, key, path), starts in zip(files, iter_jobs(job, jobs, workers)):
+        yield c, key, starts
+
+# function to collect the streamed results into the dictionary created by frequencies(). With
+# fractions = True the fractions of filled frames of every well and bin are returned as well
+# (see split_fractions)
+def stream_frequencies(cond_loc, frames, bins, points, low = 4, up = 17, interpolate = True,
+                       exclude = (), cache = True, workers = 1, reuse = False, hop = None,
+                       max_gap = None, method = 'linear', max_filled = None, fractions = False):
+    results = {}
+    for c in cond_loc:
+        results[c] = {}
+    with stage('frequencies', len(condition_files(cond_loc, exclude)), 'files') as progress:
+        for c, key, starts in iter_frequencies(cond_loc, frames, bins, points, low, up,
+                                               interpolate, exclude, cache, workers, reuse, hop,
+                                               max_gap, method, max_filled, fractions):
+            results[c][key] = starts
+            progress.add()
+    if fractions:
+        return split_fractions(results)
+    return results
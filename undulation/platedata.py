@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+# Plate-level array of tracking data. Instead of a dictionary of DataFrames per
+# condition and video+well key, the coordinates of all conditions, videos and
+# wells are held in one contiguous array of shape
+#
+#   (conditions x videos x wells x 2 x points x frames)     (2 = x, y)
+#
+# with labels for every axis. x and y of a body point are contiguous along the
+# frames, as needed for the spectral analysis (same layout as the coordinate
+# store, see undulation/store.py). Wells that were not recorded in a video are
+# marked in 'present', recordings shorter than the frame axis end in NaN. Worm
+# names and genotypes come from the plate set-up (see undulation/plates.py).
+# After gap filling, 'filled' marks the filled frames of every body point as
+# (conditions x videos x wells x points x frames) boolean array.
+#
+# Coordinates are held as float64 by default, so the results equal those of
+# frequencies() on the dictionary of DataFrames. dtype = 'float64' halves the
+# memory, but rounds the coordinates: bins close to the movement or spectral
+# thresholds can then be decided differently.
+
+import natsort
+import numpy as np
+
+from undulation.io import tracking_files, read_tracking, read_tracking_cached, split_key
+from undulation.detection import undulation_bins, filled_fraction
+from undulation.parallel import iter_jobs, run_nested
+from undulation.plates import Common, as_layout
+from undulation.instrument import stage
+from undulation.qc import tracked_mask
+from undulation.gaps import fill_gaps, filled_table
+
+class PlateData:
+    def __init__(self, coords, present, lengths, conditions, videos, wells, points, layout = Common):
+        self.coords = coords
+        self.present = present
+        self.lengths = lengths
+        self.conditions = list(conditions)
+        self.videos = list(videos)
+        self.wells = list(wells)
+        self.points = list(points)
+        self.layout = as_layout(layout)
+        self.filled = None
+
+    # function to create the plate array from extracted data {condition: {video+well: pivoted df}}
+    # (see undulation.io.data_extraction). Body points default to those of the first table
+    @classmethod
+    def from_data(cls, data, points = None, layout = Common, dtype = 'float64'):
+        keys = [(c, e) for c in data for e in data[c]]
+        if points is None:
+            c, e = keys[0]
+            points = data[c][e].x.columns.to_list()
+        frames = max((len(data[c][e]) for c, e in keys), default = 0)
+        plate = cls.empty(list(data), [e for c, e in keys], points, frames, layout, dtype)
+        for c, e in keys:
+            plate.insert(c, e, data[c][e])
+        return plate
+
+    # function to read the tracking files of all conditions {condition: dataset} directly into
+    # the plate array, only one file per worker process is held as DataFrame at a time.
+    # frames is the length of the frame axis (longer recordings are cut), body points default
+    # to those of the first tracking file
+    @classmethod
+    def from_folders(cls, cond_loc, frames, points = None, layout = Common, cache = True, workers = 1,
+                     dtype = 'float64'):
+        files = [(c, key, path) for c in cond_loc for key, path in tracking_files(cond_loc[c])]
+        reader = read_tracking_cached if cache else read_tracking
+        if points is None:
+            points = reader(files[0][2]).x.columns.to_list()
+        plate = cls.empty(list(cond_loc), [key for c, key, path in files], points, frames, layout, dtype)
+        with stage('extraction', len(files), 'files') as progress:
+            for (c, key, path), df in zip(files, iter_jobs(reader, [(path,) for c, key, path in files], workers)):
+                plate.insert(c, key, df)
+                progress.add()
+        return plate
+
+    # function to create an empty plate array for the given conditions and video+well keys
+    @classmethod
+    def empty(cls, conditions, keys, points, frames, layout = Common, dtype = 'float64'):
+        videos = natsort.natsorted({split_key(e)[0] for e in keys})
+        wells = natsort.natsorted({split_key(e)[1] for e in keys})
+        shape = (len(conditions), len(videos), len(wells))
+        coords = np.full(shape + (2, len(points), frames), np.nan, dtype = dtype)
+        return cls(coords, np.zeros(shape, dtype = bool), np.zeros(shape, dtype = np.int64),
+                   conditions, videos, wells, points, layout)
+
+    # function to copy the pivoted tracking data of one well into the array
+    def insert(self, c, key, df):
+        i = self.index(c, key)
+        n = min(len(df), self.coords.shape[-1])
+        self.coords[i + (0,)][:, :n] = df.x[self.points].to_numpy()[:n].T
+        self.coords[i + (1,)][:, :n] = df.y[self.points].to_numpy()[:n].T
+        self.present[i] = True
+        self.lengths[i] = n
+
+    # function to get the (condition, video, well) index of a condition and video+well key
+    def index(self, c, key):
+        video, well = split_key(key)
+        return self.conditions.index(c), self.videos.index(video), self.wells.index(well)
+
+    # function to get the video+well keys of all present wells in the order of the extracted data
+    def keys(self):
+        return [(self.conditions[c], self.key(v, w)) for c, v, w in np.argwhere(self.present)]
+
+    # function to get the video+well key of a video and well index
+    def key(self, v, w):
+        return self.videos[v] + '_' + self.wells[w]
+
+    # function to get the (2 x points x frames) coordinates of one well as view
+    def well(self, c, key):
+        i = self.index(c, key)
+        return self.coords[i][..., :self.lengths[i]]
+
+    # function to get the worm name of every well following the plate set-up
+    def worms(self):
+        return self.layout.labels(self.wells).astype(str)
+
+    # function to get the genotype of every well following the plate set-up (e.g. 'WT')
+    def genotypes(self):
+        return self.layout.labels(self.wells, 'Genotype').astype(str)
+
+    # function to get a boolean mask of the wells of one genotype
+    def genotype_wells(self, genotype):
+        return self.genotypes() == genotype
+
+    # function to count the tracked frames of every body point, returns a
+    # (conditions x videos x wells x points) array (0 for wells that are not present)
+    def coverage(self):
+        return (~np.isnan(self.coords[:, :, :, 0])).sum(axis = -1)
+
+    # function to get the masks of tracked frames of all present wells, returns the
+    # (condition, key) labels, the body points and a (wells x points x frames) array
+    # (see plate_qc in undulation/qc.py)
+    def tracked(self, frames):
+        return self.keys(), self.points, tracked_mask(self.coords[self.present][:, 0], frames)
+
+    # function to check if coverage is >90% (see check_track in undulation/qc.py), returns
+    # the list of wells suggested for exclusion in the order they are found
+    def check_track(self, frames):
+        bad = self.present & (self.coverage() < frames*0.9).any(axis = -1)
+        ex_well = []
+        for c, v, w in np.argwhere(bad):
+            if self.wells[w] not in ex_well:
+                ex_well.append(self.wells[w])
+        print('The following wells do not show complete tracking, thus are suggested to be excluded from analysis'
+              , ex_well, sep = '\n')
+        return ex_well
+
+    # function to remove wells from the analysis (see remove_data in undulation/qc.py)
+    def remove(self, exclude):
+        self.present[:, :, np.isin(self.wells, list(exclude))] = False
+
+    # function to fill the gaps of all wells along the frames (see undulation/gaps.py), gaps
+    # longer than max_gap frames stay NaN. All wells of a video of a condition are filled at
+    # once, frames after the end of a recording stay empty. The filled frames are kept in 'filled'
+    def fill_gaps(self, max_gap = None, method = 'linear'):
+        if self.filled is None:
+            self.filled = np.zeros(self.coords.shape[:3] + self.coords.shape[4:], dtype = bool)
+        with stage('interpolation', int(self.present.sum())) as progress:
+            for c, v in np.argwhere(self.present.any(axis = 2)):
+                block, gap = fill_gaps(self.coords[c, v], max_gap, method,
+                                       self.lengths[c, v][:, np.newaxis, np.newaxis])
+                self.coords[c, v] = block
+                # x and y of a body point are tracked together
+                self.filled[c, v] |= gap[:, 0]
+                progress.count += int(self.present[c, v].sum())
+
+    # function to replace NaN-values by linear interpolation along the frames (same as
+    # DataFrame.interpolate() on the extracted data)
+    def interpolate(self):
+        self.fill_gaps()
+
+    # function to get the (points x frames) mask of filled frames of the given body points of
+    # one well (None if the gaps were not filled)
+    def well_filled(self, c, v, w, rows):
+        if self.filled is None:
+            return None
+        return self.filled[c, v, w][rows, :self.lengths[c, v, w]]
+
+    # function to extract the undulation-positive bin starts of all present wells for the
+    # given body points, returns the same dictionary as frequencies() in undulation/detection.py.
+    # Bins of a point with more than max_filled (fraction) filled frames are skipped
+    def frequencies(self, frames, bins, points, low = 4, up = 17, workers = 1, hop = None, max_filled = None):
+        rows = [self.points.index(p) for p in points]
+        jobs = {c: {} for c in self.conditions}
+        for c, v, w in np.argwhere(self.present):
+            cords = self.coords[c, v, w][:, rows, :self.lengths[c, v, w]]
+            jobs[self.conditions[c]][self.key(v, w)] = (cords[0], cords[1], frames, bins,
+                                                        low, up, 15, 0.5, 15, hop,
+                                                        self.well_filled(c, v, w, rows), max_filled)
+        with stage('frequencies', int(self.present.sum())) as progress:
+            return run_nested(undulation_bins, jobs, workers, progress = progress)
+
+    # function to create the table of bins with more than max_filled filled frames of the
+    # given body points (see filled_table in undulation/gaps.py)
+    def filled_bins(self, frames, bins, points, max_filled, hop = None):
+        rows = [self.points.index(p) for p in points]
+        labels = []
+        fractions = []
+        if self.filled is not None:
+            for c, v, w in np.argwhere(self.present):
+                labels.append((self.conditions[c], self.key(v, w)))
+                fractions.append(filled_fraction(self.well_filled(c, v, w, rows), frames, bins, hop))
+        return filled_table(labels, points, fractions, bins if hop is None else hop, max_filled)
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+
+# Plate set-ups, assigning a worm name and genotype to every well. A layout is a
+# dictionary {well: worm name} (lookups by well are O(1)) that also knows the
+# genotype of every well and the order of the wells on the plate. Worm names and
+# genotypes of many wells (e.g. a whole results table) are assigned at once by
+# the position of the well within the plate (see labels/assign), so plates with
+# more wells don't add string work per row.
+#
+# Layouts are registered by name in plate_layouts. Further layouts are loaded
+# from plate maps in CSV format (columns Well, Worm and optionally Genotype) or
+# JSON format, either naming every well or numbering groups in plate order:
+#
+#   {"name": "screen96", "wells": {"A1": "WT01", "A2": {"worm": "X1", "genotype": "unc-13"}}}
+#   {"name": "half96", "format": 96, "groups": [["WT", 48], ["MUT", 48]]}
+#
+# Without a genotype, it is the worm name without number (e.g. 'WT' for 'WT01').
+
+import os, re, json
+import numpy as np
+import pandas as pd
+
+# well names: one or two row letters and the column number (e.g. 'A1', 'H12')
+well_name = re.compile(r'^([A-Za-z]{1,2})(\d{1,2})$')
+
+# rows x columns of the supported plate formats by number of wells
+plate_formats = {6: (2, 3), 12: (3, 4), 24: (4, 6), 25: (5, 5), 48: (6, 8), 96: (8, 12)}
+
+# function to get the names of the wells of a plate with the given number of rows and
+# columns in plate order (A1, A2, ..., B1, ...)
+def grid_wells(rows = 5, columns = 5):
+    letters = [chr(ord('A') + r) for r in range(rows)]
+    return [r + str(c) for r in letters for c in range(1, columns+1)]
+
+# function to get the genotype from a worm name (name without number)
+def worm_genotype(worm):
+    return re.sub(r'\d+$', '', worm)
+
+class PlateLayout(dict):
+    def __init__(self, worms, genotypes = None, name = '', wells = None):
+        super().__init__(worms)
+        self.name = name
+        self.wells = list(worms) if wells is None else list(wells)
+        if genotypes is None:
+            genotypes = {w: worm_genotype(worms[w]) for w in worms}
+        self.genotypes = dict(genotypes)
+        # worm names and genotypes in plate order, '' for wells that are not part of the layout
+        self.worm_array = np.array([self.get(w, '') for w in self.wells] + [''], dtype = object)
+        self.genotype_array = np.array([self.genotypes.get(w, '') for w in self.wells] + [''], dtype = object)
+
+    # function to get the genotype of a well ('' if the well is not part of the layout)
+    def genotype(self, well):
+        return self.genotypes.get(well, '')
+
+    # function to get the position of every given well within the plate (-1 if unknown)
+    def positions(self, wells):
+        return pd.Categorical(np.asarray(wells, dtype = object), categories = self.wells).codes
+
+    # function to get the worm names (column 'Worm') or genotypes (column 'Genotype') of
+    # many wells at once as array
+    def labels(self, wells, column = 'Worm'):
+        names = self.worm_array if column == 'Worm' else self.genotype_array
+        return names[self.positions(wells)]
+
+    # function to add the columns 'Worm' and 'Genotype' to a table with a column of wells
+    def assign(self, table, column = 'Well'):
+        codes = self.positions(table[column])
+        table['Worm'] = self.worm_array[codes]
+        table['Genotype'] = self.genotype_array[codes]
+        return table
+
+    # function to get the wells of every genotype in plate order {genotype: [wells]}
+    def groups(self):
+        groups = {}
+        for w in self.wells:
+            if w in self.genotypes:
+                groups.setdefault(self.genotypes[w], []).append(w)
+        return groups
+
+# function to use a plain dictionary {well: worm name} as layout
+def as_layout(worms):
+    if isinstance(worms, PlateLayout):
+        return worms
+    return PlateLayout(worms)
+
+# function to create a layout from groups [(genotype, number of wells), ...] filling the
+# wells in plate order, worms are numbered within their group with the given digits
+def numbered_layout(groups, wells, name = '', digits = 2):
+    worms = {}
+    genotypes = {}
+    position = 0
+    for genotype, n in groups:
+        for i, w in enumerate(wells[position:position + n]):
+            worms[w] = genotype + str(i + 1).zfill(digits)
+            genotypes[w] = genotype
+        position += n
+    if position > len(wells):
+        raise ValueError('The groups of layout "' + name + '" need ' + str(position) + ' wells, the plate has '
+                         + str(len(wells)))
+    return PlateLayout(worms, genotypes, name, wells)
+
+# function to get the wells of a plate format given by its number of wells
+def format_wells(n):
+    if n not in plate_formats:
+        raise ValueError('Unknown plate format ' + str(n) + ' (known: ' + ', '.join(str(f) for f in plate_formats)
+                         + ')')
+    return grid_wells(*plate_formats[n])
+
+# function to check the well names of a plate map
+def check_wells(wells, path):
+    bad = [w for w in wells if well_name.match(str(w)) is None]
+    if bad:
+        raise ValueError('Invalid well names in ' + path + ': ' + ', '.join(str(w) for w in bad))
+
+# function to load a plate map in CSV or JSON format (see above), the name defaults to the
+# file name without extension
+def load_layout(path, name = None):
+    ext = os.path.splitext(path)[1].lower()
+    if name is None:
+        name = os.path.splitext(os.path.basename(path))[0]
+    if ext == '.csv':
+        table = pd.read_csv(path, dtype = str)
+        if 'Well' not in table.columns or 'Worm' not in table.columns:
+            raise ValueError('The plate map ' + path + ' needs the columns Well and Worm.')
+        check_wells(table.Well, path)
+        genotypes = None
+        if 'Genotype' in table.columns:
+            genotypes = dict(zip(table.Well, table.Genotype.fillna('')))
+        return PlateLayout(dict(zip(table.Well, table.Worm)), genotypes, name)
+    if ext == '.json':
+        with open(path) as f:
+            plate_map = json.load(f)
+        name = plate_map.get('name', name)
+        if 'groups' in plate_map:
+            return numbered_layout(plate_map['groups'], format_wells(int(plate_map.get('format', 25))), name,
+                                   plate_map.get('digits', 2))
+        wells = plate_map['wells']
+        check_wells(wells, path)
+        worms = {}
+        genotypes = {}
+        for w, entry in wells.items():
+            if isinstance(entry, dict):
+                worms[w] = entry['worm']
+                genotypes[w] = entry.get('genotype', worm_genotype(entry['worm']))
+            else:
+                worms[w] = entry
+                genotypes[w] = worm_genotype(entry)
+        return PlateLayout(worms, genotypes, name)
+    raise ValueError('Unknown plate map format "' + ext + '" (use .csv or .json)')
+
+# define plate set-up
+Common = numbered_layout([('WT', 12), ('MUT', 13)], grid_wells(5, 5), 'common')
+
+Switched = numbered_layout([('MUT', 13), ('WT', 12)], grid_wells(5, 5), 'switched')
+
+# plate set-ups by name
+plate_layouts = {'common': Common, 'switched': Switched}
+
+# function to add a layout to the registry under its name
+def register_layout(layout, name = None):
+    plate_layouts[name or layout.name] = layout
+    return layout
+
+# function to get a registered layout by name or load (and register) a plate map file
+def get_layout(name):
+    if name in plate_layouts:
+        return plate_layouts[name]
+    if os.path.isfile(str(name)):
+        return register_layout(load_layout(name), name)
+    raise ValueError('Unknown plate set-up "' + str(name) + '" (known: ' + ', '.join(plate_layouts)
+                   + ', or the path of a plate map)')
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+# Plotting of undulation ratios and AUC-values.
+
+import os
+import datetime as dt
+import numpy as np
+import matplotlib.pyplot as plt
+import seaborn as sns
+
+from undulation.instrument import timed
+
+# define plot settings
+colors = ['deep sea blue', 'dark hot pink', 'british racing green', 'blood', 
+          'cement','pastel purple','vomit green','golden yellow', 'aqua marine', 'coral']
+pal = sns.xkcd_palette(colors)
+sns.set(context = 'paper', font_scale = 3)
+
+# function to plot the undulation ratios of all groups and, if plus_auc is True, the
+# AUC-values, returns both plots (the second one is None without AUC)
+@timed('plotting')
+def plot_undulation(plot_data, area_data, label_x, start_x, fig_title, plus_auc = True):
+    label_y ='Undulation Ratio'
+    t_start = int(min(plot_data['Time']))
+    t_end = int(max(plot_data['Time']))
+    total_time = int(t_end/60)
+    plot = sns.FacetGrid(plot_data, height = 10, aspect = 1.5, palette = pal, hue = 'Group')
+    plot.map(plt.errorbar, 'Time', 'Mean', 'SEM', fmt = 'o')
+    plot.set(ylim=(0,1),xlim=(0,max(plot_data['Time'])+5), xlabel = label_x, 
+             ylabel= label_y, xticks = np.arange(t_start,t_end, t_end/(total_time)),
+             xticklabels = np.arange(start_x,start_x+total_time,1), title = fig_title)
+    plot.add_legend(title = '')
+
+    plot2 = None
+    if plus_auc:
+        plot2 = sns.catplot(x = 'Group', y ='AUC', hue = 'Group', data = area_data, 
+                           palette = pal, height = 10, aspect = 0.8, kind = 'box', dodge = False)
+        plot2.add_legend(title = '', loc = 'lower center', ncol = 2)
+        plot2 = sns.swarmplot(x ='Group', y = 'AUC', data = area_data,size = 10)
+        plot2.set(xlabel= '', title = fig_title , xticklabels = '')
+    return plot, plot2
+
+# function to save the plots created by plot_undulation() as date_title.png and
+# date_title_AUC.png, returns the list of written files
+@timed('saving plots', lambda written, *args, **kwargs: len(written))
+def save_plots(plot, plot2, path, fig_title):
+    date = dt.datetime.now()
+    date = date.strftime('%Y%m%d')
+    output_name = date + '_' + fig_title + '.png'
+    output = os.path.join(path, output_name)
+    plot.savefig(output)
+    written = [output]
+    if plot2 is not None:
+        output_name2 = date + '_' + fig_title + '_AUC.png'
+        output2 = os.path.join(path, output_name2)
+        plot2.get_figure().savefig(output2)
+        written.append(output2)
+    return written
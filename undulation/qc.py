@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+
+# Quality control of the extracted tracking data. Besides check_track, the QC
+# tables report coverage, number of gaps and longest gap for every well, video
+# and body point (and optionally the coverage of time windows), computed on
+# boolean (wells x points x frames) masks of tracked frames for the whole plate
+# at once. Exclusions are then decided by configurable thresholds.
+
+import numpy as np
+import pandas as pd
+
+from undulation.io import split_key, key_well
+from undulation.instrument import timed, data_wells
+
+# function to check if coverage is >90%, creates list of wells where tracking is 
+# <90% and suggests them for exclusion from analysis
+@timed('coverage check', data_wells)
+def check_track(data, frames):
+    ex_well = []
+    
+    for c in data:
+       for e in data[c]:
+           if key_well(e) in ex_well:
+               continue
+           else:
+                nums = list(data[c][e].x.count()<(frames*0.9))
+   
+           if any(nums):
+               ex_well.append(key_well(e))
+        
+    print('The following wells do not show complete tracking, thus are suggested to be excluded from analysis'
+          , ex_well, sep = '\n')
+    return ex_well
+
+# function to actually remove the badly tracked datasets from the analysis
+def remove_data(data, exclude):
+        for c in data:
+            remove = []
+            
+            for e in data[c]:
+                if key_well(e) in exclude:
+                    remove.append(e)
+                    
+            for rem in remove:
+                del data[c][rem]
+        return None
+
+# function to get the mask of tracked frames from x coordinates of shape (... x points x n),
+# cut or padded (as not tracked) to the expected number of frames
+def tracked_mask(x, frames):
+    tracked = np.zeros(np.shape(x)[:-1] + (frames,), dtype = bool)
+    n = min(frames, np.shape(x)[-1])
+    tracked[..., :n] = ~np.isnan(x[..., :n])
+    return tracked
+
+# function to get the number of tracked frames, the number of gaps and the longest gap (in
+# frames) along the last axis of a tracked-frame mask, for all wells and body points at once
+def gap_stats(tracked):
+    shape = tracked.shape[:-1]
+    rows = tracked.reshape(-1, tracked.shape[-1])
+    
+    # +1 where a gap starts, -1 after it ends
+    edges = np.diff(np.pad(~rows, ((0, 0), (1, 1))).astype(np.int8), axis = 1)
+    row, start = np.nonzero(edges == 1)
+    stop = np.nonzero(edges == -1)[1]
+    gaps = np.bincount(row, minlength = len(rows))
+    longest = np.zeros(len(rows), dtype = np.int64)
+    np.maximum.at(longest, row, stop - start)
+    return rows.sum(axis = 1).reshape(shape), gaps.reshape(shape), longest.reshape(shape)
+
+# function to get the fraction of tracked frames within windows of 'window' frames
+def window_coverage(tracked, window):
+    starts = np.arange(0, tracked.shape[-1], window)
+    sizes = np.diff(np.append(starts, tracked.shape[-1]))
+    return np.add.reduceat(tracked, starts, axis = -1)/sizes
+
+# function to get the tracked-frame masks of extracted data {condition: {key: df}} as one
+# (wells x points x frames) array, returns the (condition, key) labels, the body points
+# (default: those of the first table) and the masks. Missing body points count as not tracked
+def data_tracked(data, frames, points = None):
+    labels = [(c, e) for c in data for e in data[c]]
+    if points is None:
+        points = data[labels[0][0]][labels[0][1]].x.columns.to_list() if labels else []
+    tracked = np.zeros((len(labels), len(points), frames), dtype = bool)
+    for i, (c, e) in enumerate(labels):
+        x = data[c][e].x.reindex(columns = points).to_numpy(dtype = float).T
+        tracked[i] = tracked_mask(x, frames)
+    return labels, points, tracked
+
+# function to create the QC tables from the gap statistics of all wells (wells x points arrays,
+# see gap_stats) with one row per condition, video, well and body point. If the coverage of
+# windows (wells x points x windows) is given, a second table holds one row per window
+def qc_tables(labels, points, frames, count, gaps, longest, windows = None, window = None):
+    n = len(labels)
+    p = len(points)
+    table = pd.DataFrame({
+        'Condition': np.repeat([c for c, e in labels], p),
+        'Video': np.repeat([split_key(e)[0] for c, e in labels], p),
+        'Well': np.repeat([split_key(e)[1] for c, e in labels], p),
+        'Point': np.tile(points, n),
+        'Frames': frames,
+        'Tracked_Frames': np.ravel(count),
+        'Coverage': np.ravel(count)/frames,
+        'Gaps': np.ravel(gaps),
+        'Longest_Gap': np.ravel(longest)})
+    if windows is None:
+        return table, None
+    
+    w = np.shape(windows)[-1]
+    window_table = pd.DataFrame({
+        'Condition': np.repeat(table.Condition.to_numpy(), w),
+        'Video': np.repeat(table.Video.to_numpy(), w),
+        'Well': np.repeat(table.Well.to_numpy(), w),
+        'Point': np.repeat(table.Point.to_numpy(), w),
+        'Window_Start': np.tile(np.arange(w)*window, n*p),
+        'Coverage': np.ravel(windows)})
+    return table, window_table
+
+# function to create the QC tables of the whole plate from a (wells x points x frames)
+# tracked-frame mask in one pass, windows are given in frames (None = no window table)
+def plate_qc(labels, points, tracked, window = None):
+    count, gaps, longest = gap_stats(tracked)
+    windows = window_coverage(tracked, window) if window else None
+    return qc_tables(labels, points, tracked.shape[-1], count, gaps, longest, windows, window)
+
+# function to create the QC tables from the gap statistics of single wells (as returned by
+# file_qc in undulation/pipeline.py), body points are aligned to those of the first well
+def stats_tables(labels, stats, frames, window = None):
+    points = stats[0]['points'] if stats else []
+    fields = {'tracked': 0, 'gaps': 0, 'longest_gap': 0}
+    arrays = {f: np.zeros((len(stats), len(points)), dtype = np.int64) for f in fields}
+    n_windows = len(range(0, frames, window)) if window else 0
+    windows = np.zeros((len(stats), len(points), n_windows))
+    for i, s in enumerate(stats):
+        for j, p in enumerate(points):
+            if p not in s['points']:
+                continue
+            k = s['points'].index(p)
+            for f in fields:
+                arrays[f][i, j] = s[f][k]
+            if window:
+                windows[i, j] = s['windows'][k]
+    return qc_tables(labels, points, frames, arrays['tracked'], arrays['gaps'], arrays['longest_gap'],
+                     windows if window else None, window)
+
+# function to mark the rows of the QC table that pass the thresholds ('Pass' column) and get
+# the wells suggested for exclusion. A body point fails if less than min_coverage of the
+# frames are tracked (same as check_track), its longest gap exceeds max_gap frames or, with
+# a window table, the coverage of any window is below min_window_coverage
+def qc_exclusions(table, window_table = None, min_coverage = 0.9, max_gap = None, min_window_coverage = None):
+    fail = table.Tracked_Frames < table.Frames*min_coverage
+    if max_gap is not None:
+        fail |= table.Longest_Gap > max_gap
+    if window_table is not None and min_window_coverage is not None:
+        low = window_table[window_table.Coverage < min_window_coverage]
+        bad = pd.MultiIndex.from_frame(low[['Condition', 'Video', 'Well', 'Point']])
+        fail |= pd.MultiIndex.from_frame(table[['Condition', 'Video', 'Well', 'Point']]).isin(bad)
+    table['Pass'] = ~fail.to_numpy()
+    
+    ex_well = list(dict.fromkeys(table.Well[~table.Pass]))
+    print('The following wells do not show complete tracking, thus are suggested to be excluded from analysis'
+          , ex_well, sep = '\n')
+    return ex_well
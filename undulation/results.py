@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+
+# Consolidated store of analysis results in one SQLite database. Every run is
+# appended with its parameters (runs are never overwritten, so same-day runs and
+# reruns are kept side by side) and its tables:
+#
+#   rates  binned undulation rate of every worm and time bin (see binning())
+#   auc    area under the curve of every worm (see group_summary())
+#   qc     tracking coverage and gaps of every body point (see undulation/qc.py)
+#
+# All rows are keyed by Run, Experiment, Condition, Video, Well and Worm. The key
+# columns are indexed, so queries only read the matching rows instead of scanning
+# every result ever stored:
+#
+#   query('D:/results.sqlite', 'auc', experiment = ['exp1', 'exp2'], latest = True)
+#   query('D:/results.sqlite', 'rates', condition = 'WT', well = 'A1')
+#
+# Queries return tidy DataFrames with the column names of the CSV exports. Several
+# processes (e.g. jobs of undulation/scheduler.py) may append to the same database,
+# a run is written within one transaction.
+
+import json, sqlite3
+import datetime as dt
+import pandas as pd
+
+from undulation.io import split_key
+from undulation.plates import Common, as_layout
+
+key_columns = ['Experiment', 'Condition', 'Video', 'Well', 'Worm']
+
+# columns and SQL types of the result tables (besides Run and the key columns)
+tables = {'rates': [('Genotype', 'TEXT'), ('Time', 'REAL'), ('Undulation_Rate', 'REAL')],
+          'auc': [('Genotype', 'TEXT'), ('AUC', 'REAL')],
+          'qc': [('Point', 'TEXT'), ('Frames', 'INTEGER'), ('Tracked_Frames', 'INTEGER'), ('Coverage', 'REAL'),
+                 ('Gaps', 'INTEGER'), ('Longest_Gap', 'INTEGER'), ('Pass', 'INTEGER')]}
+
+# filters of query() by keyword
+filters = {'experiment': 'Experiment', 'condition': 'Condition', 'video': 'Video', 'well': 'Well',
+           'worm': 'Worm', 'genotype': 'Genotype', 'run': 'Run'}
+
+# function to get the names of all columns of a result table
+def table_columns(table):
+    return ['Run'] + key_columns + [name for name, kind in tables[table]]
+
+# function to open a results database, the tables and indexes are created if missing
+def connect(path):
+    con = sqlite3.connect(path, timeout = 60)
+    with con:
+        con.execute('CREATE TABLE IF NOT EXISTS runs (Run INTEGER PRIMARY KEY AUTOINCREMENT, Created TEXT, '
+                    'Experiment TEXT, Parameters TEXT)')
+        con.execute('CREATE INDEX IF NOT EXISTS runs_experiment ON runs (Experiment)')
+        for table, columns in tables.items():
+            fields = ['Run INTEGER REFERENCES runs (Run)'] + [c + ' TEXT' for c in key_columns]
+            fields += [name + ' ' + kind for name, kind in columns]
+            con.execute('CREATE TABLE IF NOT EXISTS ' + table + ' (' + ', '.join(fields) + ')')
+            con.execute('CREATE INDEX IF NOT EXISTS ' + table + '_key ON ' + table + ' (' + ', '.join(key_columns)
+                        + ', Run)')
+            for column in ('Well', 'Worm', 'Run'):
+                con.execute('CREATE INDEX IF NOT EXISTS ' + table + '_' + column.lower() + ' ON ' + table
+                            + ' (' + column + ')')
+    return con
+
+# function to get the video each worm of the binned rates comes from, binning() uses the
+# last video of every well of a condition. Returns {(condition, well): video}
+def worm_videos(freq_list):
+    videos = {}
+    for c in freq_list:
+        for e in freq_list[c]:
+            video, well = split_key(e)
+            videos[(c, well)] = video
+    return videos
+
+# function to create the result tables of a run from the binned rates (see binning()), the
+# AUC table (see group_summary()) and optionally the QC table (see plate_qc in
+# undulation/qc.py), conditions are renamed by cond_names {'cond1': name, ...}.
+# Returns {table: DataFrame} with the columns of the result tables (without Run)
+def result_tables(experiment, means, areas, freq_list, cond_names, qc = None, layout = Common):
+    videos = worm_videos(freq_list)
+    rates = means[means.Condition.isin(list(cond_names))].copy()
+    rates['Video'] = [videos.get(cw, '') for cw in zip(rates.Condition, rates.Well)]
+    rates['Condition'] = rates.Condition.map(cond_names)
+    rates['Experiment'] = experiment
+
+    worms = rates.drop_duplicates(['Condition', 'Worm'])[key_columns + ['Genotype']]
+    auc = areas.rename(columns = {'Group': 'Condition'}).merge(worms, on = ['Condition', 'Worm'], how = 'left')
+    auc['Experiment'] = experiment
+
+    result = {'rates': rates, 'auc': auc}
+    if qc is not None:
+        qc = qc.copy()
+        qc['Condition'] = [cond_names.get(c, c) for c in qc.Condition]
+        qc['Worm'] = as_layout(layout).labels(qc.Well)
+        qc['Experiment'] = experiment
+        if 'Pass' not in qc.columns:
+            qc['Pass'] = None
+        result['qc'] = qc
+    return {t: result[t][table_columns(t)[1:]].reset_index(drop = True) for t in result}
+
+# function to append a run to the database, parameters are the settings of the run
+# (JSON-serialisable), results the tables created by result_tables. Returns the run number
+def append_run(path, experiment, parameters, results):
+    con = connect(path)
+    try:
+        with con:
+            cursor = con.execute('INSERT INTO runs (Created, Experiment, Parameters) VALUES (?, ?, ?)',
+                                 (dt.datetime.now().isoformat(timespec = 'seconds'), experiment,
+                                  json.dumps(parameters, sort_keys = True, default = str)))
+            run = cursor.lastrowid
+            for table, df in results.items():
+                df = df.assign(Run = run)[table_columns(table)]
+                con.executemany('INSERT INTO ' + table + ' VALUES (' + ', '.join('?'*len(df.columns)) + ')',
+                                df.astype(object).where(df.notna(), None).itertuples(index = False, name = None))
+        return run
+    finally:
+        con.close()
+
+# function to get the runs of the database (optionally of some experiments), the
+# parameters are returned as dictionaries
+def runs(path, experiment = None):
+    sql, params = where({'Experiment': experiment})
+    con = connect(path)
+    try:
+        table = pd.read_sql_query('SELECT * FROM runs' + sql + ' ORDER BY Run', con, params = params)
+    finally:
+        con.close()
+    table['Parameters'] = table.Parameters.map(json.loads)
+    return table
+
+# function to create the WHERE clause of a query from {column: value or list of values},
+# None values are not filtered. Returns the clause and its parameters
+def where(conditions, prefix = ''):
+    clauses = []
+    params = []
+    for column, value in conditions.items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            value = list(value)
+            clauses.append(prefix + column + ' IN (' + ', '.join('?'*len(value)) + ')')
+            params += value
+        else:
+            clauses.append(prefix + column + ' = ?')
+            params.append(value)
+    return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+# function to query a result table ('rates', 'auc' or 'qc'), filters are given by keyword
+# (experiment, condition, video, well, worm, genotype, run), each a value or a list of
+# values. With latest = True only the latest run of every experiment and condition is
+# returned. Returns a DataFrame with the columns of the table (or the given columns)
+def query(path, table = 'auc', latest = False, columns = None, **kwargs):
+    if table not in tables:
+        raise ValueError('Unknown result table "' + str(table) + '" (use ' + ', '.join(tables) + ')')
+    unknown = [k for k in kwargs if k not in filters or (k == 'genotype' and table == 'qc')]
+    if unknown:
+        raise ValueError('Unknown filters for table ' + table + ': ' + ', '.join(unknown))
+    columns = columns or table_columns(table)
+    bad = [c for c in columns if c not in table_columns(table)]
+    if bad:
+        raise ValueError('Unknown columns of table ' + table + ': ' + ', '.join(bad))
+
+    sql, params = where({filters[k]: v for k, v in kwargs.items()}, 't.')
+    if latest:
+        sql += (' WHERE ' if not sql else ' AND ') + ('t.Run = (SELECT MAX(l.Run) FROM ' + table + ' AS l WHERE '
+                                                     'l.Experiment = t.Experiment AND l.Condition = t.Condition)')
+    order = [c for c in ['Run'] + key_columns + ['Point', 'Time'] if c in table_columns(table)]
+    con = connect(path)
+    try:
+        result = pd.read_sql_query('SELECT ' + ', '.join('t.' + c for c in columns) + ' FROM ' + table + ' AS t'
+                                   + sql + ' ORDER BY ' + ', '.join('t.' + c for c in order), con, params = params)
+    finally:
+        con.close()
+    if 'Pass' in result.columns:
+        result['Pass'] = result.Pass.astype('boolean')
+    return result
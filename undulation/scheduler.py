@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+# Scheduler for the analysis of many experiments. Experiment folders as created
+# by renameDeepLearnV1.5.py (<experiment>/day|subday/<genotype>, the genotype
+# folders are named after the genotypes of the plate set-up, e.g. wt and mut) are
+# discovered below a root folder and every condition folder with tracking files
+# is queued as one job. Jobs run
+# with bounded concurrency, their status, timing and output files are recorded
+# in a manifest (JSON) after every change, so an interrupted batch resumes with
+# the jobs that did not finish instead of starting over:
+#
+#   python -m undulation.scheduler D:/experiments settings.json --output D:/results --jobs 4
+#
+# The settings file is a run file of undulation.batch without "conditions".
+# Exit status: 0 = all jobs done, 1 = at least one job failed, 2 = invalid settings
+
+import os, sys, json, copy, time, argparse, natsort
+import datetime as dt
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from undulation import batch
+from undulation.parallel import worker_count
+from undulation.io import tracking_files
+
+periods = ('day', 'subday')
+manifest_name = 'manifest.json'
+
+# function to find all condition folders <experiment>/day|subday/<genotype> with tracking
+# files below root, returns a list of jobs in natural sort order. Folders in skip (e.g. the output
+# folder) are not searched
+def discover(root, skip = ()):
+    skip = [os.path.abspath(folder) for folder in skip]
+    jobs = []
+    for folder, subfolders, files in os.walk(root, followlinks = True):
+        subfolders[:] = natsort.natsorted(d for d in subfolders if not d.startswith('.')
+                                          and os.path.abspath(os.path.join(folder, d)) not in skip)
+        parts = os.path.relpath(folder, root).split(os.sep)
+        if len(parts) < 3 or parts[-2] not in periods or len(tracking_files(folder)) == 0:
+            continue
+        jobs.append({'id': '/'.join(parts), 'experiment': '/'.join(parts[:-2]),
+                     'period': parts[-2], 'genotype': parts[-1], 'path': folder})
+    return jobs
+
+# function to read the manifest of an output folder, an empty manifest is returned
+# if there is none yet
+def read_manifest(out_root):
+    path = os.path.join(out_root, manifest_name)
+    if not os.path.exists(path):
+        return {'jobs': {}}
+    with open(path) as f:
+        return json.load(f)
+
+# function to write the manifest, a temporary file is replaced so that the
+# manifest is never left half-written
+def write_manifest(out_root, manifest):
+    os.makedirs(out_root, exist_ok = True)
+    path = os.path.join(out_root, manifest_name)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent = 1)
+    os.replace(path + '.tmp', path)
+
+# function to update the manifest entry of a job and save the manifest
+def set_status(out_root, manifest, job_id, **entry):
+    manifest['jobs'].setdefault(job_id, {}).update(entry)
+    write_manifest(out_root, manifest)
+
+# function to run the analysis of one condition folder, returns the written files
+def run_job(job, settings, out_root):
+    config = copy.deepcopy(settings)
+    config['conditions'] = {job['genotype']: job['path']}
+    config.setdefault('output', {})['dir'] = os.path.join(out_root, *job['id'].split('/'))
+    # all jobs are appended to the same results database under <experiment>/<period>
+    if config.get('results', {}).get('db') is not None:
+        if not config['results'].get('experiment'):
+            config['results']['experiment'] = job['experiment'] + '/' + job['period']
+    return batch.run(batch.complete_config(config))
+
+# function to run a job and record its timing, errors are returned instead of raised so
+# that the manifest entry can be completed (this runs within the worker process)
+def timed_job(job, settings, out_root):
+    result = {'started': dt.datetime.now().isoformat(timespec = 'seconds'),
+              'status': 'done', 'outputs': [], 'error': None}
+    start = time.perf_counter()
+    try:
+        result['outputs'] = run_job(job, settings, out_root)
+    except Exception as err:
+        result['status'] = 'failed'
+        result['error'] = type(err).__name__ + ': ' + str(err)
+    result['finished'] = dt.datetime.now().isoformat(timespec = 'seconds')
+    result['seconds'] = round(time.perf_counter() - start, 1)
+    return result
+
+# function to select the jobs that still have to be run, jobs that are done are skipped,
+# as are failed jobs if retry_failed is False
+def pending_jobs(jobs, manifest, retry_failed = True):
+    pending = []
+    for job in jobs:
+        status = manifest['jobs'].get(job['id'], {}).get('status')
+        if status == 'done' or (status == 'failed' and not retry_failed):
+            continue
+        pending.append(job)
+    return pending
+
+# function to run all pending jobs below root, concurrency is the number of jobs running
+# at the same time, workers the number of processes used within every job.
+# Returns the manifest
+def schedule(root, settings, out_root, concurrency = 1, workers = 1, retry_failed = True):
+    settings = dict(settings, workers = workers)
+    jobs = discover(root, skip = [out_root])
+    manifest = read_manifest(out_root)
+    manifest['root'] = os.path.abspath(root)
+    for job in jobs:
+        if job['id'] not in manifest['jobs']:
+            manifest['jobs'][job['id']] = {'path': job['path'], 'status': 'pending'}
+    write_manifest(out_root, manifest)
+
+    todo = pending_jobs(jobs, manifest, retry_failed)
+    print(str(len(jobs)) + ' condition folders found, ' + str(len(todo)) + ' to analyse.')
+    concurrency = worker_count(concurrency, len(todo))
+    if concurrency == 1:
+        for job in todo:
+            set_status(out_root, manifest, job['id'], status = 'running')
+            finish_job(out_root, manifest, job, timed_job(job, settings, out_root))
+        return manifest
+
+    with ProcessPoolExecutor(max_workers = concurrency) as pool:
+        futures = {}
+        for job in todo:
+            set_status(out_root, manifest, job['id'], status = 'queued')
+            futures[pool.submit(timed_job, job, settings, out_root)] = job
+        for future in as_completed(futures):
+            finish_job(out_root, manifest, futures[future], future.result())
+    return manifest
+
+# function to record the result of a job in the manifest
+def finish_job(out_root, manifest, job, result):
+    set_status(out_root, manifest, job['id'], **result)
+    print(job['id'] + ': ' + result['status'] + ' (' + str(result['seconds']) + 's)')
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(prog = 'python -m undulation.scheduler',
+                                     description = 'Analyse all experiment folders below a root folder.')
+    parser.add_argument('root', help = 'folder containing the experiment folders')
+    parser.add_argument('settings', help = 'run file with the analysis settings (without conditions)')
+    parser.add_argument('--output', required = True, help = 'folder for the results and the manifest')
+    parser.add_argument('--jobs', type = int, default = 1, help = 'number of jobs running at the same time (0 = all cores)')
+    parser.add_argument('--workers', type = int, default = 1, help = 'number of worker processes per job')
+    parser.add_argument('--skip-failed', action = 'store_true', help = 'do not rerun jobs that failed before')
+    args = parser.parse_args(argv)
+
+    try:
+        settings = batch.read_run_file(args.settings)
+        if not isinstance(settings, dict):
+            raise batch.RunFileError('The settings file must contain a table of settings.')
+    except batch.RunFileError as err:
+        print('Error: ' + str(err), file = sys.stderr)
+        return batch.EXIT_CONFIG
+
+    manifest = schedule(args.root, settings, args.output, args.jobs or None,
+                        args.workers, not args.skip_failed)
+    failed = [j for j in manifest['jobs'] if manifest['jobs'][j]['status'] == 'failed']
+    if failed:
+        print('Failed jobs:', *failed, sep = '\n')
+        return batch.EXIT_FAILED
+    return batch.EXIT_OK
+
+if __name__ == '__main__':
+    sys.exit(main())
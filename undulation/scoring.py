@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+# Rasterization of manual scorings. Scoring files contain one row per scored
+# event with the columns 'Behaviour', 'Start_Frame' and 'Stop_Frame'. The events
+# are converted to a per-frame mask with a difference array (+1 at every start,
+# -1 after every stop, cumulative sum > 0), bin rates are then array reductions.
+
+import os, re, natsort
+import numpy as np
+import pandas as pd
+
+# regular expression to find the well number at the end of the name of a scoring file
+score_file_well = re.compile(r'(?<![A-Za-z])([A-Za-z]{1,2}\d{1,2})\.csv$')
+
+# function to read all scoring files (.csv) within a folder, the files are
+# identified by the well number at the end of the file name (e.g. "..._A1.csv", "..._H12.csv")
+def read_scorings(score_loc):
+    scoring = {}
+    for score_file in natsort.natsorted(os.listdir(score_loc)):
+        if score_file.endswith('.csv'):
+            mo = score_file_well.search(score_file)
+            well = mo.group(1) if mo is not None else score_file[-6:-4]
+            scoring[well] = pd.read_csv(os.path.join(score_loc, score_file))
+    return scoring
+
+# function to create a boolean per-frame mask from start and stop frames,
+# a frame f is marked if start <= f <= stop for any event
+def interval_mask(start, stop, frames):
+    start = np.ceil(np.asarray(start, dtype = float))
+    stop = np.floor(np.asarray(stop, dtype = float)) + 1
+    keep = (start < stop) & (start < frames) & (stop > 0)
+    
+    diff = np.zeros(frames + 1, dtype = np.int64)
+    np.add.at(diff, np.clip(start[keep], 0, frames).astype(np.int64), 1)
+    np.add.at(diff, np.clip(stop[keep], 0, frames).astype(np.int64), -1)
+    return np.cumsum(diff[:frames]) > 0
+
+# function to create the per-frame mask of one behaviour from a scoring table
+def scoring_mask(df, frames, behaviour = 'Undulation'):
+    events = df[df['Behaviour'] == behaviour]
+    return interval_mask(events.Start_Frame, events.Stop_Frame, frames)
+
+# function to calculate the fraction of marked frames for bins of 'bins' frames starting
+# at first_frame, bins are labelled by their end in minutes (900 frames per minute).
+# Frames beyond the mask count as not marked, thus a partial last bin is still divided by bins
+def binned_rates(mask, bins, first_frame = 0):
+    marked = mask[first_frame:]
+    n_bins = len(range(first_frame, len(mask), bins))
+    padded = np.zeros(n_bins*bins, dtype = bool)
+    padded[:len(marked)] = marked
+    
+    rates = padded.reshape(n_bins, bins).sum(axis = 1)/bins
+    time = (np.arange(first_frame, len(mask), bins) + bins)/900
+    return pd.DataFrame(dict(Time = time, Undulation_Rate = rates))
+
+# function to calculate binned undulation rates for all scorings {well: scoring table}
+def scoring_rates(scoring, frames, bins, first_frame = 0, behaviour = 'Undulation'):
+    rates = {}
+    for e in scoring:
+        rates[e] = binned_rates(scoring_mask(scoring[e], frames, behaviour), bins, first_frame)
+    return rates
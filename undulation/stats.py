@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+
+# Statistical testing of AUC-values.
+#
+# Besides the single tests chosen by normality, all pairs of groups can be compared
+# at once by resampling (see resampling_tests): bootstrap confidence intervals of the
+# difference of the mean AUC and two-sided permutation tests of the same difference,
+# followed by Holm and Benjamini-Hochberg (FDR) correction. Resamples are index
+# matrices (resamples x worms), groups (bootstrap) and pairs (permutations) of the
+# same size are resampled together with NumPy indexing. Resamples are drawn in chunks,
+# optionally by several worker processes, every chunk has its own random seed derived
+# from the seed of the run, so results don't depend on the number of workers. Groups
+# are treated as independent samples (different worms).
+#
+# scipy.stats is only imported by the classic tests, so that importing this module
+# (e.g. by worker processes) stays fast.
+
+import itertools
+import numpy as np
+import pandas as pd
+
+from undulation.parallel import iter_jobs
+
+# function to check AUC-values for normality for each group
+def check_normal(AUC_data):
+    from scipy.stats import shapiro
+
+    normality = {}
+    AUC_dict = {}
+    grouped_AUC = AUC_data.groupby('Group')
+    for x in list(AUC_data['Group'].unique()):
+        cond = x
+        AUC_dict[cond] = grouped_AUC.get_group(x)['AUC']
+    for s in AUC_dict:
+        if shapiro(AUC_dict[s])[1] > 0.05:
+            normality[s] = 'Yes'
+        else:
+            normality[s] = 'No'
+    return normality
+
+# function to compare two conditions using the appropriate statistical test, returns the
+# name of the test, the test statistic and the p-value
+def compare(AUC_data, c1, c2, normal, ind):
+    from scipy.stats import ttest_ind, mannwhitneyu, ttest_rel, wilcoxon
+
+    grouped_AUC = AUC_data.groupby('Group')
+    
+    c1_data = grouped_AUC.get_group(c1)['AUC']
+    c2_data = grouped_AUC.get_group(c2)['AUC']
+    
+    if normal[c1] == 'Yes' and normal[c2] == 'Yes':
+        parametric = True
+    else:
+        parametric = False
+    
+    if parametric and ind == 'y':
+        s, p = ttest_ind(c1_data, c2_data)
+        test = 't-test'
+    elif not parametric and ind == 'y':
+        s, p = mannwhitneyu(c1_data, c2_data)
+        test = 'Mann-Whitney'
+    elif parametric and ind != 'y':
+        s, p = ttest_rel(c1_data, c2_data)
+        test = 't-test'
+    else:
+        s, p = wilcoxon(c1_data, c2_data)
+        test = 'Wilcoxon'
+    
+    return test, s, p
+
+# function to compare specified conitions using the appropriate statistical test
+def stat_test(AUC_data, conds, normal, ind):
+    c1 = conds[0]
+    c2 = conds[1]
+    test, s, p = compare(AUC_data, c1, c2, normal, ind)
+    
+    if p < 0.05:
+        result = str(c1) + ' vs ' + str(c2) + ' is significantly different. ('+ test + ': p-value = ' + str(p) + ')'
+    else:
+        result = str(c1) + ' vs ' + str(c2) + ' is NOT significantly different. ('+ test + ': p-value = ' + str(p) + ')'
+    
+    return result
+
+# function to get the AUC-values of every group {group: array} in order of appearance
+def group_values(AUC_data):
+    return {g: d['AUC'].to_numpy(dtype = float) for g, d in AUC_data.groupby('Group', sort = False)}
+
+# function to split a number of resamples into chunks, returns a list of (chunk size, seed)
+def resample_chunks(n, chunk, seed):
+    sizes = [min(chunk, n - i) for i in range(0, n, chunk)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    return list(zip(sizes, seeds))
+
+# function to draw bootstrap means of groups of the same size, values is a (groups x worms)
+# array. Returns a (groups x n) array
+def bootstrap_chunk(values, n, seed):
+    rng = np.random.default_rng(seed)
+    index = rng.integers(0, values.shape[1], (values.shape[0], n, values.shape[1]))
+    return np.take_along_axis(values[:, np.newaxis, :], index, axis = 2).mean(axis = 2)
+
+# function to count the permutations of pairs of the same sizes with an absolute difference
+# of means at least as large as observed. pooled is a (pairs x worms) array with the n1
+# values of the first group first. Returns the counts per pair
+def permutation_chunk(pooled, n1, n, seed):
+    rng = np.random.default_rng(seed)
+    total = pooled.shape[1]
+    n2 = total - n1
+    observed = np.abs(pooled[:, :n1].mean(axis = 1) - pooled[:, n1:].mean(axis = 1))
+    # the first n1 positions of every permutation form the first group
+    perm = rng.permuted(np.tile(np.arange(total), (n, 1)), axis = 1)[:, :n1]
+    sum1 = pooled[:, perm].sum(axis = 2)
+    sums = pooled.sum(axis = 1)[:, np.newaxis]
+    diff = np.abs(sum1/n1 - (sums - sum1)/n2)
+    # small tolerance, so that permutations equal to the observed split are counted
+    return (diff >= observed[:, np.newaxis] - 1e-12).sum(axis = 1)
+
+# function to run func(*args, n, seed) for every chunk of resamples, returns the results in chunk order
+def run_chunks(func, args, n, chunk, seed, workers = 1):
+    jobs = [tuple(args) + (size, s) for size, s in resample_chunks(n, chunk, seed)]
+    return list(iter_jobs(func, jobs, workers))
+
+# function to apply the Holm correction to an array of p-values
+def holm(p):
+    p = np.asarray(p, dtype = float)
+    order = np.argsort(p)
+    adjusted = np.maximum.accumulate(p[order]*(len(p) - np.arange(len(p))))
+    out = np.empty_like(p)
+    out[order] = np.minimum(adjusted, 1)
+    return out
+
+# function to apply the Benjamini-Hochberg correction (false discovery rate) to an array of p-values
+def fdr_bh(p):
+    p = np.asarray(p, dtype = float)
+    order = np.argsort(p)[::-1]
+    ranks = len(p) - np.arange(len(p))
+    adjusted = np.minimum.accumulate(p[order]*len(p)/ranks)
+    out = np.empty_like(p)
+    out[order] = np.minimum(adjusted, 1)
+    return out
+
+corrections = {'holm': holm, 'fdr': fdr_bh}
+
+# function to compare all pairs of groups of the AUC table (see group_summary in
+# undulation/binning.py) by bootstrap confidence intervals and permutation tests of the
+# difference of mean AUC (Group1 - Group2). pairs defaults to all pairs of groups, the
+# p-values are corrected by Holm and FDR, 'Significant' follows the given correction.
+# Returns a table with one row per pair
+def resampling_tests(AUC_data, pairs = None, n_boot = 10000, n_perm = 10000, confidence = 0.95,
+                     correction = 'holm', alpha = 0.05, seed = 0, workers = 1, chunk = 1000):
+    if correction not in corrections:
+        raise ValueError('Unknown correction "' + str(correction) + '", use one of: ' + ', '.join(corrections))
+    values = group_values(AUC_data)
+    groups = list(values)
+    if pairs is None:
+        pairs = list(itertools.combinations(groups, 2))
+    pairs = [tuple(pair) for pair in pairs]
+    missing = sorted({g for pair in pairs for g in pair if g not in values})
+    if missing:
+        raise ValueError('Unknown groups: ' + ', '.join(map(str, missing)))
+
+    # bootstrap means of all groups, groups of the same size are resampled together
+    boot = {}
+    sizes = {}
+    for g in groups:
+        sizes.setdefault(len(values[g]), []).append(g)
+    for k, (n, same) in enumerate(sorted(sizes.items())):
+        block = np.stack([values[g] for g in same])
+        means = np.concatenate(run_chunks(bootstrap_chunk, (block,), n_boot, chunk, [seed, 0, k], workers),
+                               axis = 1)
+        boot.update(zip(same, means))
+    diffs = np.stack([boot[g1] - boot[g2] for g1, g2 in pairs]) if pairs else np.zeros((0, n_boot))
+    tail = (1 - confidence)/2*100
+    low, high = np.percentile(diffs, [tail, 100 - tail], axis = 1) if pairs else ([], [])
+
+    # permutation tests, pairs of the same sizes are permuted together
+    counts = np.zeros(len(pairs), dtype = np.int64)
+    shapes = {}
+    for i, (g1, g2) in enumerate(pairs):
+        shapes.setdefault((len(values[g1]), len(values[g2])), []).append(i)
+    for k, ((n1, n2), same) in enumerate(sorted(shapes.items())):
+        pooled = np.stack([np.concatenate([values[pairs[i][0]], values[pairs[i][1]]]) for i in same])
+        counts[same] = np.sum(run_chunks(permutation_chunk, (pooled, n1), n_perm, chunk,
+                                         [seed, 1, k], workers), axis = 0)
+    p = (counts + 1)/(n_perm + 1)
+
+    table = pd.DataFrame({
+        'Group1': [g1 for g1, g2 in pairs],
+        'Group2': [g2 for g1, g2 in pairs],
+        'N1': [len(values[g1]) for g1, g2 in pairs],
+        'N2': [len(values[g2]) for g1, g2 in pairs],
+        'Mean1': [values[g1].mean() for g1, g2 in pairs],
+        'Mean2': [values[g2].mean() for g1, g2 in pairs],
+        'Difference': [values[g1].mean() - values[g2].mean() for g1, g2 in pairs],
+        'CI_Low': low,
+        'CI_High': high,
+        'p': p,
+        'p_Holm': holm(p),
+        'p_FDR': fdr_bh(p)})
+    table['Significant'] = table['p_Holm' if correction == 'holm' else 'p_FDR'] < alpha
+    return table
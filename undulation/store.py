@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+
+# Memory-mapped coordinate store. The coordinates of every well are saved as one
+# .npy array of shape (2 x points x frames), x and y of a body point are thereby
+# contiguous on disk. A small JSON index holds the body point names and frame
+# range of every well. Arrays are opened with mmap_mode = 'r', so slicing them
+# only reads the pages actually touched. To fill gaps, the rows of the requested
+# body points are copied into one writable array, one body point at a time; the
+# other body points are not read. Coordinates are stored as float64 by default,
+# so the results equal those of frequencies(). dtype = 'float32' halves the size
+# of the store, but rounds the coordinates: bins close to the movement or
+# spectral thresholds can then be decided differently.
+#
+# Layout:   <root>/index.json
+#           <root>/<condition>/<video number + well number>.npy
+
+import os, json
+import numpy as np
+from numpy.lib.format import open_memmap
+
+from undulation.io import read_tracking, read_tracking_cached, key_well
+from undulation.detection import undulation_bins
+from undulation.parallel import iter_jobs, run_nested
+from undulation.pipeline import condition_files, with_fractions, split_fractions
+from undulation.instrument import stage
+from undulation.qc import tracked_mask, plate_qc
+from undulation.gaps import fill_gaps
+
+index_name = 'index.json'
+
+# function to write the pivoted tracking data of one well to the store, returns
+# the index entry of the well
+def write_well(root, c, key, df, dtype = 'float64'):
+    points = df.x.columns.to_numpy().tolist()
+    os.makedirs(os.path.join(root, c), exist_ok = True)
+    
+    cords = open_memmap(os.path.join(root, c, key + '.npy'), mode = 'w+', dtype = dtype,
+                        shape = (2, len(points), len(df)))
+    cords[0] = df.x[points].to_numpy().T
+    cords[1] = df.y[points].to_numpy().T
+    cords.flush()
+    del cords
+    
+    return {'points': points, 'frames': len(df),
+            'first_frame': int(df.index[0]) if len(df) else None,
+            'last_frame': int(df.index[-1]) if len(df) else None}
+
+# function to read a tracking file and write it to the store
+def store_file(path, root, c, key, cache = True, dtype = 'float64'):
+    df = read_tracking_cached(path) if cache else read_tracking(path)
+    return write_well(root, c, key, df, dtype)
+
+# function to write/read the index of the store
+def write_index(root, index):
+    os.makedirs(root, exist_ok = True)
+    with open(os.path.join(root, index_name), 'w') as f:
+        json.dump(index, f, indent = 1)
+
+def read_index(root):
+    with open(os.path.join(root, index_name)) as f:
+        return json.load(f)
+
+# function to write the extracted data of all conditions {condition: {key: df}} to the store
+def write_store(root, data, dtype = 'float64'):
+    index = {}
+    for c in data:
+        index[c] = {}
+        for e in data[c]:
+            index[c][e] = write_well(root, c, e, data[c][e], dtype)
+    write_index(root, index)
+    return index
+
+# function to build the store directly from the tracking files of all conditions
+# {condition: dataset}, only one file per worker process is held in memory at a time
+def build_store(root, cond_loc, cache = True, dtype = 'float64', workers = 1):
+    files = condition_files(cond_loc)
+    
+    index = {}
+    for c in cond_loc:
+        index[c] = {}
+    with stage('store', len(files), 'files') as progress:
+        entries = iter_jobs(store_file, [(path, root, c, key, cache, dtype) for c, key, path in files], workers)
+        for (c, key, path), entry in zip(files, entries):
+            index[c][key] = entry
+            progress.add()
+    write_index(root, index)
+    return index
+
+# function to open the coordinates of one well as read-only memory-mapped array
+# of shape (2 x points x frames)
+def open_well(root, c, key):
+    return np.load(os.path.join(root, c, key + '.npy'), mmap_mode = 'r')
+
+# function to get the x and y coordinates (points x frames) of the given body points
+# of one well. Consecutive body points are returned as views into the memory map
+def well_coords(root, c, key, points, index = None):
+    if index is None:
+        index = read_index(root)
+    names = index[c][key]['points']
+    rows = [names.index(p) for p in points]
+    cords = open_well(root, c, key)
+    
+    if rows and rows == list(range(rows[0], rows[-1] + 1)):
+        return cords[0, rows[0]:rows[-1]+1], cords[1, rows[0]:rows[-1]+1]
+    return cords[0, rows], cords[1, rows]
+
+# function to replace NaN-values by linear interpolation along the frames, as done by
+# DataFrame.interpolate() on the extracted data
+def interpolate_cords(cords):
+    return fill_gaps(np.asarray(cords, dtype = float))[0]
+
+# function to read the x and y coordinates of the given body points of one well into one
+# writable (2 x points x frames) float64 array and fill their gaps (see undulation/gaps.py)
+# one body point at a time. Returns the coordinates and the (points x frames) mask of
+# filled frames
+def filled_coords(root, c, key, points, max_gap = None, method = 'linear', index = None):
+    x, y = well_coords(root, c, key, points, index)
+    cords = np.empty((2,) + x.shape)
+    filled = np.zeros(x.shape, dtype = bool)
+    for i in range(x.shape[0]):
+        cords[0, i] = x[i]
+        cords[1, i] = y[i]
+        cords[:, i], gap = fill_gaps(cords[:, i], max_gap, method)
+        filled[i] = gap[0]
+    return cords, filled
+
+# function to extract the undulation-positive bin starts of one well of the store, gaps
+# are filled as set by max_gap and method (see undulation/gaps.py). With fractions = True
+# the fractions of filled frames are returned as well (see with_fractions in undulation/pipeline.py)
+def stored_undulation_bins(root, c, key, frames, bins, points, low = 4, up = 17, interpolate = True,
+                           hop = None, max_gap = None, method = 'linear', max_filled = None, fractions = False):
+    filled = None
+    if interpolate:
+        with stage('interpolation') as progress:
+            (x, y), filled = filled_coords(root, c, key, points, max_gap, method)
+            progress.count += 1
+    else:
+        x, y = well_coords(root, c, key, points)
+    starts = undulation_bins(x, y, frames, bins, low, up, hop = hop, filled = filled, max_filled = max_filled)
+    if fractions:
+        return with_fractions(starts, filled, frames, bins, hop)
+    return starts
+
+# function to count the tracked frames for every body point of one well of the store
+def stored_coverage(root, c, key):
+    cords = open_well(root, c, key)
+    return (~np.isnan(cords[0])).sum(axis = 1)
+
+# function to check if coverage is >90% for all wells of the store (see check_track
+# in undulation/qc.py), returns the list of wells suggested for exclusion
+def check_track_store(root, frames):
+    index = read_index(root)
+    ex_well = []
+    with stage('coverage check', sum(len(index[c]) for c in index)) as progress:
+        for c in index:
+            for e in index[c]:
+                if key_well(e) not in ex_well and any(stored_coverage(root, c, e) < frames*0.9):
+                    ex_well.append(key_well(e))
+                progress.add()
+    
+    print('The following wells do not show complete tracking, thus are suggested to be excluded from analysis'
+          , ex_well, sep = '\n')
+    return ex_well
+
+# function to create the QC tables of all wells of the store (see plate_qc in undulation/qc.py)
+def qc_store(root, frames, window = None):
+    index = read_index(root)
+    labels = [(c, e) for c in index for e in index[c]]
+    points = index[labels[0][0]][labels[0][1]]['points'] if labels else []
+    tracked = np.zeros((len(labels), len(points), frames), dtype = bool)
+    with stage('coverage check', len(labels)) as progress:
+        for i, (c, e) in enumerate(labels):
+            names = index[c][e]['points']
+            x = open_well(root, c, e)[0]
+            for j, p in enumerate(points):
+                if p in names:
+                    tracked[i, j] = tracked_mask(x[names.index(p)][np.newaxis], frames)[0]
+            progress.add()
+        return plate_qc(labels, points, tracked, window)
+
+# function to extract undulation-positive bin starts for all wells of the store, creating
+# the same dictionary as frequencies(). Worker processes only receive the location of the
+# well and map the arrays themselves. With fractions = True the fractions of filled frames
+# of every well and bin are returned as well (see split_fractions in undulation/pipeline.py)
+def store_frequencies(root, frames, bins, points, low = 4, up = 17, interpolate = True,
+                      exclude = (), workers = 1, hop = None, max_gap = None, method = 'linear', max_filled = None,
+                      fractions = False):
+    index = read_index(root)
+    jobs = {}
+    for c in index:
+        jobs[c] = {}
+        for e in index[c]:
+            if key_well(e) in exclude:
+                continue
+            jobs[c][e] = (root, c, e, frames, bins, points, low, up, interpolate, hop,
+                          max_gap, method, max_filled, fractions)
+    with stage('frequencies', sum(len(jobs[c]) for c in jobs)) as progress:
+        results = run_nested(stored_undulation_bins, jobs, workers, progress = progress)
+    if fractions:
+        return split_fractions(results)
+    return results
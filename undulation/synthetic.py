@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+# Synthetic loopy datasets with known ground truth, used by the benchmarks.
+# Every well is a sequence of bins (bin_len frames) that are either
+#   - undulation: sinusoidal movement at a frequency within the undulation band,
+#   - drift: steady diagonal crawling (no oscillation), or
+#   - still: tracking noise only (moves less than the movement threshold).
+# Only undulation bins are expected to be detected by frequencies().
+
+import os
+import numpy as np
+import pandas as pd
+
+from undulation.plates import grid_wells
+
+body_points = ['Body', 'Body2', 'Head', 'Tail']
+
+# function to get the names of the wells of a plate with the given number of rows and columns
+def plate_wells(rows = 5, columns = 5):
+    return grid_wells(rows, columns)
+
+# function to randomly assign a state (0 = still, 1 = drift, 2 = undulation) to every bin
+def random_states(frames, bin_len, rng, p_undulation = 0.3, p_drift = 0.2):
+    n_bins = -(-frames // bin_len)
+    return rng.choice([0, 1, 2], n_bins, p = [1 - p_undulation - p_drift, p_drift, p_undulation])
+
+# function to create the tracking data of one well in loopy format (frame_number, name, x, y)
+# following the states of its bins. freq is the undulation frequency in Hz, dropout the
+# fraction of randomly missing rows (first and last frame of a bin are kept, so that
+# interpolation does not carry movement into neighbouring bins)
+def synthetic_well(states, frames, bin_len, points = body_points, freq = 2.0, amplitude = 2.0,
+                   noise = 0.02, fs = 15, dropout = 0.0, rng = None):
+    rng = np.random.default_rng(rng)
+    t = np.arange(frames)
+    state = np.repeat(states, bin_len)[:frames]
+
+    tables = []
+    for i, name in enumerate(points):
+        x = 100 + 10*i + rng.normal(0, noise, frames)
+        y = 100 + rng.normal(0, noise, frames)
+        phase = rng.uniform(0, 2*np.pi)
+        drift = np.where(state == 1, 3*(t % bin_len)/bin_len, 0)
+        x += drift + np.where(state == 2, amplitude*np.sin(2*np.pi*freq*t/fs + phase), 0)
+        y += drift
+        tables.append(pd.DataFrame(dict(frame_number = t, name = name, x = x, y = y)))
+
+    df = pd.concat(tables).sort_values('frame_number', kind = 'stable')
+    if dropout > 0:
+        edge = np.isin(df.frame_number.to_numpy() % bin_len, (0, bin_len-1))
+        df = df[edge | (rng.random(len(df)) >= dropout)]
+    return df
+
+# function to create the scoring table (Behaviour, Start_Frame, Stop_Frame) of the undulation bins
+def synthetic_scoring(states, frames, bin_len):
+    und = np.r_[0, (np.asarray(states) == 2).astype(int), 0]
+    edges = np.diff(und)
+    start = np.flatnonzero(edges == 1)*bin_len
+    stop = np.minimum(np.flatnonzero(edges == -1)*bin_len, frames) - 1
+    return pd.DataFrame(dict(Behaviour = 'Undulation', Start_Frame = start, Stop_Frame = stop))
+
+# function to write a synthetic dataset, one tracking file per video and well named like
+# the files of renameDeepLearnV1.5.py (date_video_well_experiment.csv). If score_loc is
+# given, scoring files of the first video are written there. Returns the ground truth
+# {video number + '_' + well number: sorted list of undulation bin starts}
+def write_dataset(folder, wells = None, frames = 54000, points = body_points, videos = ('000022',),
+                  bin_len = 45, freq = 2.0, dropout = 0.0, score_loc = None, seed = 0,
+                  date = '20200101', experiment = 'synthetic'):
+    rng = np.random.default_rng(seed)
+    wells = wells or plate_wells()
+    os.makedirs(folder, exist_ok = True)
+    if score_loc is not None:
+        os.makedirs(score_loc, exist_ok = True)
+
+    truth = {}
+    for v in videos:
+        for w in wells:
+            states = random_states(frames, bin_len, rng)
+            df = synthetic_well(states, frames, bin_len, points, freq, dropout = dropout, rng = rng)
+            df.to_csv(os.path.join(folder, date + '_' + v + '_' + w + '_' + experiment + '.csv'), index = False)
+            truth[v + '_' + w] = (np.flatnonzero(states == 2)*bin_len).tolist()
+            if score_loc is not None and v == videos[0]:
+                synthetic_scoring(states, frames, bin_len).to_csv(
+                    os.path.join(score_loc, experiment + '_' + w + '.csv'), index = False)
+    return truth